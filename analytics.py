@@ -0,0 +1,351 @@
+import threading
+import time
+
+import numpy as np
+
+import ledger_archive
+from pickup_planner import match_area
+
+# Dashboard breakdowns computed column-wise with NumPy. Transactions are read
+# in large chunks of plain columns (no per-row dicts); waste-type category is
+# joined through a lookup array indexed by waste_type_id, and member ids are
+# factorized to integer codes once per chunk. users is joined the same way: a
+# member's area is the pickup area named in their address (the planner's
+# rule), resolved once per member and looked up by member code; members
+# without one count as 'Lainnya'. AnalyticsCache keeps the loaded columns and
+# appends new deposits instead of reloading.
+
+CHUNK_ROWS = 100000
+
+FRAME_SQL = """SELECT user_id, waste_type_id, weight, total,
+                      substr(created_at, 1, 4) * 12 + substr(created_at, 6, 2) - 1 AS month
+               FROM {transactions}
+               WHERE status != 'CANCELLED'"""
+
+
+class Frame:
+    def __init__(self, users, categories, areas, months, weight, total, user_names, category_names, area_names):
+        self.users = users
+        self.categories = categories
+        self.areas = areas
+        self.months = months
+        self.weight = weight
+        self.total = total
+        self.user_names = user_names
+        self.category_names = category_names
+        self.area_names = area_names
+
+    def __len__(self):
+        return len(self.weight)
+
+
+def _factorize(values, codes):
+    return np.fromiter((codes.setdefault(v, len(codes)) for v in values), dtype=np.int64, count=len(values))
+
+
+def _waste_types(conn):
+    c = conn.cursor()
+    c.row_factory = None
+    c.execute("SELECT id, category FROM waste_types ORDER BY id")
+    return c.fetchall()
+
+
+def _areas(conn):
+    c = conn.cursor()
+    c.row_factory = None
+    c.execute("SELECT DISTINCT area FROM pickup_schedules ORDER BY area")
+    return [row[0] for row in c.fetchall()]
+
+
+class _Codes:
+    # Integer codes for categories, members and areas. Kept with a cached
+    # Frame so rows appended later are coded the same way.
+
+    def __init__(self, waste_types, areas):
+        self.waste_types = waste_types
+        self.areas = areas
+        self.area_codes = {area: i for i, area in enumerate(areas)}
+        self.addresses = None
+        self.user_area = []         # area code by member code
+        self.category_codes = {}
+        self.size = max((row[0] for row in waste_types), default=0) + 1
+        self.category_of = np.full(self.size, -1, dtype=np.int64)
+        for wt_id, category in waste_types:
+            self.category_of[wt_id] = self.category_codes.setdefault(category, len(self.category_codes))
+        self.unknown = len(self.category_codes)
+        self.user_codes = {}
+
+    def _member_areas(self, conn):
+        # Area codes for member codes handed out since the last call
+        if self.addresses is None:
+            self.addresses = dict(conn.execute("SELECT user_id, address FROM users"))
+        new = list(self.user_codes)[len(self.user_area):]
+        missing = [u for u in new if u not in self.addresses]
+        for i in range(0, len(missing), 500):
+            batch = missing[i:i + 500]
+            self.addresses.update(conn.execute(
+                f"SELECT user_id, address FROM users WHERE user_id IN ({','.join('?' * len(batch))})", batch))
+        for user_id in new:
+            area = match_area(self.addresses.get(user_id), self.areas)
+            self.user_area.append(self.area_codes.get(area, len(self.areas)))
+        return np.asarray(self.user_area, dtype=np.int64)
+
+    def read(self, c, chunk_rows, parts):
+        while True:
+            rows = c.fetchmany(chunk_rows)
+            if not rows:
+                break
+            user_ids, wt_ids, weights, totals, months = zip(*rows)
+            wt = np.fromiter(wt_ids, dtype=np.int64, count=len(rows))
+            in_range = (wt >= 0) & (wt < self.size)
+            cats = np.full(len(rows), self.unknown, dtype=np.int64)
+            cats[in_range] = self.category_of[wt[in_range]]
+            cats[cats < 0] = self.unknown
+            users = _factorize(user_ids, self.user_codes)
+            parts['users'].append(users)
+            parts['categories'].append(cats)
+            parts['areas'].append(self._member_areas(c.connection)[users])
+            parts['months'].append(np.fromiter(months, dtype=np.int64, count=len(rows)))
+            parts['weight'].append(np.fromiter(weights, dtype=np.float64, count=len(rows)))
+            parts['total'].append(np.fromiter(totals, dtype=np.float64, count=len(rows)))
+
+    def frame(self, parts):
+        def stack(name, dtype):
+            return np.concatenate(parts[name]) if parts[name] else np.empty(0, dtype=dtype)
+
+        category_names = list(self.category_codes) + ['Lainnya']
+        return Frame(stack('users', np.int64), stack('categories', np.int64), stack('areas', np.int64),
+                     stack('months', np.int64), stack('weight', np.float64), stack('total', np.float64),
+                     list(self.user_codes), category_names, self.areas + ['Lainnya'])
+
+
+def _parts(frame=None):
+    names = ('users', 'categories', 'areas', 'months', 'weight', 'total')
+    return {k: [getattr(frame, k)] if frame is not None else [] for k in names}
+
+
+def _range(date_from, date_to, column='created_at'):
+    sql, params = '', []
+    if date_from:
+        sql += f' AND {column} >= ?'
+        params.append(date_from)
+    if date_to:
+        sql += f' AND {column} < ?'
+        params.append(date_to)
+    return sql, params
+
+
+def load_frame(conn, date_from=None, date_to=None, chunk_rows=CHUNK_ROWS, codes=None):
+    codes = codes or _Codes(_waste_types(conn), _areas(conn))
+    c = conn.cursor()
+    c.row_factory = None
+    parts = _parts()
+    # Unbounded reads scan the table in rowid order; going through the
+    # created_at index for the full ledger would be much slower
+    where, params = _range(date_from, date_to)
+    # Archived years first, then the hot table
+    for source in ledger_archive.sources(conn, 'transactions', date_from, date_to):
+        c.execute(FRAME_SQL.format(transactions=source) + where, params)
+        codes.read(c, chunk_rows, parts)
+    return codes.frame(parts)
+
+
+def extend_frame(conn, frame, codes, after_id, up_to_id, date_from=None, date_to=None, chunk_rows=CHUNK_ROWS):
+    # frame plus the transactions with after_id < id <= up_to_id. New rows only
+    # ever land in the hot table; the unary + keeps the date bounds from
+    # taking the created_at index instead of the id range.
+    c = conn.cursor()
+    c.row_factory = None
+    parts = _parts(frame)
+    where, params = _range(date_from, date_to, '+created_at')
+    c.execute(FRAME_SQL.format(transactions='transactions') + ' AND id > ? AND id <= ?' + where,
+              [after_id, up_to_id] + params)
+    codes.read(c, chunk_rows, parts)
+    return codes.frame(parts)
+
+
+def _distinct(values):
+    # Sorted distinct values; a sort + neighbour compare is faster here than
+    # np.unique on large int64 key arrays
+    if len(values) == 0:
+        return values
+    s = np.sort(values)
+    keep = np.empty(len(s), dtype=bool)
+    keep[0] = True
+    np.not_equal(s[1:], s[:-1], out=keep[1:])
+    return s[keep]
+
+
+def _month_name(index):
+    return f'{index // 12:04d}-{index % 12 + 1:02d}'
+
+
+def _group(keys, n_groups, frame, n_users):
+    # kg, value, transactions and distinct members per group key
+    kg = np.bincount(keys, weights=frame.weight, minlength=n_groups)
+    value = np.bincount(keys, weights=frame.total, minlength=n_groups)
+    count = np.bincount(keys, minlength=n_groups)
+    pairs = _distinct(keys * n_users + frame.users)
+    members = np.bincount(pairs // n_users, minlength=n_groups)
+    return kg, value, count, members
+
+
+def _rows(names, kg, value, count, members, key):
+    return [{key: name, 'total_kg': round(float(kg[i]), 3), 'total_value': round(float(value[i]), 2),
+             'transactions': int(count[i]), 'active_members': int(members[i])}
+            for i, name in enumerate(names) if count[i]]
+
+
+def aggregate(frame):
+    if len(frame) == 0:
+        return {'rows': 0, 'by_category': [], 'by_area': [], 'by_month': [], 'cohorts': []}
+    n_users = max(len(frame.user_names), 1)
+
+    by_category = _rows(frame.category_names,
+                        *_group(frame.categories, len(frame.category_names), frame, n_users), 'category')
+    by_area = _rows(frame.area_names, *_group(frame.areas, len(frame.area_names), frame, n_users), 'area')
+
+    first_month = int(frame.months.min())
+    month_keys = frame.months - first_month
+    n_months = int(month_keys.max()) + 1
+    month_names = [_month_name(first_month + i) for i in range(n_months)]
+    by_month = _rows(month_names, *_group(month_keys, n_months, frame, n_users), 'month')
+
+    # Retention: cohort = first active month; count members active k months later
+    pairs = _distinct(frame.users * n_months + month_keys)
+    pair_users = pairs // n_months
+    pair_months = pairs % n_months
+    # pairs are sorted by user then month, so a user's first pair is its cohort
+    first = np.empty(len(pairs), dtype=bool)
+    first[0] = True
+    np.not_equal(pair_users[1:], pair_users[:-1], out=first[1:])
+    cohorts = np.repeat(pair_months[first], np.diff(np.append(np.flatnonzero(first), len(pairs))))
+    offsets = pair_months - cohorts
+    matrix = np.bincount(cohorts * n_months + offsets, minlength=n_months * n_months).reshape(n_months, n_months)
+
+    cohort_rows = []
+    for cohort in range(n_months):
+        size = int(matrix[cohort, 0])
+        if size:
+            active = matrix[cohort, :n_months - cohort]
+            cohort_rows.append({'cohort': month_names[cohort], 'members': size,
+                                'retention': [round(float(v) / size, 4) for v in active]})
+
+    return {'rows': int(len(frame)), 'by_category': by_category, 'by_area': by_area,
+            'by_month': by_month, 'cohorts': cohort_rows}
+
+
+class AnalyticsCache:
+    # Per date range: the loaded Frame, its codes and the MAX(transactions.id)
+    # it covers. Transactions are append-only, so a new deposit only reads the
+    # rows past that mark and aggregates again. Frames are kept for the
+    # max_frames most recently used ranges (a frame costs ~48 bytes a row);
+    # older ranges keep only their result and reload when the mark moves.
+    # A change to the waste-type categories or the pickup areas reloads the
+    # range.
+
+    def __init__(self, max_entries=32, max_frames=4):
+        self.max_entries = max_entries
+        self.max_frames = max_frames
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                if len(self._entries) >= self.max_entries:
+                    self._entries.pop(next(iter(self._entries)))
+                entry = {'lock': threading.Lock(), 'mark': None, 'frame': None, 'codes': None, 'result': None}
+            # Most recently used last
+            self._entries[key] = entry
+            for old in list(self._entries.values())[:-self.max_frames or None]:
+                old['frame'] = old['codes'] = None
+            return entry
+
+    def get(self, conn, date_from, date_to):
+        c = conn.cursor()
+        c.execute("SELECT MAX(id) FROM transactions")
+        mark = c.fetchone()[0] or 0
+        entry = self._entry((date_from, date_to))
+        with entry['lock']:
+            if entry['mark'] == mark and entry['result'] is not None:
+                return entry['result']
+            started = time.perf_counter()
+            waste_types, areas = _waste_types(conn), _areas(conn)
+            codes = entry['codes']
+            if (entry['frame'] is not None and codes.waste_types == waste_types and codes.areas == areas
+                    and entry['mark'] is not None and entry['mark'] < mark):
+                frame = extend_frame(conn, entry['frame'], codes, entry['mark'], mark, date_from, date_to)
+            else:
+                codes = _Codes(waste_types, areas)
+                frame = load_frame(conn, date_from, date_to, codes=codes)
+            result = aggregate(frame)
+            result['high_water'] = mark
+            result['compute_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            entry.update(mark=mark, frame=frame, codes=codes, result=result)
+        return result
+
+
+def benchmark(rows, users=50000, areas=40, db_path=None):
+    # Synthetic ledger: time the vectorized aggregation alone and, with
+    # db_path, the full SQLite load + aggregation
+    import sqlite3
+    rng = np.random.default_rng(0)
+    report = {'rows': rows}
+
+    if db_path:
+        import migrations
+        conn = sqlite3.connect(db_path)
+        conn.execute("PRAGMA synchronous=OFF")
+        migrations.migrate(conn)
+        if conn.execute("SELECT COUNT(*) FROM waste_types").fetchone()[0] == 0:
+            conn.executemany("INSERT INTO waste_types (name, category, price_per_kg) VALUES (?, ?, ?)",
+                             [(f'Jenis {i}', f'Kategori {i % 6}', 1000 + i * 250) for i in range(12)])
+        have = conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+        if have < rows:
+            t0 = time.perf_counter()
+            n = rows - have
+            user_ix = rng.integers(0, users, n)
+            wt_ix = rng.integers(1, 13, n)
+            area_ix = rng.integers(0, areas, n)
+            weight = np.round(rng.gamma(2.0, 2.5, n), 2)
+            day = rng.integers(0, 730, n)
+            conn.executemany(
+                '''INSERT INTO transactions (user_id, transaction_id, waste_type_id, weight, total,
+                                             location, status, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?, 'COMPLETED', ?)''',
+                ((f'BSB{100001 + int(user_ix[i])}', f'BENCH{have + i}', int(wt_ix[i]), float(weight[i]),
+                  float(weight[i]) * 2000, f'Area {int(area_ix[i])}',
+                  f'{2024 + int(day[i]) // 365}-{int(day[i]) % 365 // 31 + 1:02d}-{int(day[i]) % 28 + 1:02d} 10:00:00')
+                 for i in range(n)))
+            conn.commit()
+            report['generate_s'] = round(time.perf_counter() - t0, 2)
+
+        t0 = time.perf_counter()
+        frame = load_frame(conn)
+        report['load_s'] = round(time.perf_counter() - t0, 3)
+        conn.close()
+    else:
+        frame = Frame(rng.integers(0, users, rows), rng.integers(0, 6, rows), rng.integers(0, areas, rows),
+                      rng.integers(2024 * 12, 2026 * 12, rows), rng.gamma(2.0, 2.5, rows),
+                      rng.gamma(2.0, 5000.0, rows), [str(i) for i in range(users)],
+                      [f'Kategori {i}' for i in range(6)], [f'Area {i}' for i in range(areas)])
+
+    t0 = time.perf_counter()
+    result = aggregate(frame)
+    report['aggregate_s'] = round(time.perf_counter() - t0, 3)
+    report['cohorts'] = len(result['cohorts'])
+    return report
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description='Benchmark the analytics engine')
+    parser.add_argument('--rows', type=int, default=2000000)
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--db', help='Also time loading from this SQLite file (filled with synthetic rows if short)')
+    args = parser.parse_args()
+    print(json.dumps(benchmark(args.rows, users=args.users, db_path=args.db), indent=2))
@@ -0,0 +1,169 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+from itertools import islice
+
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+
+
+class TokenService:
+    # Signed, expiring bearer tokens. Verification is stateless apart from
+    # the revocation list, so authenticated calls never touch the password
+    # hash or the database.
+
+    def __init__(self, secret_key, max_age, revocations=None):
+        self.max_age = int(max_age)
+        self.revocations = revocations
+        self._serializer = URLSafeTimedSerializer(secret_key, salt='banksampah-access-token')
+
+    def issue(self, user_id):
+        jti = secrets.token_urlsafe(12)
+        token = self._serializer.dumps({'uid': user_id, 'jti': jti})
+        return token, jti
+
+    def verify(self, token):
+        try:
+            payload = self._serializer.loads(token, max_age=self.max_age)
+        except (BadSignature, SignatureExpired):
+            return None
+        if not isinstance(payload, dict) or 'uid' not in payload:
+            return None
+        if self.revocations is not None and self.revocations.is_revoked(payload.get('jti')):
+            return None
+        return payload
+
+
+class RevocationList:
+    # Revoked token IDs kept in memory and persisted in revoked_tokens. Other
+    # workers pick up new rows every `refresh_interval` seconds.
+
+    def __init__(self, connect, refresh_interval=30):
+        self.connect = connect
+        self.refresh_interval = refresh_interval
+        self._revoked = {}
+        self._last_seq = 0
+        self._next_refresh = 0.0
+        self._lock = threading.Lock()
+
+    def is_revoked(self, jti):
+        if time.monotonic() >= self._next_refresh:
+            self.refresh()
+        return jti in self._revoked
+
+    def revoke(self, jti, expires_at):
+        with self._lock:
+            self._revoked[jti] = expires_at
+        conn = self.connect()
+        try:
+            conn.execute("INSERT OR IGNORE INTO revoked_tokens (jti, expires_at) VALUES (?, ?)", (jti, expires_at))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def refresh(self):
+        with self._lock:
+            self._next_refresh = time.monotonic() + self.refresh_interval
+            now = time.time()
+            conn = self.connect()
+            try:
+                c = conn.cursor()
+                c.execute("SELECT seq, jti, expires_at FROM revoked_tokens WHERE seq > ? ORDER BY seq",
+                          (self._last_seq,))
+                for seq, jti, expires_at in c.fetchall():
+                    self._last_seq = seq
+                    if expires_at > now:
+                        self._revoked[jti] = expires_at
+                c.execute("DELETE FROM revoked_tokens WHERE expires_at <= ?", (now,))
+                conn.commit()
+            finally:
+                conn.close()
+            for jti in [j for j, exp in self._revoked.items() if exp <= now]:
+                del self._revoked[jti]
+
+
+class PrincipalCache:
+    # Small LRU of resolved users (no password, no balance) with a TTL so
+    # status/role changes are picked up without an explicit invalidation.
+
+    def __init__(self, loader, max_size=1024, ttl=60):
+        self.loader = loader
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(user_id)
+                return entry[0]
+        principal = self.loader(user_id)
+        with self._lock:
+            self._entries[user_id] = (principal, now + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return principal
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+class LoginThrottle:
+    # Sliding-window count of failed logins per account and per IP. Checked
+    # before the password hash is computed, so credential stuffing costs us
+    # a dict lookup instead of a PBKDF2/scrypt run.
+
+    def __init__(self, max_per_account=5, max_per_ip=30, window=900, max_keys=100000):
+        self.max_per_account = max_per_account
+        self.max_per_ip = max_per_ip
+        self.window = window
+        self.max_keys = max_keys
+        self._failures = {}
+        self._lock = threading.Lock()
+
+    def _recent(self, key, now):
+        failures = self._failures.get(key)
+        if failures is None:
+            return None
+        while failures and failures[0] <= now - self.window:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+            return None
+        return failures
+
+    def retry_after(self, ip, account):
+        now = time.monotonic()
+        wait = 0
+        with self._lock:
+            for key, limit in ((('ip', ip), self.max_per_ip), (('account', account), self.max_per_account)):
+                failures = self._recent(key, now)
+                if failures is not None and len(failures) >= limit:
+                    wait = max(wait, failures[0] + self.window - now)
+        return int(wait) + 1 if wait else 0
+
+    def record_failure(self, ip, account):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._failures) >= self.max_keys:
+                for key in list(self._failures):
+                    self._recent(key, now)
+                # Still full (stuffing with random emails): drop the keys that
+                # failed least recently, a tenth at a time so this stays rare
+                excess = len(self._failures) - self.max_keys * 9 // 10
+                for key in list(islice(self._failures, max(excess, 0))):
+                    del self._failures[key]
+            for key in (('ip', ip), ('account', account)):
+                # Re-insert so dict order runs from least to most recent failure
+                failures = self._failures.pop(key, None) or deque()
+                failures.append(now)
+                self._failures[key] = failures
+
+    def reset(self, account):
+        with self._lock:
+            self._failures.pop(('account', account), None)
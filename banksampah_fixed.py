@@ -1,211 +1,143 @@
-from flask import Flask, render_template_string, request, jsonify, send_file, session, redirect, url_for
+import time
+_STARTED = time.perf_counter()
+
+from flask import Flask, render_template_string, request, jsonify, send_file, session, redirect, url_for, g, has_app_context
 from datetime import datetime, timedelta
 import sqlite3
 import os
 import io
+import csv
 import json
 import hashlib
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+import sys
 import base64
+import tempfile
 from io import BytesIO
 from werkzeug.security import generate_password_hash, check_password_hash
+from db_pool import ConnectionPool
+import migrations
+import reporting
+from response_cache import ResponseCache
+from geo_index import GeoIndex
+import threading
+import atexit
+import functools
+from concurrent.futures import TimeoutError as FutureTimeout
+from deposits import DepositWriter, DepositError
+import bulk_import
+from id_allocator import IdAllocator, MEMBER_SEED_SQL
+from auth_tokens import TokenService, RevocationList, PrincipalCache, LoginThrottle
+from pagination import CursorError, keyset_page, page_size
+import search
+from counters import CounterBuffer
+from price_index import PriceIndex, normalize_time
+from leaderboard import Leaderboard
+import rollups
+import charts
+import statements
+import exports
+from metrics import Metrics
+import sync
+import gzip
+import ledger_archive
 
 app = Flask(__name__)
 app.secret_key = 'banksampah-secret-key-2025-v2'
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=24)
+app.config['DATABASE'] = 'banksampah_complete.db'
+app.config['DB_POOL_SIZE'] = 8
+app.config['DB_POOL_TIMEOUT'] = 5.0
+app.config['DB_CACHE_SIZE'] = -16000          # negative = KiB, ~16 MB page cache per connection
+app.config['DB_MMAP_SIZE'] = 64 * 1024 * 1024
+app.config['DB_BUSY_TIMEOUT'] = 5000          # ms
+app.config['DB_CACHED_STATEMENTS'] = 256
+app.config['DB_READ_SPLIT'] = True            # GET routes read through the read-only pool
+app.config['DB_READ_POOL_SIZE'] = 16
+app.config['DB_READ_MMAP_SIZE'] = 256 * 1024 * 1024
+# Shared cache makes the read connections share one page cache, but it adds
+# table-level locking between them and is discouraged by SQLite; with WAL
+# each connection reading its own snapshot scales better, so it stays off
+app.config['DB_READ_SHARED_CACHE'] = False
+app.config['CACHE_TTL_WASTE_TYPES'] = 300     # seconds
+app.config['CACHE_TTL_COLLECTION_POINTS'] = 600
+app.config['CACHE_TTL_TIPS'] = 3600
+app.config['DEPOSIT_BATCH_SIZE'] = 256
+app.config['DEPOSIT_ACK_TIMEOUT'] = 5.0       # seconds to wait for the writer before answering 202
+app.config['MEMBER_ID_BLOCK_SIZE'] = 20
+app.config['LOGIN_MAX_FAILURES_PER_ACCOUNT'] = 5
+app.config['LOGIN_MAX_FAILURES_PER_IP'] = 30
+app.config['LOGIN_THROTTLE_WINDOW'] = 900     # seconds
+app.config['PAGE_SIZE'] = 10
+app.config['PAGE_SIZE_MAX'] = 100
+app.config['SEARCH_LIMIT_MAX'] = 50
+app.config['SYNC_PAGE_ROWS'] = 500           # changed rows per /api/sync response
+app.config['SYNC_PAGE_ROWS_MAX'] = 2000
+app.config['SYNC_GZIP_LEVEL'] = 6
+app.config['COUNTER_FLUSH_INTERVAL'] = 5.0    # seconds
+app.config['COUNTER_MAX_PENDING'] = 1000      # dirty rows before an early flush
+app.config['STATS_REFRESH_INTERVAL'] = 60     # seconds between incremental rollup refreshes
+app.config['CHART_CACHE_DIR'] = 'chart_cache'
+app.config['CHART_MEMORY_CACHE_BYTES'] = 32 * 1024 * 1024
+app.config['CHART_DISK_CACHE_BYTES'] = 256 * 1024 * 1024
+app.config['CHART_WORKERS'] = 2
+app.config['CHART_RENDER_TIMEOUT'] = 30.0     # seconds a request waits for a render
+app.config['STATEMENT_SPOOL_BYTES'] = 1024 * 1024  # PDF statements above this are buffered on disk
+app.config['EXPORT_CHUNK_ROWS'] = 1000
+app.config['VEHICLE_CAPACITY_KG'] = 1000.0
+app.config['SLOW_QUERY_MS'] = 100            # statements at or above this go to the slow-query log
+app.config['METRICS_TOKEN'] = None            # bearer token for /metrics; None leaves it open (scrape from the LAN)
+
+metrics = Metrics(slow_query_ms=app.config['SLOW_QUERY_MS'])
+metrics.instrument(app)
+response_cache = ResponseCache()
+collection_point_index = GeoIndex()
+_collection_point_index_version = None
+_collection_point_index_lock = threading.Lock()
+price_index = PriceIndex()
+_price_index_lock = threading.Lock()
+_stats_refreshed_at = 0.0
+analytics_cache = None
+chart_service = charts.ChartService(app.config['CHART_CACHE_DIR'],
+                                    max_memory_bytes=app.config['CHART_MEMORY_CACHE_BYTES'],
+                                    max_disk_bytes=app.config['CHART_DISK_CACHE_BYTES'],
+                                    workers=app.config['CHART_WORKERS'],
+                                    render_timeout=app.config['CHART_RENDER_TIMEOUT'])
+atexit.register(chart_service.close)
+_analytics_lock = threading.Lock()
+deposit_writer = DepositWriter(lambda: get_pool().acquire(), batch_size=app.config['DEPOSIT_BATCH_SIZE'])
+atexit.register(deposit_writer.close)
+leaderboard = Leaderboard()
+_leaderboard_lock = threading.Lock()
+deposit_writer.add_listener(leaderboard.on_posted)
+member_ids = IdAllocator(lambda: get_pool().acquire(), 'member', 'BSB',
+                         block_size=app.config['MEMBER_ID_BLOCK_SIZE'],
+                         seed_sql=MEMBER_SEED_SQL, first_value=100001)
+revoked_tokens = RevocationList(lambda: get_pool().acquire())
+access_tokens = TokenService(app.secret_key, app.config['PERMANENT_SESSION_LIFETIME'].total_seconds(),
+                             revocations=revoked_tokens)
+view_counters = CounterBuffer(lambda: get_pool().acquire(),
+                              flush_interval=app.config['COUNTER_FLUSH_INTERVAL'],
+                              max_pending=app.config['COUNTER_MAX_PENDING'])
+atexit.register(view_counters.close)
+login_throttle = LoginThrottle(max_per_account=app.config['LOGIN_MAX_FAILURES_PER_ACCOUNT'],
+                               max_per_ip=app.config['LOGIN_MAX_FAILURES_PER_IP'],
+                               window=app.config['LOGIN_THROTTLE_WINDOW'])
 
 # Setup database
 def init_db():
-    conn = sqlite3.connect('banksampah_complete.db')
+    conn = sqlite3.connect(app.config['DATABASE'])
     c = conn.cursor()
     
-    # Table: Users
-    c.execute('''CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id TEXT UNIQUE NOT NULL,
-        name TEXT NOT NULL,
-        email TEXT UNIQUE NOT NULL,
-        phone TEXT NOT NULL,
-        password TEXT NOT NULL,
-        address TEXT NOT NULL,
-        balance REAL DEFAULT 0.0,
-        points INTEGER DEFAULT 0,
-        join_date TEXT NOT NULL,
-        is_admin INTEGER DEFAULT 0,
-        latitude REAL,
-        longitude REAL,
-        status TEXT DEFAULT 'ACTIVE'
-    )''')
-    
-    # Table: Waste Types (Jenis Sampah)
-    c.execute('''CREATE TABLE IF NOT EXISTS waste_types (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        category TEXT NOT NULL,
-        description TEXT,
-        price_per_kg REAL NOT NULL,
-        image_url TEXT,
-        recycling_process TEXT,
-        benefits TEXT,
-        status TEXT DEFAULT 'ACTIVE'
-    )''')
-    
-    # Table: Transactions
-    c.execute('''CREATE TABLE IF NOT EXISTS transactions (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id TEXT NOT NULL,
-        transaction_id TEXT UNIQUE NOT NULL,
-        waste_type_id INTEGER NOT NULL,
-        weight REAL NOT NULL,
-        total REAL NOT NULL,
-        pickup_schedule_id INTEGER,
-        location TEXT NOT NULL,
-        status TEXT DEFAULT 'PENDING',
-        pickup_date TEXT,
-        pickup_time TEXT,
-        notes TEXT,
-        created_at TEXT NOT NULL,
-        FOREIGN KEY (waste_type_id) REFERENCES waste_types(id)
-    )''')
-    
-    # Table: Pickup Schedules (Jadwal Pengangkutan)
-    c.execute('''CREATE TABLE IF NOT EXISTS pickup_schedules (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id TEXT NOT NULL,
-        schedule_date TEXT NOT NULL,
-        schedule_time TEXT NOT NULL,
-        area TEXT NOT NULL,
-        driver_name TEXT,
-        driver_phone TEXT,
-        vehicle_number TEXT,
-        status TEXT DEFAULT 'SCHEDULED',
-        completed_at TEXT,
-        notes TEXT,
-        created_at TEXT NOT NULL
-    )''')
-    
-    # Table: Pickup Requests (Permintaan Penjemputan)
-    c.execute('''CREATE TABLE IF NOT EXISTS pickup_requests (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id TEXT NOT NULL,
-        request_date TEXT NOT NULL,
-        waste_types TEXT NOT NULL,
-        estimated_weight REAL,
-        address TEXT NOT NULL,
-        latitude REAL,
-        longitude REAL,
-        status TEXT DEFAULT 'PENDING',
-        scheduled_pickup_id INTEGER,
-        notes TEXT,
-        created_at TEXT NOT NULL
-    )''')
-    
-    # Table: Collection Points (TPS/Bank Sampah)
-    c.execute('''CREATE TABLE IF NOT EXISTS collection_points (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        type TEXT NOT NULL,
-        address TEXT NOT NULL,
-        latitude REAL NOT NULL,
-        longitude REAL NOT NULL,
-        operating_hours TEXT NOT NULL,
-        capacity TEXT,
-        contact_person TEXT,
-        contact_phone TEXT,
-        facilities TEXT,
-        status TEXT DEFAULT 'ACTIVE',
-        created_at TEXT NOT NULL
-    )''')
-    
-    # Table: Savings (Tabungan)
-    c.execute('''CREATE TABLE IF NOT EXISTS savings (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id TEXT NOT NULL,
-        transaction_type TEXT NOT NULL,
-        amount REAL NOT NULL,
-        balance_after REAL NOT NULL,
-        description TEXT,
-        reference_id TEXT,
-        created_at TEXT NOT NULL
-    )''')
-    
-    # Table: Price Updates (Perubahan Harga)
-    c.execute('''CREATE TABLE IF NOT EXISTS price_updates (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        waste_type_id INTEGER NOT NULL,
-        old_price REAL NOT NULL,
-        new_price REAL NOT NULL,
-        effective_date TEXT NOT NULL,
-        reason TEXT,
-        updated_by TEXT NOT NULL,
-        created_at TEXT NOT NULL
-    )''')
-    
-    # Table: News & Announcements (Berita & Pengumuman)
-    c.execute('''CREATE TABLE IF NOT EXISTS news (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        title TEXT NOT NULL,
-        content TEXT NOT NULL,
-        category TEXT NOT NULL,
-        image_url TEXT,
-        author TEXT NOT NULL,
-        publish_date TEXT NOT NULL,
-        expiry_date TEXT,
-        is_active INTEGER DEFAULT 1,
-        views INTEGER DEFAULT 0,
-        created_at TEXT NOT NULL
-    )''')
-    
-    # Table: Education Materials (Edukasi)
-    c.execute('''CREATE TABLE IF NOT EXISTS education_materials (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        title TEXT NOT NULL,
-        content TEXT NOT NULL,
-        type TEXT NOT NULL,
-        category TEXT NOT NULL,
-        image_url TEXT,
-        video_url TEXT,
-        author TEXT,
-        views INTEGER DEFAULT 0,
-        likes INTEGER DEFAULT 0,
-        created_at TEXT NOT NULL
-    )''')
-    
-    # Table: Tips
-    c.execute('''CREATE TABLE IF NOT EXISTS tips (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        title TEXT NOT NULL,
-        content TEXT NOT NULL,
-        icon TEXT,
-        category TEXT NOT NULL,
-        difficulty TEXT,
-        created_at TEXT NOT NULL
-    )''')
-    
-    # Table: Statistics
-    c.execute('''CREATE TABLE IF NOT EXISTS statistics (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        date TEXT NOT NULL,
-        total_users INTEGER DEFAULT 0,
-        total_transactions INTEGER DEFAULT 0,
-        total_waste_kg REAL DEFAULT 0,
-        total_value REAL DEFAULT 0,
-        active_pickups INTEGER DEFAULT 0,
-        collection_points_count INTEGER DEFAULT 0,
-        created_at TEXT NOT NULL
-    )''')
+    # Tables and indexes come from the versioned migrations
+    migrations.migrate(conn)
     
     # Insert initial data
     insert_initial_data(c)
     
     conn.commit()
+    
+    # Every shipped query must be served by an index
+    migrations.verify_query_plans(conn)
     conn.close()
     print("✅ Database initialized successfully!")
 
@@ -422,11 +354,201 @@ def insert_initial_data(c):
                   datetime.now().strftime('%Y-%m-%d')))
 
 # Helper functions
+db_pool = None
+
+def get_pool():
+    global db_pool
+    if db_pool is None:
+        db_pool = ConnectionPool(app.config['DATABASE'],
+                                 max_size=app.config['DB_POOL_SIZE'],
+                                 timeout=app.config['DB_POOL_TIMEOUT'],
+                                 cache_size=app.config['DB_CACHE_SIZE'],
+                                 mmap_size=app.config['DB_MMAP_SIZE'],
+                                 busy_timeout=app.config['DB_BUSY_TIMEOUT'],
+                                 cached_statements=app.config['DB_CACHED_STATEMENTS'],
+                                 on_connect=[metrics.attach],
+                                 on_release=[metrics.flush])
+    return db_pool
+
+read_pool = None
+
+def get_read_pool():
+    global read_pool
+    if read_pool is None:
+        # The read-write pool puts the file in WAL mode, which read-only
+        # connections can't do themselves
+        get_pool().acquire().close()
+        read_pool = ConnectionPool(app.config['DATABASE'],
+                                   max_size=app.config['DB_READ_POOL_SIZE'],
+                                   timeout=app.config['DB_POOL_TIMEOUT'],
+                                   cache_size=app.config['DB_CACHE_SIZE'],
+                                   mmap_size=app.config['DB_READ_MMAP_SIZE'],
+                                   busy_timeout=app.config['DB_BUSY_TIMEOUT'],
+                                   cached_statements=app.config['DB_CACHED_STATEMENTS'],
+                                   on_connect=[metrics.attach],
+                                   on_release=[metrics.flush],
+                                   readonly=True,
+                                   shared_cache=app.config['DB_READ_SHARED_CACHE'])
+    return read_pool
+
+def acquire_read():
+    if app.config['DB_READ_SPLIT']:
+        return get_read_pool().acquire()
+    return get_pool().acquire()
+
 def get_db():
-    conn = sqlite3.connect('banksampah_complete.db')
-    conn.row_factory = sqlite3.Row
+    # One pooled connection per app context; conn.close() returns it to the pool
+    if not has_app_context():
+        return get_pool().acquire()
+    conn = g.get('db')
+    if conn is None or conn.released:
+        started = time.perf_counter()
+        conn = g.db = get_pool().acquire()
+        metrics.add_phase('connect', time.perf_counter() - started)
+    return conn
+
+def get_read_db():
+    # Like get_db() but read-only; for routes that never write. Writers are
+    # not blocked by it and it never waits behind a writer for a pool slot.
+    if not app.config['DB_READ_SPLIT']:
+        return get_db()
+    if not has_app_context():
+        return get_read_pool().acquire()
+    conn = g.get('read_db')
+    if conn is None or conn.released:
+        started = time.perf_counter()
+        conn = g.read_db = get_read_pool().acquire()
+        metrics.add_phase('connect', time.perf_counter() - started)
     return conn
 
+@app.teardown_appcontext
+def release_db(exc):
+    for name in ('db', 'read_db'):
+        conn = g.pop(name, None)
+        if conn is not None:
+            conn.close()
+
+def invalidate_reference_data(*tables):
+    # Call after writing waste_types, collection_points, education_materials,
+    # tips or price_updates so cached listings are rebuilt on the next request
+    response_cache.invalidate(*tables)
+
+def get_collection_point_index():
+    # Rebuilt whenever collection_points changed, whoever wrote it: every
+    # insert/update bumps the newest row_version and a delete the row count
+    global collection_point_index, _collection_point_index_version
+    conn = get_read_db()
+    c = conn.cursor()
+    c.execute("SELECT MAX(row_version), COUNT(*) FROM collection_points")
+    version = tuple(c.fetchone())
+    if version != _collection_point_index_version:
+        with _collection_point_index_lock:
+            if version != _collection_point_index_version:
+                index = GeoIndex()
+                c.execute("SELECT * FROM collection_points WHERE status = 'ACTIVE'")
+                for row in c.fetchall():
+                    index.upsert(row['id'], row['latitude'], row['longitude'], sync.public_row(row))
+                collection_point_index = index
+                _collection_point_index_version = version
+    conn.close()
+    return collection_point_index
+
+def get_price_index():
+    if not price_index.loaded:
+        with _price_index_lock:
+            if not price_index.loaded:
+                conn = get_read_db()
+                price_index.load(conn)
+                conn.close()
+    return price_index
+
+def get_leaderboard():
+    if not leaderboard.loaded:
+        with _leaderboard_lock:
+            if not leaderboard.loaded:
+                conn = get_read_db()
+                leaderboard.load(conn)
+                conn.close()
+    return leaderboard
+
+def get_analytics():
+    # analytics pulls in NumPy, so it is imported on the first dashboard request
+    global analytics_cache
+    if analytics_cache is None:
+        with _analytics_lock:
+            if analytics_cache is None:
+                import analytics
+                analytics_cache = analytics.AnalyticsCache()
+    return analytics_cache
+
+def load_principal(user_id):
+    conn = acquire_read()
+    c = conn.cursor()
+    c.execute("SELECT user_id, name, email, is_admin, status FROM users WHERE user_id = ?", (user_id,))
+    row = c.fetchone()
+    conn.close()
+    if row is None or row['status'] != 'ACTIVE':
+        return None
+    return dict(row)
+
+principals = PrincipalCache(load_principal)
+
+@app.before_request
+def authenticate():
+    g.current_user = None
+    g.token = None
+    auth = request.headers.get('Authorization', '')
+    if auth.startswith('Bearer '):
+        payload = access_tokens.verify(auth[7:].strip())
+        if payload:
+            g.current_user = principals.get(payload['uid'])
+            g.token = payload if g.current_user else None
+
+def login_required(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if g.current_user is None:
+            return jsonify({'success': False, 'message': 'Silakan login terlebih dahulu'}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+def admin_required(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if g.current_user is None:
+            return jsonify({'success': False, 'message': 'Silakan login terlebih dahulu'}), 401
+        if not g.current_user['is_admin']:
+            return jsonify({'success': False, 'message': 'Akses khusus admin'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+def paginate(c, select, where, params, sort_column, transform=dict, ledger=None):
+    # Keyset page driven by ?cursor= and ?limit=; the next cursor goes in X-Next-Cursor.
+    # With ledger= ('transactions'/'savings') the pages continue into the archived years.
+    limit = page_size(request.args, app.config['PAGE_SIZE'], app.config['PAGE_SIZE_MAX'])
+    if ledger:
+        rows, next_cursor = ledger_archive.keyset_page(c, ledger, where, params,
+                                                       cursor=request.args.get('cursor'), limit=limit)
+    else:
+        rows, next_cursor = keyset_page(c, select, where, params, sort_column,
+                                        cursor=request.args.get('cursor'), limit=limit)
+    resp = jsonify([transform(row) for row in rows])
+    if next_cursor:
+        resp.headers['X-Next-Cursor'] = next_cursor
+    return resp
+
+@app.errorhandler(CursorError)
+def handle_cursor_error(e):
+    return jsonify({'success': False, 'message': str(e)}), 400
+
+@app.errorhandler(ledger_archive.ArchiveError)
+def handle_archive_error(e):
+    print(f"❌ Ledger archive: {e}")
+    return jsonify({'success': False, 'message': 'Arsip riwayat tidak tersedia'}), 503
+
+def can_view_member(user_id):
+    return g.current_user['user_id'] == user_id or g.current_user['is_admin']
+
 def hash_password(password):
     return generate_password_hash(password)
 
@@ -541,43 +663,196 @@ def test_api():
         }
     })
 
+@app.route('/api/admin/db-pool')
+@admin_required
+def db_pool_stats():
+    return jsonify({
+        'pool': get_pool().stats(),
+        'read_pool': get_read_pool().stats(),
+        'response_cache': response_cache.stats(),
+        'deposit_writer': deposit_writer.stats(),
+        'view_counters': view_counters.stats(),
+        'charts': chart_service.stats(),
+        'leaderboard': leaderboard.stats()
+    })
+
+@app.route('/metrics')
+def prometheus_metrics():
+    token = app.config['METRICS_TOKEN']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return jsonify({'success': False, 'message': 'Token metrics tidak valid'}), 401
+    body = metrics.render({
+        'pool': get_pool().stats(),
+        'read_pool': get_read_pool().stats(),
+        'response_cache': response_cache.stats(),
+        'deposit_writer': deposit_writer.stats(),
+        'view_counters': view_counters.stats(),
+        'charts': chart_service.stats(),
+        'leaderboard': leaderboard.stats()
+    })
+    return body, 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+@app.route('/api/admin/slow-queries')
+@admin_required
+def slow_queries():
+    limit = min(request.args.get('limit', 20, type=int), 200)
+    return jsonify({
+        'threshold_ms': app.config['SLOW_QUERY_MS'],
+        'slow': list(reversed(metrics.slow_queries))[:limit],
+        'top': metrics.top_statements(limit)
+    })
+
 @app.route('/api/waste-types')
+@response_cache.cached(app.config['CACHE_TTL_WASTE_TYPES'], ['waste_types', 'price_updates'])
 def get_waste_types():
-    conn = get_db()
+    conn = get_read_db()
     c = conn.cursor()
     c.execute("SELECT * FROM waste_types WHERE status = 'ACTIVE' ORDER BY price_per_kg DESC")
-    waste_types = [dict(row) for row in c.fetchall()]
+    waste_types = [sync.public_row(row) for row in c.fetchall()]
     conn.close()
     return jsonify(waste_types)
 
+@app.route('/api/waste-types/<int:waste_type_id>/price-history')
+def get_price_history(waste_type_id):
+    index = get_price_index()
+    history = index.history(waste_type_id)
+    if history is None:
+        return jsonify({'success': False, 'message': 'Jenis sampah tidak ditemukan'}), 404
+    
+    result = {
+        'waste_type_id': waste_type_id,
+        'current_price': index.current_price(waste_type_id),
+        'history': history
+    }
+    if request.args.get('at'):
+        result['at'] = request.args['at']
+        result['price_at'] = index.price_at(waste_type_id, request.args['at'])
+    return jsonify(result)
+
+@app.route('/api/admin/waste-types/<int:waste_type_id>/price', methods=['PUT'])
+@admin_required
+def update_waste_type_price(waste_type_id):
+    data = request.json or {}
+    try:
+        new_price = float(data['price_per_kg'])
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Harga tidak valid'}), 400
+    if new_price <= 0:
+        return jsonify({'success': False, 'message': 'Harga tidak valid'}), 400
+    
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    try:
+        effective_date = datetime.fromisoformat(normalize_time(data.get('effective_date') or now))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Format tanggal berlaku harus YYYY-MM-DD atau YYYY-MM-DD HH:MM:SS'}), 400
+    effective_date = effective_date.strftime('%Y-%m-%d %H:%M:%S')
+    if effective_date > now:
+        return jsonify({'success': False, 'message': 'Tanggal berlaku tidak boleh di masa depan'}), 400
+    
+    index = get_price_index()
+    conn = get_db()
+    c = conn.cursor()
+    c.execute("SELECT price_per_kg FROM waste_types WHERE id = ?", (waste_type_id,))
+    row = c.fetchone()
+    if row is None:
+        conn.close()
+        return jsonify({'success': False, 'message': 'Jenis sampah tidak ditemukan'}), 404
+    
+    # A backdated change takes over from the price in force at that time and
+    # only becomes the current price if no later change exists
+    old_price = index.price_at(waste_type_id, effective_date)
+    if old_price is None:
+        old_price = row['price_per_kg']
+    latest = index.last_change(waste_type_id)
+    if latest is None or effective_date >= latest:
+        c.execute("UPDATE waste_types SET price_per_kg = ? WHERE id = ?", (new_price, waste_type_id))
+    c.execute('''INSERT INTO price_updates 
+                (waste_type_id, old_price, new_price, effective_date, reason, updated_by, created_at) 
+                VALUES (?, ?, ?, ?, ?, ?, ?)''',
+             (waste_type_id, old_price, new_price, effective_date, data.get('reason'),
+              g.current_user['user_id'], now))
+    conn.commit()
+    conn.close()
+    
+    index.record_change(waste_type_id, old_price, new_price, effective_date)
+    invalidate_reference_data('waste_types', 'price_updates')
+    
+    return jsonify({
+        'success': True,
+        'message': 'Harga berhasil diperbarui',
+        'waste_type_id': waste_type_id,
+        'old_price': old_price,
+        'new_price': new_price,
+        'effective_date': effective_date
+    })
+
 @app.route('/api/collection-points')
+@response_cache.cached(app.config['CACHE_TTL_COLLECTION_POINTS'], ['collection_points'])
 def get_collection_points():
-    conn = get_db()
+    conn = get_read_db()
     c = conn.cursor()
     c.execute("SELECT * FROM collection_points WHERE status = 'ACTIVE'")
-    points = [dict(row) for row in c.fetchall()]
+    points = [sync.public_row(row) for row in c.fetchall()]
     conn.close()
     return jsonify(points)
 
+@app.route('/api/collection-points/nearest')
+def get_nearest_collection_points():
+    try:
+        lat = float(request.args['lat'])
+        lon = float(request.args['lon'])
+        k = int(request.args.get('k', 5))
+        radius_km = request.args.get('radius_km')
+        radius_km = float(radius_km) if radius_km else None
+    except (KeyError, ValueError):
+        return jsonify({'success': False, 'message': 'Parameter lat dan lon wajib diisi dengan angka'}), 400
+    
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return jsonify({'success': False, 'message': 'Koordinat tidak valid'}), 400
+    k = max(1, min(k, 50))
+    
+    points = []
+    for distance, _, point in get_collection_point_index().nearest(lat, lon, k=k, radius_km=radius_km):
+        points.append(dict(point, distance_km=round(distance, 3)))
+    return jsonify(points)
+
 @app.route('/api/news')
 def get_news():
-    conn = get_db()
+    conn = get_read_db()
     c = conn.cursor()
     
-    c.execute('''SELECT * FROM news 
-                 WHERE is_active = 1 AND (expiry_date IS NULL OR expiry_date >= date('now'))
-                 ORDER BY publish_date DESC 
-                 LIMIT 10''')
-    
-    news = [dict(row) for row in c.fetchall()]
+    resp = paginate(c, "SELECT * FROM news",
+                    ["is_active = 1", "(expiry_date IS NULL OR expiry_date >= date('now'))"], [],
+                    'publish_date', transform=lambda row: view_counters.merge('news', sync.public_row(row)))
     conn.close()
-    return jsonify(news)
+    return resp
+
+@app.route('/api/news/<int:news_id>')
+def get_news_detail(news_id):
+    conn = get_read_db()
+    c = conn.cursor()
+    c.execute("SELECT * FROM news WHERE id = ? AND is_active = 1", (news_id,))
+    row = c.fetchone()
+    conn.close()
+    if row is None:
+        return jsonify({'success': False, 'message': 'Berita tidak ditemukan'}), 404
+    
+    view_counters.increment('news', 'views', news_id)
+    return jsonify(view_counters.merge('news', sync.public_row(row)))
 
 @app.route('/api/login', methods=['POST'])
 def login():
     data = request.json
     email = data.get('email')
     password = data.get('password')
+    ip = request.remote_addr
+    
+    # Refuse before hashing so repeated guesses can't tie up the CPU
+    retry_after = login_throttle.retry_after(ip, email)
+    if retry_after:
+        resp = jsonify({'success': False, 'message': 'Terlalu banyak percobaan login, coba lagi nanti'})
+        resp.headers['Retry-After'] = str(retry_after)
+        return resp, 429
     
     conn = get_db()
     c = conn.cursor()
@@ -588,17 +863,36 @@ def login():
     if user and check_password(user['password'], password):
         user_data = dict(user)
         user_data.pop('password', None)
+        login_throttle.reset(email)
+        token, _ = access_tokens.issue(user_data['user_id'])
         
         conn.close()
         return jsonify({
             'success': True,
             'message': 'Login berhasil',
-            'user': user_data
+            'user': user_data,
+            'access_token': token,
+            'token_type': 'Bearer',
+            'expires_in': access_tokens.max_age
         })
     
     conn.close()
+    login_throttle.record_failure(ip, email)
     return jsonify({'success': False, 'message': 'Email atau password salah'})
 
+@app.route('/api/logout', methods=['POST'])
+@login_required
+def logout():
+    jti = g.token.get('jti')
+    if jti:
+        revoked_tokens.revoke(jti, time.time() + access_tokens.max_age)
+    return jsonify({'success': True, 'message': 'Logout berhasil'})
+
+@app.route('/api/me')
+@login_required
+def get_me():
+    return jsonify(g.current_user)
+
 @app.route('/api/register', methods=['POST'])
 def register():
     data = request.json
@@ -607,61 +901,485 @@ def register():
     if not all(k in data for k in required_fields):
         return jsonify({'success': False, 'message': 'Data tidak lengkap'})
     
+    user_id = member_ids.next_id()
+    hashed_password = hash_password(data['password'])
+    
     conn = get_db()
     c = conn.cursor()
     
-    # Check existing email
-    c.execute("SELECT * FROM users WHERE email = ?", (data['email'],))
-    if c.fetchone():
+    # Insert user; the UNIQUE constraint on email rejects duplicates atomically
+    try:
+        c.execute('''INSERT INTO users 
+                    (user_id, name, email, phone, password, address, join_date) 
+                    VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                 (user_id, data['name'], data['email'], data['phone'], 
+                  hashed_password, data['address'], datetime.now().strftime('%Y-%m-%d')))
+        conn.commit()
+    except sqlite3.IntegrityError:
+        conn.rollback()
         conn.close()
         return jsonify({'success': False, 'message': 'Email sudah terdaftar'})
     
-    # Generate user ID
-    c.execute("SELECT MAX(id) as max_id FROM users WHERE user_id LIKE 'BSB%'")
-    result = c.fetchone()
-    if result and result['max_id']:
-        next_id = result['max_id'] + 100001
+    conn.close()
+    
+    return jsonify({
+        'success': True,
+        'message': 'Pendaftaran berhasil',
+        'user_id': user_id
+    })
+
+@app.route('/api/transactions/deposit', methods=['POST'])
+@admin_required
+def post_deposit():
+    data = request.json or {}
+    try:
+        future = deposit_writer.submit(data)
+        result = future.result(timeout=app.config['DEPOSIT_ACK_TIMEOUT'])
+    except DepositError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except FutureTimeout:
+        # Still queued; the client can look the transaction up by its ID later
+        return jsonify({
+            'success': True,
+            'status': 'QUEUED',
+            'message': 'Setoran sedang diproses',
+            'transaction_id': future.transaction_id
+        }), 202
+    
+    return jsonify({
+        'success': True,
+        'message': 'Setoran berhasil dicatat',
+        'transaction': result
+    })
+
+@app.route('/api/transactions/bulk', methods=['POST'])
+@admin_required
+def post_bulk_deposits():
+    if request.mimetype == 'text/csv':
+        fmt = 'csv'
+    elif request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        fmt = 'jsonl'
     else:
-        next_id = 100001
+        fmt = 'json'
     
-    user_id = f"BSB{next_id}"
-    hashed_password = hash_password(data['password'])
+    try:
+        rows = list(bulk_import.read_rows(io.StringIO(request.get_data(as_text=True)), fmt))
+    except (ValueError, csv.Error):
+        return jsonify({'success': False, 'message': 'Format data tidak valid'}), 400
     
-    # Insert user
-    c.execute('''INSERT INTO users 
-                (user_id, name, email, phone, password, address, join_date) 
-                VALUES (?, ?, ?, ?, ?, ?, ?)''',
-             (user_id, data['name'], data['email'], data['phone'], 
-              hashed_password, data['address'], datetime.now().strftime('%Y-%m-%d')))
+    conn = get_db()
+    results, posted = bulk_import.import_deposits(conn, rows)
+    conn.close()
+    deposit_writer.notify(posted)
     
-    conn.commit()
+    return jsonify({
+        'success': True,
+        'summary': bulk_import.summarize(results),
+        'results': results
+    })
+
+@app.route('/api/admin/members/import', methods=['POST'])
+@admin_required
+def import_members():
+    fmt = 'csv' if request.mimetype == 'text/csv' else 'json'
+    try:
+        rows = list(bulk_import.read_rows(io.StringIO(request.get_data(as_text=True)), fmt))
+    except (ValueError, csv.Error):
+        return jsonify({'success': False, 'message': 'Format data tidak valid'}), 400
+    
+    conn = get_db()
+    results = bulk_import.import_members(conn, rows, member_ids)
     conn.close()
     
     return jsonify({
         'success': True,
-        'message': 'Pendaftaran berhasil',
-        'user_id': user_id
+        'summary': bulk_import.summarize(results),
+        'results': results
     })
 
 @app.route('/api/education')
 def get_education():
-    conn = get_db()
+    # Not response-cached: the view/like counts merged in below must stay live
+    conn = get_read_db()
     c = conn.cursor()
-    c.execute("SELECT * FROM education_materials ORDER BY created_at DESC LIMIT 10")
-    education = [dict(row) for row in c.fetchall()]
+    resp = paginate(c, "SELECT * FROM education_materials", [], [], 'created_at',
+                    transform=lambda row: view_counters.merge('education_materials', sync.public_row(row)))
     conn.close()
-    return jsonify(education)
+    return resp
+
+def get_education_row(education_id):
+    conn = get_read_db()
+    c = conn.cursor()
+    c.execute("SELECT * FROM education_materials WHERE id = ?", (education_id,))
+    row = c.fetchone()
+    conn.close()
+    return row
+
+@app.route('/api/education/<int:education_id>')
+def get_education_detail(education_id):
+    row = get_education_row(education_id)
+    if row is None:
+        return jsonify({'success': False, 'message': 'Materi tidak ditemukan'}), 404
+    
+    view_counters.increment('education_materials', 'views', education_id)
+    return jsonify(view_counters.merge('education_materials', sync.public_row(row)))
+
+@app.route('/api/education/<int:education_id>/like', methods=['POST'])
+def like_education(education_id):
+    row = get_education_row(education_id)
+    if row is None:
+        return jsonify({'success': False, 'message': 'Materi tidak ditemukan'}), 404
+    
+    view_counters.increment('education_materials', 'likes', education_id)
+    item = view_counters.merge('education_materials', sync.public_row(row))
+    return jsonify({'success': True, 'likes': item['likes']})
 
 @app.route('/api/tips')
+@response_cache.cached(app.config['CACHE_TTL_TIPS'], ['tips'])
 def get_tips():
+    conn = get_read_db()
+    c = conn.cursor()
+    resp = paginate(c, "SELECT * FROM tips", [], [], 'created_at', transform=sync.public_row)
+    conn.close()
+    return resp
+
+@app.route('/api/search')
+def search_content():
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({'success': False, 'message': 'Parameter q wajib diisi'}), 400
+    try:
+        limit = max(1, min(int(request.args.get('limit', 20)), app.config['SEARCH_LIMIT_MAX']))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Parameter limit tidak valid'}), 400
+    
+    conn = get_read_db()
+    c = conn.cursor()
+    c.execute("SELECT 1 FROM search_pending LIMIT 1")
+    if c.fetchone():
+        sync_search_index()
+    results = search.search(c, q, limit)
+    conn.close()
+    return jsonify(results)
+
+def sync_search_index():
+    # News/education written since the last search (by anyone) are indexed
+    # before the query runs
+    conn = get_db()
+    c = conn.cursor()
+    try:
+        c.execute("BEGIN IMMEDIATE")
+        search.sync_pending(c)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+@app.route('/api/sync')
+def sync_reference_data():
+    # Offline clients send the token from their last sync and get only what
+    # changed since, for all reference tables in one (gzipped) payload
+    try:
+        limit = int(request.args.get('limit', app.config['SYNC_PAGE_ROWS']))
+        limit = max(1, min(limit, app.config['SYNC_PAGE_ROWS_MAX']))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Parameter limit tidak valid'}), 400
+    
+    conn = get_read_db()
+    try:
+        result = sync.changes(conn, request.args.get('since'), limit)
+    except sync.TokenError:
+        return jsonify({'success': False, 'message': 'Token sinkronisasi tidak valid'}), 400
+    finally:
+        conn.close()
+    
+    body = app.json.dumps(result).encode()
+    resp = app.response_class(mimetype='application/json')
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        body = gzip.compress(body, compresslevel=app.config['SYNC_GZIP_LEVEL'])
+        resp.headers['Content-Encoding'] = 'gzip'
+    resp.set_data(body)
+    resp.headers['Vary'] = 'Accept-Encoding'
+    resp.headers['Cache-Control'] = 'no-store'
+    return resp
+
+def refresh_statistics(conn):
+    # Fold in new ledger rows at most once per interval; reads never scan the ledger
+    global _stats_refreshed_at
+    if time.monotonic() - _stats_refreshed_at > app.config['STATS_REFRESH_INTERVAL']:
+        rollups.refresh(conn)
+        _stats_refreshed_at = time.monotonic()
+
+@app.route('/api/statistics')
+@admin_required
+def get_statistics():
+    today = datetime.now().date()
+    date_from = request.args.get('from') or (today - timedelta(days=29)).isoformat()
+    date_to = request.args.get('to') or today.isoformat()
+    granularity = request.args.get('granularity', 'day')
+    try:
+        if datetime.strptime(date_from, '%Y-%m-%d') > datetime.strptime(date_to, '%Y-%m-%d'):
+            raise ValueError
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Rentang tanggal tidak valid'}), 400
+    if granularity not in rollups.GRANULARITIES:
+        return jsonify({'success': False, 'message': 'Granularity harus day, week atau month'}), 400
+    
+    conn = get_db()
+    refresh_statistics(conn)
+    data = rollups.query(conn, date_from, date_to, granularity)
+    conn.close()
+    
+    return jsonify({
+        'from': date_from,
+        'to': date_to,
+        'granularity': granularity,
+        'data': data
+    })
+
+@app.route('/api/charts/<spec>')
+def get_chart(spec):
+    if spec not in charts.SPECS:
+        return jsonify({'success': False, 'message': 'Grafik tidak ditemukan'}), 404
+    # Tonnage and membership come from the admin statistics; price trends are public
+    if spec != 'price-trend':
+        if g.current_user is None:
+            return jsonify({'success': False, 'message': 'Silakan login terlebih dahulu'}), 401
+        if not g.current_user['is_admin']:
+            return jsonify({'success': False, 'message': 'Akses khusus admin'}), 403
+    fmt = request.args.get('format', 'png')
+    if fmt not in charts.FORMATS:
+        return jsonify({'success': False, 'message': 'Format harus png atau svg'}), 400
+    try:
+        months = max(1, min(int(request.args.get('months', 12)), 60))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Parameter months tidak valid'}), 400
+    
+    today = datetime.now().date()
+    date_to = today.isoformat()
+    first = today.year * 12 + today.month - months
+    date_from = datetime(first // 12, first % 12 + 1, 1).date().isoformat()
+    conn = get_db()
+    if spec == 'price-trend':
+        c = conn.cursor()
+        c.execute("SELECT id, name FROM waste_types WHERE status = 'ACTIVE' ORDER BY id")
+        data = charts.price_series(get_price_index(), c.fetchall(), date_from, date_to)
+    else:
+        refresh_statistics(conn)
+        rows = rollups.query(conn, date_from, date_to, 'month')
+        data = charts.monthly_series(rows, 'total_waste_kg' if spec == 'monthly-tonnage' else 'total_users')
+    conn.close()
+    
+    # The key is known before rendering, so a revalidation never renders
+    key = charts.chart_key(spec, fmt, data)
+    if request.if_none_match.contains(key):
+        resp = app.response_class(status=304)
+    else:
+        try:
+            key, body = chart_service.get(spec, fmt, data, key=key)
+        except FutureTimeout:
+            return jsonify({'success': False, 'message': 'Grafik sedang diproses, coba lagi'}), 503
+        except charts.RenderError as e:
+            print(f"❌ Chart {spec}: {e!r} ({e.__cause__!r})")
+            return jsonify({'success': False, 'message': 'Grafik gagal dibuat'}), 500
+        resp = app.response_class(body, mimetype=charts.FORMATS[fmt])
+    resp.set_etag(key)
+    resp.headers['Cache-Control'] = 'public, no-cache' if spec == 'price-trend' else 'private, no-cache'
+    return resp
+
+@app.route('/api/admin/export/<dataset>')
+@admin_required
+def export_dataset(dataset):
+    if dataset not in exports.DATASETS:
+        return jsonify({'success': False, 'message': 'Dataset tidak ditemukan'}), 404
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'xlsx'):
+        return jsonify({'success': False, 'message': 'Format harus csv atau xlsx'}), 400
+    date_from = request.args.get('from') or None
+    date_to = request.args.get('to') or None
+    try:
+        if date_from:
+            datetime.strptime(date_from, '%Y-%m-%d')
+        if date_to:
+            # Inclusive end date
+            date_to = (datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Format tanggal harus YYYY-MM-DD'}), 400
+    status = request.args.get('status') or None
+    name = f"{dataset}-{request.args.get('from') or 'awal'}-{request.args.get('to') or 'akhir'}"
+    
+    if fmt == 'xlsx':
+        out = tempfile.TemporaryFile()
+        conn = get_read_db()
+        try:
+            exports.write_xlsx(conn, dataset, out, date_from, date_to, status,
+                               chunk_rows=app.config['EXPORT_CHUNK_ROWS'])
+        except ImportError:
+            out.close()
+            return jsonify({'success': False, 'message': 'Ekspor xlsx membutuhkan paket openpyxl'}), 501
+        finally:
+            conn.close()
+        out.seek(0)
+        return send_file(out, as_attachment=True, download_name=f'{name}.xlsx', max_age=0,
+                         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    
+    # The generator takes its own pooled connection; the request's is released
+    # before the body is streamed
+    compress = request.args.get('gzip') in ('1', 'true')
+    body = exports.stream_csv(acquire_read, dataset, date_from, date_to, status,
+                              compress=compress, chunk_rows=app.config['EXPORT_CHUNK_ROWS'])
+    resp = app.response_class(body, mimetype='application/gzip' if compress else 'text/csv')
+    resp.headers['Content-Disposition'] = f"attachment; filename={name}.csv{'.gz' if compress else ''}"
+    resp.headers['Cache-Control'] = 'no-store'
+    return resp
+
+@app.route('/api/admin/pickups/plan', methods=['POST'])
+@admin_required
+def plan_pickups():
+    # pickup_planner pulls in NumPy, so it is imported on first use
+    import pickup_planner
+    data = request.json or {}
+    plan_date = data.get('date') or datetime.now().strftime('%Y-%m-%d')
+    try:
+        datetime.strptime(plan_date, '%Y-%m-%d')
+        capacity = float(data.get('capacity_kg') or app.config['VEHICLE_CAPACITY_KG'])
+        if capacity <= 0:
+            raise ValueError
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Tanggal atau kapasitas tidak valid'}), 400
+    
     conn = get_db()
+    result = pickup_planner.plan(conn, plan_date, capacity)
+    if not data.get('dry_run'):
+        result['updated'] = pickup_planner.apply(conn, result)
+    conn.close()
+    return jsonify(dict(result, success=True))
+
+@app.route('/api/admin/analytics')
+@admin_required
+def get_analytics_dashboard():
+    date_from = request.args.get('from') or None
+    date_to = request.args.get('to') or None
+    try:
+        for value in (date_from, date_to):
+            if value:
+                datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Format tanggal harus YYYY-MM-DD'}), 400
+    if date_to:
+        # Inclusive end date
+        date_to = (datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+    
+    conn = get_read_db()
+    result = get_analytics().get(conn, date_from, date_to)
+    conn.close()
+    return jsonify(dict(result, **{'from': request.args.get('from'), 'to': request.args.get('to')}))
+
+@app.route('/api/users/<user_id>/transactions')
+@login_required
+def get_user_transactions(user_id):
+    if not can_view_member(user_id):
+        return jsonify({'success': False, 'message': 'Akses ditolak'}), 403
+    conn = get_read_db()
     c = conn.cursor()
-    c.execute("SELECT * FROM tips ORDER BY created_at DESC")
-    tips = [dict(row) for row in c.fetchall()]
+    resp = paginate(c, None, ["user_id = ?"], [user_id], 'created_at', ledger='transactions')
+    conn.close()
+    return resp
+
+@app.route('/api/users/<user_id>/savings')
+@login_required
+def get_user_savings(user_id):
+    if not can_view_member(user_id):
+        return jsonify({'success': False, 'message': 'Akses ditolak'}), 403
+    conn = get_read_db()
+    c = conn.cursor()
+    resp = paginate(c, None, ["user_id = ?"], [user_id], 'created_at', ledger='savings')
+    conn.close()
+    return resp
+
+def board_args():
+    # (board, name) from ?board=global|area|month&area=&month=
+    board = request.args.get('board', 'global')
+    if board == 'area':
+        return board, request.args.get('area', '')
+    if board == 'month':
+        return board, request.args.get('month') or datetime.now().strftime('%Y-%m')
+    return board, ''
+
+@app.route('/api/leaderboard')
+def get_leaderboard_view():
+    board, name = board_args()
+    if board not in ('global', 'area', 'month'):
+        return jsonify({'success': False, 'message': 'Board harus global, area atau month'}), 400
+    try:
+        offset = max(0, int(request.args.get('offset', 0)))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Parameter offset tidak valid'}), 400
+    limit = page_size(request.args, app.config['PAGE_SIZE'], app.config['PAGE_SIZE_MAX'])
+    
+    rows, members = get_leaderboard().top(board, name, limit, offset)
+    if rows:
+        # Names are looked up per page so renames show without a rebuild
+        conn = get_read_db()
+        c = conn.cursor()
+        ids = [row['user_id'] for row in rows]
+        c.execute(f"SELECT user_id, name FROM users WHERE user_id IN ({','.join('?' * len(ids))})", ids)
+        names = dict(c.fetchall())
+        conn.close()
+        for row in rows:
+            row['name'] = names.get(row['user_id'])
+    return jsonify({'board': board, 'name': name, 'members': members, 'data': rows})
+
+@app.route('/api/users/<user_id>/rank')
+@login_required
+def get_user_rank(user_id):
+    if not can_view_member(user_id):
+        return jsonify({'success': False, 'message': 'Akses ditolak'}), 403
+    board = get_leaderboard()
+    month = request.args.get('month') or datetime.now().strftime('%Y-%m')
+    return jsonify({
+        'user_id': user_id,
+        'global': board.rank(user_id),
+        'month': dict(board.rank(user_id, 'month', month), month=month),
+        'areas': {area: board.rank(user_id, 'area', area) for area in board.areas(user_id)}
+    })
+
+@app.route('/api/users/<user_id>/statement.pdf')
+@login_required
+def get_user_statement(user_id):
+    if not can_view_member(user_id):
+        return jsonify({'success': False, 'message': 'Akses ditolak'}), 403
+    date_from = request.args.get('from') or None
+    date_to = request.args.get('to') or None
+    try:
+        if date_from:
+            datetime.strptime(date_from, '%Y-%m-%d')
+        if date_to:
+            # Inclusive end date
+            date_to = (datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Format tanggal harus YYYY-MM-DD'}), 400
+    
+    # Small statements stay in memory; long histories spill to a temp file
+    out = tempfile.SpooledTemporaryFile(max_size=app.config['STATEMENT_SPOOL_BYTES'])
+    conn = get_read_db()
+    rows = statements.write_statement(conn, user_id, out, date_from, date_to)
     conn.close()
-    return jsonify(tips)
+    if rows is None:
+        out.close()
+        return jsonify({'success': False, 'message': 'Pengguna tidak ditemukan'}), 404
+    out.seek(0)
+    return send_file(out, mimetype='application/pdf', as_attachment=True,
+                     download_name=f'buku-tabungan-{user_id}.pdf', max_age=0)
 
 if __name__ == '__main__':
+    if '--profile-startup' in sys.argv:
+        # Import cost of the app itself, then of the lazily loaded PDF/chart stacks
+        print(json.dumps(reporting.startup_report(_STARTED), indent=2))
+        sys.exit(0)
+    
     try:
         init_db()
         print("=" * 70)
@@ -0,0 +1,3 @@
+# Benchmark tooling: datagen.py fills a database with synthetic members and
+# ledger rows at production scale, harness.py drives the app against it and
+# writes a JSON baseline, compare.py diffs two baselines.
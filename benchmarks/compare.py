@@ -0,0 +1,81 @@
+import json
+
+# Diff two harness baselines. A scenario regresses when its p95 or p99 grows,
+# or its throughput drops, by more than the threshold (relative). Latencies
+# under MIN_MS are ignored: at that scale run-to-run noise dominates.
+
+LATENCY_KEYS = ('p50_ms', 'p95_ms', 'p99_ms')
+GATED_KEYS = ('p95_ms', 'p99_ms')
+MIN_MS = 1.0
+
+
+def _change(before, after):
+    if before is None or after is None or before == 0:
+        return None
+    return (after - before) / before
+
+
+def compare(base, head, threshold=0.10):
+    # Returns (rows, regressions); each row is a dict per scenario
+    rows, regressions = [], []
+    for name in sorted(set(base['scenarios']) | set(head['scenarios'])):
+        old, new = base['scenarios'].get(name), head['scenarios'].get(name)
+        if old is None or new is None:
+            rows.append({'scenario': name, 'status': 'added' if old is None else 'removed'})
+            continue
+        row = {'scenario': name, 'status': 'ok'}
+        for key in LATENCY_KEYS + ('throughput_rps', 'peak_rss_mb', 'errors'):
+            row[key] = (old.get(key), new.get(key), _change(old.get(key), new.get(key)))
+        worse = [key for key in GATED_KEYS
+                 if row[key][2] is not None and row[key][2] > threshold and max(row[key][:2]) >= MIN_MS]
+        drop = row['throughput_rps'][2]
+        if drop is not None and drop < -threshold:
+            worse.append('throughput_rps')
+        if (new.get('errors') or 0) > (old.get('errors') or 0):
+            worse.append('errors')
+        if worse:
+            row['status'] = 'regressed: ' + ', '.join(worse)
+            regressions.append(name)
+        rows.append(row)
+    return rows, regressions
+
+
+def format_table(rows):
+    def cell(value):
+        old, new, change = value
+        if change is None:
+            return f'{old} -> {new}'
+        return f'{old} -> {new} ({change:+.0%})'
+
+    lines = []
+    for row in rows:
+        if 'p50_ms' not in row:
+            lines.append(f"{row['scenario']:22s} {row['status']}")
+            continue
+        lines.append(f"{row['scenario']:22s} p50 {cell(row['p50_ms']):28s} p99 {cell(row['p99_ms']):28s} "
+                     f"rps {cell(row['throughput_rps']):28s} {row['status']}")
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description='Compare two benchmark baselines')
+    parser.add_argument('base')
+    parser.add_argument('head')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Relative change that counts as a regression')
+    parser.add_argument('--json', action='store_true', help='Print the comparison as JSON')
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+    for key in ('mode', 'concurrency', 'dataset'):
+        if base.get(key) != head.get(key):
+            print(f'⚠️  {key} differs: {base.get(key)} vs {head.get(key)}', file=sys.stderr)
+    rows, regressions = compare(base, head, args.threshold)
+    print(json.dumps({'rows': rows, 'regressions': regressions}, indent=2) if args.json else format_table(rows))
+    # Non-zero exit so CI can gate on it
+    sys.exit(1 if regressions else 0)
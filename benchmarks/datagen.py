@@ -0,0 +1,259 @@
+import sqlite3
+import time
+from datetime import datetime
+
+import numpy as np
+from werkzeug.security import generate_password_hash
+
+import migrations
+import rollups
+from deposits import POINT_VALUE
+from id_allocator import MEMBER_SEED_SQL
+
+# Synthetic data at production scale. Members live around real kecamatan in
+# and near Tangerang Selatan; deposit activity is skewed (a few members bring
+# most of the waste), every completed deposit has its DEPOSIT savings row with
+# a consistent running balance, and some are followed by a withdrawal. Rows
+# are generated as NumPy arrays and appended in created_at order, the way the
+# app writes them, so ids and timestamps grow together.
+
+BENCH_PASSWORD = 'bench123'    # every generated member logs in with this
+
+AREAS = [
+    ('Pamulang', -6.342, 106.738), ('Ciputat', -6.309, 106.754), ('Serpong', -6.318, 106.669),
+    ('BSD', -6.302, 106.652), ('Pondok Aren', -6.268, 106.701), ('Bintaro', -6.277, 106.724),
+    ('Setu', -6.345, 106.673), ('Ciputat Timur', -6.301, 106.768), ('Pondok Cabe', -6.339, 106.764),
+    ('Cinere', -6.335, 106.784), ('Lebak Bulus', -6.289, 106.776), ('Cilandak', -6.286, 106.799),
+    ('Jagakarsa', -6.334, 106.823), ('Sawangan', -6.398, 106.775), ('Bojongsari', -6.396, 106.733),
+    ('Kebayoran Lama', -6.245, 106.776),
+]
+AREA_SPREAD = 0.015            # degrees (~1.7 km) around the area centre
+
+FIRST_NAMES = ('Budi', 'Siti', 'Agus', 'Dewi', 'Rudi', 'Sri', 'Ahmad', 'Nur', 'Eko', 'Rina', 'Joko', 'Lina',
+               'Hendra', 'Wati', 'Andi', 'Yuni', 'Dedi', 'Ratna', 'Fajar', 'Indah')
+LAST_NAMES = ('Santoso', 'Rahayu', 'Hartono', 'Wijaya', 'Saputra', 'Lestari', 'Kurniawan', 'Susanti',
+              'Pratama', 'Hidayat', 'Nugroho', 'Permata', 'Setiawan', 'Handayani', 'Fauzi', 'Putri')
+STREETS = ('Melati', 'Mawar', 'Kenanga', 'Flamboyan', 'Cempaka', 'Anggrek', 'Dahlia', 'Kamboja')
+
+# Share of generated transactions per status, and of completed deposits
+# followed by a withdrawal of half the amount
+TX_STATUS = (('COMPLETED', 0.92), ('PENDING', 0.05), ('CANCELLED', 0.03))
+WITHDRAWAL_RATE = 0.1
+PICKUP_STATUS = (('PENDING', 0.7), ('SCHEDULED', 0.1), ('COMPLETED', 0.15), ('CANCELLED', 0.05))
+
+
+def _timestamps(seconds):
+    # epoch seconds -> 'YYYY-MM-DD HH:MM:SS'
+    text = np.datetime_as_string(np.asarray(seconds, dtype='datetime64[s]'), unit='s')
+    return [s.replace('T', ' ') for s in text.tolist()]
+
+
+def _pick(rng, choices, n):
+    names = [c[0] for c in choices]
+    return np.array(names)[rng.choice(len(names), n, p=[c[1] for c in choices])]
+
+
+def _ledger(user, ts, total, completed, rng):
+    # DEPOSIT rows for completed transactions plus withdrawals, with the
+    # running balance per member. Returns the rows' arrays in time order and
+    # each member's final balance.
+    dep = np.flatnonzero(completed)
+    wd = dep[rng.random(len(dep)) < WITHDRAWAL_RATE]
+    s_user = np.concatenate([user[dep], user[wd]])
+    s_ts = np.concatenate([ts[dep], ts[wd] + rng.integers(3600, 14 * 86400, len(wd))])
+    s_ts = np.minimum(s_ts, int(time.time()))
+    s_amount = np.concatenate([total[dep], -np.round(total[wd] / 2, 2)])
+    s_ref = np.concatenate([dep, wd])
+    s_kind = np.concatenate([np.zeros(len(dep), np.int8), np.ones(len(wd), np.int8)])
+
+    # Per-member cumulative sum: sort by member then time, subtract each
+    # member's running total at its first row. A withdrawal never precedes
+    # its deposit, so balances stay non-negative.
+    order = np.lexsort((s_kind, s_ts, s_user))
+    s_user, s_ts, s_amount, s_ref, s_kind = (a[order] for a in (s_user, s_ts, s_amount, s_ref, s_kind))
+    running = np.cumsum(s_amount)
+    starts = np.flatnonzero(np.r_[True, s_user[1:] != s_user[:-1]])
+    counts = np.diff(np.r_[starts, len(s_user)])
+    base = running[starts] - s_amount[starts]
+    balance = np.round(running - np.repeat(base, counts), 2)
+    ends = starts + counts - 1
+    final = {int(s_user[e]): float(balance[e]) for e in ends}
+
+    order = np.argsort(s_ts, kind='stable')
+    return (s_user[order], s_ts[order], s_amount[order], balance[order], s_ref[order], s_kind[order]), final
+
+
+def _drop_indexes(c, table):
+    # Secondary indexes are rebuilt by sorting once at the end instead of
+    # being updated at random positions for every appended row
+    c.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+              (table,))
+    indexes = c.fetchall()
+    for name, _ in indexes:
+        c.execute(f'DROP INDEX {name}')
+    return [sql for _, sql in indexes]
+
+
+def generate(db_path, users=100000, transactions=1000000, collection_points=200, pickup_requests=20000,
+             days=730, seed=0):
+    # Appends to db_path (created and seeded like init_db if new). Returns
+    # row counts and timings.
+    from banksampah_fixed import insert_initial_data
+
+    rng = np.random.default_rng(seed)
+    started = time.perf_counter()
+    report = {}
+    now = int(time.time())
+
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.execute('PRAGMA cache_size=-262144')
+    migrations.migrate(conn)
+    insert_initial_data(conn.cursor())
+    conn.commit()
+    c = conn.cursor()
+
+    c.execute("SELECT id, name, price_per_kg FROM waste_types WHERE status = 'ACTIVE' ORDER BY id")
+    waste_types = c.fetchall()
+    c.execute(MEMBER_SEED_SQL)
+    first_number = (c.fetchone()[0] or 100000) + 1
+    c.execute("SELECT COUNT(*) FROM transactions WHERE transaction_id LIKE 'TRXB%'")
+    tx_offset = c.fetchone()[0]
+
+    # Members
+    t0 = time.perf_counter()
+    area_ix = rng.integers(0, len(AREAS), users)
+    centres = np.array([(a[1], a[2]) for a in AREAS])
+    lat = np.round(centres[area_ix, 0] + rng.normal(0, AREA_SPREAD, users), 6)
+    lon = np.round(centres[area_ix, 1] + rng.normal(0, AREA_SPREAD, users), 6)
+    lat_l, lon_l = lat.tolist(), lon.tolist()
+    joined = now - rng.integers(86400, days * 86400, users)
+    user_ids = [f'BSB{first_number + i}' for i in range(users)]
+    addresses = [f'Jl. {STREETS[i % len(STREETS)]} No. {i % 200 + 1}, {AREAS[a][0]}'
+                 for i, a in enumerate(area_ix.tolist())]
+
+    # Transactions: activity per member is gamma-distributed, each deposit
+    # falls between the member's join date and now
+    activity = rng.gamma(0.6, 1.0, users)
+    tx_user = rng.choice(users, transactions, p=activity / activity.sum())
+    tx_ts = joined[tx_user] + (rng.random(transactions) * (now - joined[tx_user])).astype(np.int64)
+    order = np.argsort(tx_ts, kind='stable')
+    tx_user, tx_ts = tx_user[order], tx_ts[order]
+    tx_type = rng.choice(len(waste_types), transactions)
+    weight = np.round(rng.gamma(2.0, 2.5, transactions) + 0.1, 2)
+    prices = np.array([w[2] for w in waste_types])
+    total = np.round(weight * prices[tx_type], 2)
+    status = _pick(rng, TX_STATUS, transactions)
+    completed = status == 'COMPLETED'
+
+    ledger, balances = _ledger(tx_user, tx_ts, total, completed, rng)
+    points = np.bincount(tx_user[completed], weights=np.floor(total[completed] / POINT_VALUE), minlength=users)
+    report['prepare_s'] = round(time.perf_counter() - t0, 2)
+
+    t0 = time.perf_counter()
+    password = generate_password_hash(BENCH_PASSWORD)
+    c.execute("BEGIN")
+    c.executemany('''INSERT INTO users (user_id, name, email, phone, password, address, balance, points,
+                                        join_date, latitude, longitude)
+                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                  ((user_ids[i], f'{FIRST_NAMES[i % 20]} {LAST_NAMES[i // 20 % 16]}',
+                    f'{user_ids[i].lower()}@bench.banksampah.id', f'08{first_number + i:010d}', password,
+                    addresses[i], balances.get(i, 0.0), int(points[i]), join[:10], la, lo)
+                   for i, (join, la, lo) in enumerate(zip(_timestamps(joined), lat_l, lon_l))))
+    c.execute('''INSERT INTO id_sequences (name, next_value) VALUES ('member', ?)
+                 ON CONFLICT(name) DO UPDATE SET next_value = MAX(next_value, excluded.next_value)''',
+              (first_number + users,))
+    report['users_s'] = round(time.perf_counter() - t0, 2)
+
+    t0 = time.perf_counter()
+    indexes = _drop_indexes(c, 'transactions') + _drop_indexes(c, 'savings')
+    tx_ids = [f'TRXB{tx_offset + i:010d}' for i in range(transactions)]
+    locations = [AREAS[a][0] for a in area_ix.tolist()]
+    c.executemany('''INSERT INTO transactions (user_id, transaction_id, waste_type_id, weight, total, location,
+                                               status, created_at)
+                     VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                  ((user_ids[u], tx_ids[i], waste_types[t][0], w, tot, locations[u], st, ts)
+                   for i, (u, t, w, tot, st, ts) in enumerate(zip(
+                       tx_user.tolist(), tx_type.tolist(), weight.tolist(), total.tolist(), status.tolist(),
+                       _timestamps(tx_ts)))))
+
+    s_user, s_ts, s_amount, s_balance, s_ref, s_kind = ledger
+    names = [w[1] for w in waste_types]
+    tx_weight, tx_type_l = weight.tolist(), tx_type.tolist()
+    c.executemany('''INSERT INTO savings (user_id, transaction_type, amount, balance_after, description,
+                                          reference_id, created_at)
+                     VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                  ((user_ids[u], 'WITHDRAWAL' if k else 'DEPOSIT', a, b,
+                    'Penarikan tunai' if k else f'Setor {tx_weight[r]:g} kg {names[tx_type_l[r]]}',
+                    tx_ids[r], ts)
+                   for u, a, b, r, k, ts in zip(s_user.tolist(), s_amount.tolist(), s_balance.tolist(),
+                                                s_ref.tolist(), s_kind.tolist(), _timestamps(s_ts))))
+    for sql in indexes:
+        c.execute(sql)
+    report['ledger_s'] = round(time.perf_counter() - t0, 2)
+
+    # Collection points around the areas, pickup requests from random
+    # members near their homes, and a week of pickup slots per area
+    t0 = time.perf_counter()
+    cp_area = rng.integers(0, len(AREAS), collection_points)
+    cp_lat = centres[cp_area, 0] + rng.normal(0, AREA_SPREAD * 2, collection_points)
+    cp_lon = centres[cp_area, 1] + rng.normal(0, AREA_SPREAD * 2, collection_points)
+    stamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    c.executemany('''INSERT INTO collection_points (name, type, address, latitude, longitude, operating_hours,
+                                                    capacity, status, created_at)
+                     VALUES (?, ?, ?, ?, ?, 'Senin-Sabtu: 08:00-17:00', ?, 'ACTIVE', ?)''',
+                  ((f'{"Bank Sampah" if i % 3 else "TPS 3R"} {AREAS[a][0]} {i + 1}', 'TPS' if i % 3 == 0 else 'BANK_SAMPAH',
+                    f'Jl. {STREETS[i % len(STREETS)]} Raya, {AREAS[a][0]}', round(la, 6), round(lo, 6),
+                    f'{i % 10 + 1} ton/hari', stamp)
+                   for i, (a, la, lo) in enumerate(zip(cp_area.tolist(), cp_lat.tolist(), cp_lon.tolist()))))
+
+    pr_user = rng.choice(users, pickup_requests)
+    pr_date = now + rng.integers(-3, 8, pickup_requests) * 86400
+    pr_created = pr_date - rng.integers(3600, 5 * 86400, pickup_requests)
+    pr_status = _pick(rng, PICKUP_STATUS, pickup_requests)
+    pr_weight = np.round(rng.gamma(2.0, 5.0, pickup_requests) + 1, 1)
+    order = np.argsort(pr_created, kind='stable')
+    c.executemany('''INSERT INTO pickup_requests (user_id, request_date, waste_types, estimated_weight, address,
+                                                  latitude, longitude, status, created_at)
+                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                  ((user_ids[u], d[:10], names[u % len(names)], w, addresses[u], lat_l[u], lon_l[u], st, cr)
+                   for u, d, w, st, cr in zip(pr_user[order].tolist(), _timestamps(pr_date[order]),
+                                              pr_weight[order].tolist(), pr_status[order].tolist(),
+                                              _timestamps(pr_created[order]))))
+
+    slots = [(f'{day[:10]}', time_of_day, area[0], f'Sopir {area[0]}', f'B {1000 + n} BSB')
+             for n, area in enumerate(AREAS)
+             for day in _timestamps(now + np.arange(7) * 86400)
+             for time_of_day in ('08:00', '13:00')]
+    c.executemany('''INSERT INTO pickup_schedules (user_id, schedule_date, schedule_time, area, driver_name,
+                                                   vehicle_number, created_at)
+                     VALUES ('ADMIN001', ?, ?, ?, ?, ?, ?)''', [(*s, stamp) for s in slots])
+    conn.commit()
+    report['other_s'] = round(time.perf_counter() - t0, 2)
+
+    t0 = time.perf_counter()
+    rollups.backfill(conn)
+    report['rollups_s'] = round(time.perf_counter() - t0, 2)
+    conn.close()
+
+    report.update(users=users, transactions=transactions, savings=len(s_user),
+                  collection_points=collection_points, pickup_requests=pickup_requests,
+                  pickup_schedules=len(slots), total_s=round(time.perf_counter() - started, 2))
+    return report
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description='Fill a database with synthetic benchmark data')
+    parser.add_argument('--db', default='bench.db')
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--transactions', type=int, default=1000000)
+    parser.add_argument('--collection-points', type=int, default=200)
+    parser.add_argument('--pickup-requests', type=int, default=20000)
+    parser.add_argument('--days', type=int, default=730, help='History length')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(generate(args.db, args.users, args.transactions, args.collection_points,
+                              args.pickup_requests, args.days, args.seed), indent=2))
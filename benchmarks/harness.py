@@ -0,0 +1,351 @@
+import http.client
+import json
+import math
+import os
+import platform
+import random
+import resource
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+from benchmarks.datagen import BENCH_PASSWORD
+
+# Drives each endpoint at a fixed concurrency and records latency
+# percentiles, throughput and peak RSS as JSON (see compare.py for diffing
+# two runs). Two modes:
+#   client: Flask test client threads in this process; no sockets, so it
+#           isolates the app's own cost.
+#   server: the app in a separate process behind werkzeug's threaded server,
+#           driven over keep-alive HTTP; adds parsing and socket overhead and
+#           measures the server's RSS rather than the load generator's.
+# The deposit and login scenarios write, so point --db at a fresh copy of the
+# generated database (without its -wal/-shm files) for runs to be comparable.
+
+ADMIN = ('admin@banksampah.com', 'admin123')
+SEARCH_TERMS = ('plastik', 'kardus', 'kompos', 'botol', 'daur ulang', 'kaleng')
+
+# name: (method, path template, role, JSON body template or None). Templates
+# are filled per request from a randomly chosen member (user_id, area, lat,
+# lon), waste type and search term, so caches see realistic key spread.
+SCENARIOS = {
+    'waste_types': ('GET', '/api/waste-types', None, None),
+    'collection_points': ('GET', '/api/collection-points', None, None),
+    'nearest': ('GET', '/api/collection-points/nearest?lat={lat}&lon={lon}', None, None),
+    'news': ('GET', '/api/news', None, None),
+    'search': ('GET', '/api/search?q={term}', None, None),
+    'price_history': ('GET', '/api/waste-types/{waste_type_id}/price-history', None, None),
+    'leaderboard': ('GET', '/api/leaderboard', None, None),
+    'me': ('GET', '/api/me', 'member', None),
+    'member_transactions': ('GET', '/api/users/{user_id}/transactions', 'admin', None),
+    'member_savings': ('GET', '/api/users/{user_id}/savings', 'admin', None),
+    'member_rank': ('GET', '/api/users/{user_id}/rank', 'admin', None),
+    'statistics': ('GET', '/api/statistics', 'admin', None),
+    'analytics': ('GET', '/api/admin/analytics', 'admin', None),
+    'deposit': ('POST', '/api/transactions/deposit', 'admin',
+                {'user_id': '{user_id}', 'waste_type_id': '{waste_type_id}', 'weight': 2.5, 'location': '{area}'}),
+    'login': ('POST', '/api/login', None, {'email': '{email}', 'password': BENCH_PASSWORD}),
+}
+
+
+def percentile(ordered, p):
+    # Nearest-rank percentile of an already sorted list
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(p / 100.0 * len(ordered)) - 1)]
+
+
+def peak_rss_mb(pid=None):
+    # VmHWM is resettable per scenario (see reset_peak_rss); ru_maxrss is the
+    # fallback for our own process
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if pid is None:
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return None
+
+
+def reset_peak_rss(pid=None):
+    try:
+        with open(f"/proc/{pid or 'self'}/clear_refs", 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def load_context(db_path, sample=1000, seed=0):
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    c = conn.cursor()
+    c.execute("SELECT COUNT(*) FROM users WHERE is_admin = 0")
+    members = c.fetchone()[0]
+    # Random ids from the rowid range rather than ORDER BY RANDOM() over the table
+    c.execute("SELECT MIN(id), MAX(id) FROM users")
+    low, high = c.fetchone()
+    rng = random.Random(seed)
+    ids = sorted({rng.randint(low, high) for _ in range(sample * 2)})
+    c.execute(f"SELECT user_id, email, address, latitude, longitude FROM users "
+              f"WHERE is_admin = 0 AND status = 'ACTIVE' AND email LIKE '%@bench.banksampah.id' "
+              f"AND id IN ({','.join('?' * len(ids))})", ids)
+    users = [{'user_id': r[0], 'email': r[1], 'area': r[2].rsplit(', ', 1)[-1],
+              'lat': r[3] if r[3] is not None else -6.3, 'lon': r[4] if r[4] is not None else 106.7}
+             for r in c.fetchall()[:sample]]
+    c.execute("SELECT id FROM waste_types WHERE status = 'ACTIVE'")
+    waste_types = [r[0] for r in c.fetchall()]
+    dataset = {}
+    # MAX(id) as a cheap row count; the generator never deletes
+    for table in ('users', 'transactions', 'savings', 'collection_points', 'pickup_requests'):
+        c.execute(f"SELECT MAX(id) FROM {table}")
+        dataset[table] = c.fetchone()[0] or 0
+    conn.close()
+    if not users:
+        raise SystemExit('Database has no generated members; run python -m benchmarks.datagen first')
+    return {'users': users, 'waste_types': waste_types, 'members': members, 'dataset': dataset}
+
+
+def _fill(template, values):
+    if isinstance(template, str):
+        return template.format(**values)
+    if isinstance(template, dict):
+        return {k: _fill(v, values) for k, v in template.items()}
+    return template
+
+
+def _values(context, rng):
+    user = rng.choice(context['users'])
+    return dict(user, waste_type_id=rng.choice(context['waste_types']), term=rng.choice(SEARCH_TERMS))
+
+
+class TestClientDriver:
+    def __init__(self, app):
+        self.app = app
+
+    def session(self):
+        client = self.app.test_client()
+
+        def send(method, path, headers, body):
+            resp = client.open(path, method=method, headers=headers, json=body)
+            resp.get_data()
+            return resp.status_code, resp.get_json(silent=True)
+        return send
+
+
+class HttpDriver:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+
+    def session(self):
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+
+        def send(method, path, headers, body):
+            headers = dict(headers)
+            data = None
+            if body is not None:
+                data = json.dumps(body)
+                headers['Content-Type'] = 'application/json'
+            conn.request(method, path, body=data, headers=headers)
+            resp = conn.getresponse()
+            raw = resp.read()
+            try:
+                payload = json.loads(raw) if resp.getheader('Content-Type', '').startswith('application/json') else None
+            except ValueError:
+                payload = None
+            return resp.status, payload
+        return send
+
+
+def login(driver, email, password):
+    status, payload = driver.session()('POST', '/api/login', {}, {'email': email, 'password': password})
+    if status != 200 or not (payload or {}).get('success'):
+        raise SystemExit(f'Login as {email} failed ({status})')
+    return {'Authorization': f"Bearer {payload['access_token']}"}
+
+
+def run_scenario(driver, scenario, context, tokens, requests, concurrency, warmup=10, seed=0, pid=None):
+    method, path, role, body = SCENARIOS[scenario]
+    headers = tokens.get(role, {})
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker(n):
+        rng = random.Random(seed * 1000 + n)
+        send = driver.session()
+        local, failed = [], 0
+        for _ in range(warmup if n == 0 else 0):
+            values = _values(context, rng)
+            send(method, _fill(path, values), headers, _fill(body, values))
+        barrier.wait()
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    break
+            values = _values(context, rng)
+            req_path, req_body = _fill(path, values), _fill(body, values)
+            started = time.perf_counter()
+            try:
+                status, _ = send(method, req_path, headers, req_body)
+            except Exception:
+                status = 599
+            local.append(time.perf_counter() - started)
+            if status >= 400:
+                failed += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    barrier = threading.Barrier(concurrency + 1)
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for t in threads:
+        t.start()
+    reset_peak_rss(pid)
+    barrier.wait()
+    started = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    ms = lambda v: round(v * 1000, 3) if v is not None else None
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'mean_ms': ms(sum(latencies) / len(latencies)) if latencies else None,
+        'max_ms': ms(latencies[-1]) if latencies else None,
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'peak_rss_mb': peak_rss_mb(pid),
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _start_server(db_path, port):
+    proc = subprocess.Popen([sys.executable, '-m', 'benchmarks.harness', 'serve', '--db', db_path,
+                             '--port', str(port)],
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit('Benchmark server exited during startup')
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/api/test')
+            conn.getresponse().read()
+            conn.close()
+            return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise SystemExit('Benchmark server did not start')
+
+
+def serve(db_path, port):
+    from werkzeug.serving import WSGIRequestHandler, run_simple
+    import banksampah_fixed
+
+    class KeepAliveHandler(WSGIRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_request(self, *args, **kwargs):
+            pass
+
+    banksampah_fixed.app.config['DATABASE'] = db_path
+    run_simple('127.0.0.1', port, banksampah_fixed.app, threaded=True, request_handler=KeepAliveHandler)
+
+
+def benchmark(db_path, scenarios=None, mode='client', concurrency=4, requests=500, warmup=10, port=5055, seed=0):
+    context = load_context(db_path, seed=seed)
+    scenarios = scenarios or list(SCENARIOS)
+    proc = None
+    if mode == 'server':
+        proc = _start_server(db_path, port)
+        driver, pid = HttpDriver('127.0.0.1', port), proc.pid
+    else:
+        import banksampah_fixed
+        banksampah_fixed.app.config['DATABASE'] = db_path
+        driver, pid = TestClientDriver(banksampah_fixed.app), None
+
+    try:
+        tokens = {'admin': login(driver, *ADMIN), 'member': login(driver, context['users'][0]['email'],
+                                                                   BENCH_PASSWORD)}
+        results = {}
+        for name in scenarios:
+            results[name] = run_scenario(driver, name, context, tokens, requests, concurrency,
+                                         warmup=warmup, seed=seed, pid=pid)
+            print(f"{name:22s} p50 {results[name]['p50_ms']:>9} ms  p99 {results[name]['p99_ms']:>9} ms  "
+                  f"{results[name]['throughput_rps']:>8} req/s  errors {results[name]['errors']}",
+                  file=sys.stderr)
+        peak = peak_rss_mb(pid)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    return {
+        'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'mode': mode,
+        'concurrency': concurrency,
+        'requests': requests,
+        'dataset': dict(context['dataset'], members=context['members']),
+        'peak_rss_mb': peak,
+        'scenarios': results,
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark the API against a generated database')
+    sub = parser.add_subparsers(dest='command')
+    run = sub.add_parser('run', help='Run the benchmark (default)')
+    srv = sub.add_parser('serve', help='Serve the app for --mode server (used internally)')
+    for p in (parser, run):
+        p.add_argument('--db', default='bench.db')
+        p.add_argument('--mode', choices=('client', 'server'), default='client')
+        p.add_argument('--concurrency', type=int, default=4)
+        p.add_argument('--requests', type=int, default=500, help='Measured requests per scenario')
+        p.add_argument('--warmup', type=int, default=10)
+        p.add_argument('--scenarios', help='Comma-separated subset of: ' + ', '.join(SCENARIOS))
+        p.add_argument('--port', type=int, default=5055)
+        p.add_argument('--seed', type=int, default=0)
+        p.add_argument('--out', help='Write the JSON baseline here instead of stdout')
+    srv.add_argument('--db', default='bench.db')
+    srv.add_argument('--port', type=int, default=5055)
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        serve(args.db, args.port)
+        sys.exit(0)
+    selected = args.scenarios.split(',') if args.scenarios else None
+    unknown = set(selected or ()) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+    report = benchmark(os.path.abspath(args.db), selected, args.mode, args.concurrency, args.requests,
+                       args.warmup, args.port, args.seed)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
@@ -0,0 +1,166 @@
+import multiprocessing
+import random
+import sqlite3
+import threading
+import time
+
+import bulk_import
+from benchmarks.datagen import BENCH_PASSWORD
+from benchmarks.harness import ADMIN, SCENARIOS, TestClientDriver, _fill, _values, load_context, login, percentile
+
+# Read throughput while bulk imports hammer the write path, with the read
+# pool split on and off. Reader threads loop on one GET scenario while the
+# main thread alternates quiet and burst periods; during a burst, writers
+# post deposit batches back to back. Each read is attributed to the period it
+# started in. Writers are either
+#   app:     threads posting /api/transactions/bulk to the same app, so they
+#            share its pools (and GIL) with the readers, or
+#   process: separate processes importing straight into the database file,
+#            like a batch job next to the web server.
+
+
+def _summary(latencies, seconds):
+    latencies.sort()
+    ms = lambda v: round(v * 1000, 3) if v is not None else None
+    return {'reads': len(latencies), 'throughput_rps': round(len(latencies) / seconds, 1) if seconds else None,
+            'p50_ms': ms(percentile(latencies, 50)), 'p99_ms': ms(percentile(latencies, 99)),
+            'max_ms': ms(latencies[-1] if latencies else None)}
+
+
+def _batch(context, rng, tag, batch_rows):
+    return [{'transaction_id': f'{tag}-{i}', 'user_id': u['user_id'],
+             'waste_type_id': rng.choice(context['waste_types']), 'weight': round(rng.uniform(0.5, 20), 2),
+             'location': u['area']}
+            for i, u in enumerate(rng.choice(context['users']) for _ in range(batch_rows))]
+
+
+def _process_writer(db_path, context, batch_rows, seed, burst, stop, written):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    batch = 0
+    while not stop.is_set():
+        if not burst.wait(0.1):
+            continue
+        batch += 1
+        _, posted = bulk_import.import_deposits(conn, _batch(context, rng, f'BURST{seed}P{batch}', batch_rows))
+        with written.get_lock():
+            written.value += len(posted)
+    conn.close()
+
+
+def run(app, context, split, scenario='member_savings', readers=8, writers=4, batch_rows=500,
+        duration=12.0, period=2.0, seed=0, writer='app'):
+    app.config['DB_READ_SPLIT'] = split
+    driver = TestClientDriver(app)
+    tokens = {'admin': login(driver, *ADMIN), 'member': login(driver, context['users'][0]['email'], BENCH_PASSWORD)}
+    method, path, role, body = SCENARIOS[scenario]
+    headers = tokens.get(role, {})
+
+    state = {'burst': False}
+    samples = {False: [], True: []}
+    phase_time = {False: 0.0, True: 0.0}
+    written = [0]
+    errors = [0]
+    lock = threading.Lock()
+    stop = threading.Event()
+    burst_on = threading.Event()
+
+    def reader(n):
+        rng = random.Random(seed * 1000 + n)
+        send = driver.session()
+        while not stop.is_set():
+            values = _values(context, rng)
+            bursting = state['burst']
+            started = time.perf_counter()
+            status, _ = send(method, _fill(path, values), headers, _fill(body, values))
+            elapsed = time.perf_counter() - started
+            with lock:
+                samples[bursting].append(elapsed)
+                if status >= 400:
+                    errors[0] += 1
+
+    def app_writer(n):
+        rng = random.Random(seed * 1000 + 500 + n)
+        send = driver.session()
+        batch = 0
+        while not stop.is_set():
+            if not burst_on.wait(0.1):
+                continue
+            batch += 1
+            rows = _batch(context, rng, f'BURST{seed}{int(split)}A{n}-{batch}', batch_rows)
+            status, payload = send('POST', '/api/transactions/bulk', tokens['admin'], rows)
+            with lock:
+                if status < 400:
+                    written[0] += payload['summary']['posted']
+                else:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=reader, args=(n,)) for n in range(readers)]
+    processes = []
+    if writer == 'app':
+        threads += [threading.Thread(target=app_writer, args=(n,)) for n in range(writers)]
+    else:
+        mp = multiprocessing.get_context('spawn')
+        burst_on, stop_all, counter = mp.Event(), mp.Event(), mp.Value('i', 0)
+        processes = [mp.Process(target=_process_writer,
+                                args=(app.config['DATABASE'], context, batch_rows,
+                                      seed * 1000 + 100 * int(split) + n, burst_on, stop_all, counter))
+                     for n in range(writers)]
+        for p in processes:
+            p.start()
+    for t in threads:
+        t.start()
+    end = time.perf_counter() + duration
+    bursting = False
+    while time.perf_counter() < end:
+        started = time.perf_counter()
+        time.sleep(min(period, end - started))
+        phase_time[bursting] += time.perf_counter() - started
+        bursting = not bursting
+        state['burst'] = bursting
+        if bursting:
+            burst_on.set()
+        else:
+            burst_on.clear()
+    stop.set()
+    burst_on.clear()
+    for t in threads:
+        t.join()
+    if processes:
+        stop_all.set()
+        for p in processes:
+            p.join()
+        written[0] = counter.value
+
+    quiet, burst = _summary(samples[False], phase_time[False]), _summary(samples[True], phase_time[True])
+    return {'split': split, 'writer': writer, 'quiet': quiet, 'burst': burst, 'rows_written': written[0], 'errors': errors[0],
+            'burst_vs_quiet_throughput': round(burst['throughput_rps'] / quiet['throughput_rps'], 2)
+            if quiet['throughput_rps'] and burst['throughput_rps'] else None}
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+    import os
+
+    parser = argparse.ArgumentParser(description='Read throughput during bulk write bursts, read pool split on/off')
+    parser.add_argument('--db', default='bench.db', help='Generated database (use a copy, bursts write to it)')
+    parser.add_argument('--scenario', default='member_savings', choices=[n for n, s in SCENARIOS.items()
+                                                                         if s[0] == 'GET'])
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--batch-rows', type=int, default=500, help='Deposits per bulk request')
+    parser.add_argument('--duration', type=float, default=12.0, help='Seconds per mode')
+    parser.add_argument('--period', type=float, default=2.0, help='Seconds per quiet/burst period')
+    parser.add_argument('--modes', default='off,on', help='Read split modes to run, in order')
+    parser.add_argument('--writer', choices=('app', 'process'), default='app')
+    args = parser.parse_args()
+
+    import banksampah_fixed
+    banksampah_fixed.app.config['DATABASE'] = os.path.abspath(args.db)
+    context = load_context(os.path.abspath(args.db))
+    results = [run(banksampah_fixed.app, context, mode == 'on', args.scenario, args.readers, args.writers,
+                   args.batch_rows, args.duration, args.period, writer=args.writer)
+               for mode in args.modes.split(',')]
+    print(json.dumps(results, indent=2))
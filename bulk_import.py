@@ -0,0 +1,290 @@
+import csv
+import json
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from werkzeug.security import generate_password_hash
+
+import ledger_archive
+from deposits import DepositError, normalize_deposit, price_deposit
+
+MEMBER_FIELDS = ('name', 'email', 'phone', 'password', 'address')
+
+FORMATS = ('csv', 'jsonl', 'json')
+
+
+def read_rows(stream, fmt):
+    # Yields dicts from a CSV (with header), JSON-lines or JSON-array stream
+    if fmt == 'csv':
+        for row in csv.DictReader(stream):
+            yield {k.strip(): (v.strip() if isinstance(v, str) else v) for k, v in row.items() if k}
+    elif fmt == 'jsonl':
+        for line in stream:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+    elif fmt == 'json':
+        data = json.load(stream)
+        if isinstance(data, dict):
+            data = data.get('deposits') or data.get('members') or []
+        if not isinstance(data, list):
+            raise ValueError('JSON body must be an array of rows')
+        yield from data
+    else:
+        raise ValueError(f'Unknown format: {fmt}')
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _placeholders(n):
+    return ','.join('?' * n)
+
+
+def import_deposits(conn, rows, chunk_size=500):
+    # Validate, price and post deposits in chunked transactions. Idempotent on
+    # transaction_id: rows already in `transactions` (or in an archived year)
+    # come back as DUPLICATE. Rows dated in an archived year are rejected.
+    # A created_at given in the file must not be before the member's latest
+    # savings entry. Returns (per-row results, posted deposits).
+    c = conn.cursor()
+    c.execute("SELECT id, name, price_per_kg FROM waste_types WHERE status = 'ACTIVE'")
+    waste_types = {row[0]: (row[1], row[2]) for row in c.fetchall()}
+
+    results = []
+    pending = []
+    seen = set()
+    for number, data in enumerate(rows, start=1):
+        result = {'row': number, 'transaction_id': data.get('transaction_id') if isinstance(data, dict) else None}
+        results.append(result)
+        try:
+            if not isinstance(data, dict) or not data.get('transaction_id'):
+                raise DepositError('transaction_id wajib diisi')
+            deposit = normalize_deposit(data)
+            if deposit['waste_type_id'] not in waste_types:
+                raise DepositError('Jenis sampah tidak ditemukan')
+            name, price = waste_types[deposit['waste_type_id']]
+            deposit['total'], deposit['points'] = price_deposit(deposit['weight'], price)
+        except DepositError as e:
+            result.update(status='ERROR', message=str(e))
+            continue
+        if deposit['transaction_id'] in seen:
+            result.update(status='DUPLICATE', message='Duplikat dalam file')
+            continue
+        seen.add(deposit['transaction_id'])
+        deposit['waste_type'] = name
+        pending.append((deposit, result))
+
+    posted = []
+    for chunk in _chunks(pending, chunk_size):
+        posted.extend(_post_chunk(conn, chunk))
+    return results, posted
+
+
+def _post_chunk(conn, chunk):
+    c = conn.cursor()
+    ids = [d['transaction_id'] for d, _ in chunk]
+    user_ids = sorted({d['user_id'] for d, _ in chunk})
+    try:
+        c.execute("BEGIN IMMEDIATE")
+        c.execute(f"SELECT transaction_id FROM transactions WHERE transaction_id IN ({_placeholders(len(ids))})", ids)
+        existing = {row[0] for row in c.fetchall()}
+        c.execute(f"SELECT transaction_id FROM archived_transaction_ids WHERE transaction_id IN ({_placeholders(len(ids))})",
+                  ids)
+        existing.update(row[0] for row in c.fetchall())
+        hot_from = ledger_archive.hot_from(conn)
+        c.execute(f"SELECT user_id, balance FROM users WHERE status = 'ACTIVE' AND user_id IN ({_placeholders(len(user_ids))})",
+                  user_ids)
+        balances = {row[0]: row[1] for row in c.fetchall()}
+        # balance_after follows posting order, so a row dated before the
+        # member's last savings entry would break the running balance
+        c.execute(f"SELECT user_id, MAX(created_at) FROM savings WHERE user_id IN ({_placeholders(len(user_ids))}) "
+                  f"GROUP BY user_id", user_ids)
+        latest = dict(c.fetchall())
+
+        tx_rows, savings_rows, points, accepted = [], [], {}, []
+        for deposit, result in chunk:
+            if deposit['transaction_id'] in existing:
+                result.update(status='DUPLICATE', message='Transaksi sudah tercatat')
+                continue
+            user_id = deposit['user_id']
+            if user_id not in balances:
+                result.update(status='ERROR', message='Pengguna tidak ditemukan')
+                continue
+            if hot_from and deposit['created_at'] < hot_from:
+                result.update(status='ERROR', message='Tahun setoran sudah diarsipkan')
+                continue
+            if deposit['client_time'] and deposit['created_at'] < (latest.get(user_id) or ''):
+                result.update(status='ERROR', message='Tanggal lebih awal dari mutasi tabungan terakhir anggota')
+                continue
+            latest[user_id] = max(latest.get(user_id) or '', deposit['created_at'])
+            balances[user_id] += deposit['total']
+            deposit['balance_after'] = balances[user_id]
+            points[user_id] = points.get(user_id, 0) + deposit['points']
+            tx_rows.append((user_id, deposit['transaction_id'], deposit['waste_type_id'], deposit['weight'],
+                            deposit['total'], deposit['location'], deposit['notes'], deposit['created_at']))
+            savings_rows.append((user_id, deposit['total'], deposit['balance_after'],
+                                 f"Setor {deposit['weight']:g} kg {deposit['waste_type']}",
+                                 deposit['transaction_id'], deposit['created_at']))
+            accepted.append((deposit, result))
+
+        c.executemany('''INSERT INTO transactions
+                        (user_id, transaction_id, waste_type_id, weight, total, location, status, notes, created_at)
+                        VALUES (?, ?, ?, ?, ?, ?, 'COMPLETED', ?, ?)''', tx_rows)
+        c.executemany('''INSERT INTO savings
+                        (user_id, transaction_type, amount, balance_after, description, reference_id, created_at)
+                        VALUES (?, 'DEPOSIT', ?, ?, ?, ?, ?)''', savings_rows)
+        c.executemany("UPDATE users SET balance = ?, points = points + ? WHERE user_id = ?",
+                      [(balances[u], p, u) for u, p in points.items()])
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        for _, result in chunk:
+            if 'status' not in result:
+                result.update(status='ERROR', message=f'Gagal menyimpan: {e}')
+        return []
+
+    posted = []
+    for deposit, result in accepted:
+        deposit['status'] = 'COMPLETED'
+        result.update(status='POSTED', total=deposit['total'], balance_after=deposit['balance_after'])
+        posted.append(deposit)
+    return posted
+
+
+def import_members(conn, rows, allocator, chunk_size=500, hash_workers=4):
+    # Register members in chunks. Emails already registered (or repeated in
+    # the file) come back as DUPLICATE; the UNIQUE constraint on email is the
+    # final arbiter if a concurrent /api/register wins the race.
+    results = []
+    pending = []
+    seen = set()
+    for number, data in enumerate(rows, start=1):
+        result = {'row': number, 'email': data.get('email') if isinstance(data, dict) else None}
+        results.append(result)
+        if not isinstance(data, dict) or not all(data.get(k) for k in MEMBER_FIELDS):
+            result.update(status='ERROR', message='Data tidak lengkap')
+            continue
+        member = {k: str(data[k]).strip() for k in MEMBER_FIELDS}
+        if member['email'] in seen:
+            result.update(status='DUPLICATE', message='Duplikat dalam file')
+            continue
+        seen.add(member['email'])
+        pending.append((member, result))
+
+    # Password hashing runs in OpenSSL without the GIL, so it parallelizes on threads
+    with ThreadPoolExecutor(max_workers=hash_workers) as executor:
+        for chunk in _chunks(pending, chunk_size):
+            _register_chunk(conn, chunk, allocator, executor)
+    return results
+
+
+def _register_chunk(conn, chunk, allocator, executor):
+    c = conn.cursor()
+    emails = [m['email'] for m, _ in chunk]
+    c.execute(f"SELECT email FROM users WHERE email IN ({_placeholders(len(emails))})", emails)
+    existing = {row[0] for row in c.fetchall()}
+    fresh = []
+    for member, result in chunk:
+        if member['email'] in existing:
+            result.update(status='DUPLICATE', message='Email sudah terdaftar')
+        else:
+            fresh.append((member, result))
+    if not fresh:
+        return
+
+    hashes = list(executor.map(generate_password_hash, [m['password'] for m, _ in fresh]))
+    # Allocate outside the write transaction: the allocator commits on its own connection
+    user_ids = allocator.take(len(fresh))
+    join_date = datetime.now().strftime('%Y-%m-%d')
+    rows = [(user_id, m['name'], m['email'], m['phone'], hashed, m['address'], join_date)
+            for (m, _), user_id, hashed in zip(fresh, user_ids, hashes)]
+    sql = '''INSERT INTO users (user_id, name, email, phone, password, address, join_date)
+             VALUES (?, ?, ?, ?, ?, ?, ?)'''
+
+    try:
+        c.execute("BEGIN IMMEDIATE")
+        c.executemany(sql, rows)
+        conn.commit()
+        for (_, result), row in zip(fresh, rows):
+            result.update(status='POSTED', user_id=row[0])
+        return
+    except sqlite3.IntegrityError:
+        conn.rollback()
+
+    # Someone registered one of these emails meanwhile: go row by row
+    for (_, result), row in zip(fresh, rows):
+        try:
+            c.execute(sql, row)
+            conn.commit()
+            result.update(status='POSTED', user_id=row[0])
+        except sqlite3.IntegrityError:
+            conn.rollback()
+            result.update(status='DUPLICATE', message='Email sudah terdaftar')
+
+
+def summarize(results):
+    summary = {'total': len(results), 'posted': 0, 'duplicate': 0, 'error': 0}
+    for result in results:
+        summary[result.get('status', 'ERROR').lower()] += 1
+    return summary
+
+
+def format_from_filename(path):
+    if path.endswith('.csv'):
+        return 'csv'
+    if path.endswith('.json'):
+        return 'json'
+    return 'jsonl'
+
+
+if __name__ == '__main__':
+    import argparse
+    from db_pool import ConnectionPool
+
+    parser = argparse.ArgumentParser(description='Import weigh-station slips into the ledger')
+    sub = parser.add_subparsers(dest='command', required=True)
+    dep = sub.add_parser('deposits', help='Import deposits (CSV, JSON lines or JSON array)')
+    dep.add_argument('file', help="Input file, or '-' for stdin")
+    dep.add_argument('--format', choices=FORMATS)
+    dep.add_argument('--db', default='banksampah_complete.db')
+    dep.add_argument('--chunk-size', type=int, default=500)
+    dep.add_argument('--results', help='Write per-row results as JSON lines to this file')
+    mem = sub.add_parser('members', help='Import members (CSV with name,email,phone,password,address)')
+    mem.add_argument('file', help="Input file, or '-' for stdin")
+    mem.add_argument('--format', choices=FORMATS)
+    mem.add_argument('--db', default='banksampah_complete.db')
+    mem.add_argument('--chunk-size', type=int, default=500)
+    mem.add_argument('--results', help='Write per-row results as JSON lines to this file')
+    args = parser.parse_args()
+
+    fmt = args.format or ('csv' if args.file == '-' and args.command == 'members'
+                          else 'jsonl' if args.file == '-' else format_from_filename(args.file))
+    stream = sys.stdin if args.file == '-' else open(args.file, encoding='utf-8', newline='')
+    pool = ConnectionPool(args.db, max_size=2)
+    conn = pool.acquire()
+    try:
+        if args.command == 'deposits':
+            results, _ = import_deposits(conn, read_rows(stream, fmt), chunk_size=args.chunk_size)
+        else:
+            from id_allocator import IdAllocator, MEMBER_SEED_SQL
+            allocator = IdAllocator(pool.acquire, 'member', 'BSB', seed_sql=MEMBER_SEED_SQL, first_value=100001)
+            results = import_members(conn, read_rows(stream, fmt), allocator, chunk_size=args.chunk_size)
+    finally:
+        conn.close()
+        pool.close_all()
+        stream.close()
+
+    if args.results:
+        with open(args.results, 'w', encoding='utf-8') as out:
+            for result in results:
+                out.write(json.dumps(result) + '\n')
+    else:
+        for result in results:
+            if result['status'] == 'ERROR':
+                print(f"Baris {result['row']}: {result['message']}")
+    print(json.dumps(summarize(results)))
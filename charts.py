@@ -0,0 +1,250 @@
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+# Charts are drawn in worker processes: pyplot keeps global state and isn't
+# thread-safe, and a render holds the GIL for hundreds of milliseconds. The
+# request thread only gathers the (small) data series, derives the cache key
+# from spec + format + data, and waits on the worker when nothing is cached.
+# Rendered images are kept in an in-memory LRU and in a size-capped disk
+# cache that survives restarts.
+
+FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml'}
+SPECS = ('monthly-tonnage', 'price-trend', 'member-growth')
+
+
+class RenderError(Exception):
+    pass
+
+
+def chart_key(spec, fmt, data):
+    # The data is part of the key, so new data is a new version of the chart
+    payload = json.dumps([spec, fmt, data], sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+
+def render(spec, fmt, data):
+    # Runs in a worker process
+    import reporting
+    plt = reporting.pyplot()
+    fig, ax = plt.subplots(figsize=(8, 4), dpi=100)
+    try:
+        if spec == 'monthly-tonnage':
+            ax.bar(data['labels'], data['values'], color='#2e7d32')
+            ax.set_title('Tonase Sampah per Bulan')
+            ax.set_ylabel('kg')
+        elif spec == 'member-growth':
+            ax.plot(data['labels'], data['values'], marker='o', color='#1565c0')
+            ax.set_title('Pertumbuhan Anggota')
+            ax.set_ylabel('Anggota')
+        elif spec == 'price-trend':
+            for series in data['series']:
+                dates = [datetime.fromisoformat(d) for d in series['dates']]
+                ax.step(dates, series['prices'], where='post', label=series['name'])
+            ax.set_title('Tren Harga Sampah')
+            ax.set_ylabel('Rp/kg')
+            if data['series']:
+                ax.legend(fontsize='small', loc='upper left')
+        else:
+            raise ValueError(f'Unknown chart {spec}')
+        ax.tick_params(axis='x', labelrotation=45)
+        ax.grid(axis='y', alpha=0.3)
+        fig.tight_layout()
+        buf = io.BytesIO()
+        # No timestamp in the SVG metadata so identical data gives identical bytes
+        fig.savefig(buf, format=fmt, metadata={'Date': None} if fmt == 'svg' else None)
+        return buf.getvalue()
+    finally:
+        plt.close(fig)
+
+
+class ChartService:
+    def __init__(self, cache_dir, max_memory_bytes=32 * 1024 * 1024, max_disk_bytes=256 * 1024 * 1024,
+                 workers=2, render_timeout=30.0):
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.workers = workers
+        self.render_timeout = render_timeout
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = None
+        self._rendering = {}
+        self._executor = None
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.renders = 0
+
+    def get(self, spec, fmt, data, key=None):
+        # Returns (key, image bytes); the key doubles as the ETag
+        key = key or chart_key(spec, fmt, data)
+        with self._lock:
+            body = self._memory.get(key)
+            if body is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return key, body
+
+        path = os.path.join(self.cache_dir, f'{key}.{fmt}')
+        try:
+            with open(path, 'rb') as f:
+                body = f.read()
+            os.utime(path)
+            with self._lock:
+                self.disk_hits += 1
+            self._remember(key, body)
+            return key, body
+        except FileNotFoundError:
+            pass
+
+        # Concurrent requests for the same chart share one render; the result
+        # is cached by the completion callback even if every waiter timed out.
+        # A worker that dies mid-render (killed, out of memory) breaks the
+        # whole pool: start a fresh one and render once more.
+        for attempt in range(2):
+            with self._lock:
+                future = self._rendering.get(key)
+                submitted = future is None
+                if submitted:
+                    try:
+                        executor = self._pool()
+                        future = executor.submit(render, spec, fmt, data)
+                    except BrokenProcessPool:
+                        self._executor = None
+                        executor = self._pool()
+                        future = executor.submit(render, spec, fmt, data)
+                    future.executor = executor
+                    self._rendering[key] = future
+                    self.renders += 1
+            if submitted:
+                future.add_done_callback(lambda f: self._finish(key, path, f))
+            try:
+                return key, future.result(self.render_timeout)
+            except BrokenProcessPool as e:
+                with self._lock:
+                    if self._rendering.get(key) is future:
+                        del self._rendering[key]
+                    if self._executor is getattr(future, 'executor', None):
+                        self._executor.shutdown(wait=False, cancel_futures=True)
+                        self._executor = None
+                if attempt:
+                    raise RenderError('Chart worker died twice') from e
+            except FutureTimeout:
+                raise
+            except Exception as e:
+                raise RenderError(f'Rendering {spec} failed') from e
+
+    def _pool(self):
+        # spawn, not fork: the web process has threads (pool, writers) and
+        # forking those is unsafe. Called with the lock held.
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    def _finish(self, key, path, future):
+        try:
+            if not future.cancelled() and future.exception() is None:
+                body = future.result()
+                self._remember(key, body)
+                self._store(path, body)
+        finally:
+            with self._lock:
+                self._rendering.pop(key, None)
+
+    def _remember(self, key, body):
+        if len(body) > self.max_memory_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= len(old)
+            self._memory[key] = body
+            self._memory_bytes += len(body)
+            while self._memory_bytes > self.max_memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    def _store(self, path, body):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(body)
+        os.replace(tmp, path)
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(e.stat().st_size for e in self._entries())
+            else:
+                self._disk_bytes += len(body)
+            over = self._disk_bytes > self.max_disk_bytes
+        if over:
+            self._trim_disk()
+
+    def _entries(self):
+        try:
+            return [e for e in os.scandir(self.cache_dir)
+                    if e.is_file() and e.name.rsplit('.', 1)[-1] in FORMATS]
+        except FileNotFoundError:
+            return []
+
+    def _trim_disk(self):
+        # Least recently used first (hits touch the file); trim to 90% of the cap
+        entries = sorted(self._entries(), key=lambda e: e.stat().st_mtime)
+        total = sum(e.stat().st_size for e in entries)
+        target = self.max_disk_bytes * 0.9
+        for entry in entries:
+            if total <= target:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                total -= size
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._disk_bytes = total
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self):
+        with self._lock:
+            return {'memory_entries': len(self._memory), 'memory_bytes': self._memory_bytes,
+                    'disk_bytes': self._disk_bytes, 'rendering': len(self._rendering),
+                    'memory_hits': self.memory_hits, 'disk_hits': self.disk_hits, 'renders': self.renders}
+
+
+def monthly_series(rows, column):
+    return {'labels': [row['period'] for row in rows], 'values': [row[column] for row in rows]}
+
+
+def price_series(index, waste_types, date_from, date_to):
+    # Step series per waste type clipped to [date_from, date_to]
+    series = []
+    for wt_id, name in waste_types:
+        history = index.history(wt_id)
+        if not history:
+            continue
+        dates, prices = [], []
+        for interval in history:
+            start = max((interval['from'] or date_from)[:10], date_from)
+            end = (interval['to'] or date_to)[:10]
+            if end < date_from or start > date_to:
+                continue
+            dates.append(start)
+            prices.append(interval['price_per_kg'])
+        if dates:
+            dates.append(date_to)
+            prices.append(prices[-1])
+            series.append({'name': name, 'dates': dates, 'prices': prices})
+    return {'series': series}
@@ -0,0 +1,122 @@
+import threading
+import traceback
+
+# Columns that may be incremented through the buffer: table -> columns
+COUNTERS = {
+    'news': ('views',),
+    'education_materials': ('views', 'likes'),
+}
+
+
+class CounterBuffer:
+    # Write-behind aggregation of view/like counters. Increments accumulate
+    # in memory per row and are flushed as one batched UPDATE transaction
+    # every `flush_interval` seconds, or sooner once `max_pending` rows are
+    # dirty. Reads add pending (and in-flight) deltas to the stored value.
+
+    def __init__(self, connect, flush_interval=5.0, max_pending=1000):
+        self.connect = connect
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self.flushes = 0
+        self.flushed_rows = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name='counter-flush', daemon=True)
+                self._thread.start()
+
+    def increment(self, table, column, row_id, amount=1):
+        if column not in COUNTERS.get(table, ()):
+            raise ValueError(f'{table}.{column} is not a buffered counter')
+        key = (table, column, row_id)
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + amount
+            dirty = len(self._pending)
+        self.start()
+        if dirty >= self.max_pending:
+            self._wake.set()
+
+    def pending(self, table, column, row_id):
+        key = (table, column, row_id)
+        with self._lock:
+            return self._pending.get(key, 0) + self._inflight.get(key, 0)
+
+    def merge(self, table, row):
+        # Add unflushed deltas to a row dict in place and return it
+        with self._lock:
+            for column in COUNTERS.get(table, ()):
+                key = (table, column, row['id'])
+                delta = self._pending.get(key, 0) + self._inflight.get(key, 0)
+                if delta and row.get(column) is not None:
+                    row[column] += delta
+        return row
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch, self._pending = self._pending, {}
+                self._inflight = batch
+
+            grouped = {}
+            for (table, column, row_id), amount in batch.items():
+                grouped.setdefault((table, column), []).append((amount, row_id))
+
+            conn = self.connect()
+            try:
+                c = conn.cursor()
+                c.execute("BEGIN IMMEDIATE")
+                for (table, column), rows in grouped.items():
+                    c.executemany(f"UPDATE {table} SET {column} = {column} + ? WHERE id = ?", rows)
+                conn.commit()
+            except Exception:
+                if conn.in_transaction:
+                    conn.rollback()
+                # Put the deltas back so the next flush retries them
+                with self._lock:
+                    for key, amount in batch.items():
+                        self._pending[key] = self._pending.get(key, 0) + amount
+                    self._inflight = {}
+                raise
+            finally:
+                conn.close()
+
+            with self._lock:
+                self._inflight = {}
+            self.flushes += 1
+            self.flushed_rows += len(batch)
+            return len(batch)
+
+    def close(self):
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(10)
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            dirty = len(self._pending)
+        return {'pending_rows': dirty, 'flushes': self.flushes, 'flushed_rows': self.flushed_rows}
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._stopping:
+                break
+            try:
+                self.flush()
+            except Exception:
+                traceback.print_exc()
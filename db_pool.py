@@ -0,0 +1,182 @@
+import sqlite3
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PooledConnection(sqlite3.Connection):
+    # close() hands the connection back to its pool instead of closing it,
+    # so routes that call conn.close() keep working unchanged.
+    pool = None
+    released = False
+    cursor_class = sqlite3.Cursor   # on_connect hooks may swap in a subclass
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or self.cursor_class)
+
+    # sqlite3.Connection.execute/executemany don't go through cursor()
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        if self.pool is None:
+            super().close()
+        else:
+            self.pool.release(self)
+
+
+class ConnectionPool:
+    def __init__(self, path, max_size=8, timeout=5.0, cache_size=-16000,
+                 mmap_size=64 * 1024 * 1024, busy_timeout=5000,
+                 cached_statements=256, on_connect=None, on_release=None,
+                 readonly=False, shared_cache=False):
+        self.path = path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.mmap_size = mmap_size
+        self.busy_timeout = busy_timeout
+        self.cached_statements = cached_statements
+        self.on_connect = list(on_connect or [])
+        self.on_release = list(on_release or [])
+        # Read-only pools open the file with mode=ro and query_only, so a
+        # stray write fails instead of taking the write lock. WAL is a
+        # property of the database file, set by the read-write pool.
+        self.readonly = readonly
+        self.shared_cache = shared_cache
+
+        self._idle = []
+        self._size = 0
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self._acquisitions = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _connect(self):
+        if self.readonly:
+            path = f"file:{self.path}?mode=ro{'&cache=shared' if self.shared_cache else ''}"
+        else:
+            path = self.path
+        conn = sqlite3.connect(path, timeout=self.busy_timeout / 1000.0,
+                               check_same_thread=False,
+                               cached_statements=self.cached_statements,
+                               factory=PooledConnection, uri=self.readonly)
+        conn.row_factory = sqlite3.Row
+        if self.readonly:
+            conn.execute('PRAGMA query_only=1')
+        else:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA cache_size={int(self.cache_size)}')
+        conn.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout)}')
+        for hook in self.on_connect:
+            hook(conn)
+        conn.pool = self
+        return conn
+
+    def acquire(self):
+        start = time.perf_counter()
+        waited = False
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout('Connection pool is closed')
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    # Reserve the slot, then connect outside the lock
+                    conn = None
+                    self._size += 1
+                    break
+                waited = True
+                remaining = self.timeout - (time.perf_counter() - start)
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(f'No database connection available after {self.timeout}s')
+                self._cond.wait(remaining)
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+
+        elapsed = time.perf_counter() - start
+        with self._cond:
+            self._acquisitions += 1
+            if waited:
+                self._waits += 1
+            self._total_wait += elapsed
+            self._max_wait = max(self._max_wait, elapsed)
+        conn.released = False
+        return conn
+
+    def release(self, conn):
+        if conn.released:
+            return
+        conn.released = True
+        for hook in self.on_release:
+            hook(conn)
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        with self._cond:
+            if self._closed:
+                self._size -= 1
+                sqlite3.Connection.close(conn)
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    def _discard(self, conn):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+        try:
+            sqlite3.Connection.close(conn)
+        except sqlite3.Error:
+            pass
+
+    def close_all(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            sqlite3.Connection.close(conn)
+
+    def stats(self):
+        with self._cond:
+            size = self._size
+            idle = len(self._idle)
+            return {
+                'readonly': self.readonly,
+                'max_size': self.max_size,
+                'size': size,
+                'idle': idle,
+                'in_use': size - idle,
+                'acquisitions': self._acquisitions,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'avg_wait_ms': round(self._total_wait * 1000 / self._acquisitions, 3) if self._acquisitions else 0.0,
+                'max_wait_ms': round(self._max_wait * 1000, 3),
+            }
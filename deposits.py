@@ -0,0 +1,252 @@
+import math
+import queue
+import secrets
+import sqlite3
+import threading
+import traceback
+from concurrent.futures import Future
+from datetime import datetime
+
+import ledger_archive
+
+# 1 point for every Rp 1.000 deposited
+POINT_VALUE = 1000
+
+_STOP = object()
+
+
+class DepositError(Exception):
+    pass
+
+
+def make_transaction_id():
+    return f"TRX{datetime.now().strftime('%Y%m%d%H%M%S')}{secrets.token_hex(3).upper()}"
+
+
+def points_for(total):
+    return int(total // POINT_VALUE)
+
+
+def price_deposit(weight, price_per_kg):
+    total = round(weight * price_per_kg, 2)
+    if not math.isfinite(total):
+        raise DepositError('Berat tidak valid')
+    return total, points_for(total)
+
+
+def parse_created_at(value):
+    # Client-supplied deposit time, 'YYYY-MM-DD HH:MM:SS' or 'YYYY-MM-DD'
+    # (midnight). Stored in the one format the ledger readers compare as text.
+    text = str(value).strip()
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d'):
+        try:
+            moment = datetime.strptime(text, fmt)
+            break
+        except ValueError:
+            pass
+    else:
+        raise DepositError('Format created_at harus YYYY-MM-DD HH:MM:SS')
+    if moment > datetime.now():
+        raise DepositError('Waktu setoran tidak boleh di masa depan')
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def normalize_deposit(data):
+    # Validate and coerce an incoming deposit dict; raises DepositError
+    try:
+        deposit = {
+            'user_id': str(data['user_id']).strip(),
+            'waste_type_id': int(data['waste_type_id']),
+            'weight': float(data['weight']),
+            'location': str(data['location']).strip(),
+        }
+    except (KeyError, TypeError, ValueError):
+        raise DepositError('Data setoran tidak lengkap')
+    if not math.isfinite(deposit['weight']):
+        raise DepositError('Berat tidak valid')
+    if deposit['weight'] <= 0:
+        raise DepositError('Berat harus lebih dari 0')
+    if not deposit['user_id'] or not deposit['location']:
+        raise DepositError('Data setoran tidak lengkap')
+    deposit['transaction_id'] = str(data.get('transaction_id') or make_transaction_id())
+    deposit['notes'] = data.get('notes')
+    # Only times given by the client are checked against the ledger order
+    deposit['client_time'] = bool(data.get('created_at'))
+    if deposit['client_time']:
+        deposit['created_at'] = parse_created_at(data['created_at'])
+    else:
+        deposit['created_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return deposit
+
+
+class DepositWriter:
+    # Single writer thread with group commit: whatever queued up while the
+    # previous batch was committing goes into the next BEGIN IMMEDIATE
+    # transaction, so throughput scales with batch size rather than fsyncs.
+    # Each deposit runs inside its own SAVEPOINT so one bad row (unknown
+    # member, duplicate transaction_id, anything unexpected) fails only its
+    # own future.
+
+    def __init__(self, connect, batch_size=256):
+        self.connect = connect
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._listeners = []
+        self.batches = 0
+        self.posted = 0
+        self.failed = 0
+
+    def add_listener(self, fn):
+        # fn(list_of_posted_deposits) runs on the writer thread after commit
+        self._listeners.append(fn)
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='deposit-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, data):
+        deposit = normalize_deposit(data)
+        future = Future()
+        future.transaction_id = deposit['transaction_id']
+        self.start()
+        self._queue.put((deposit, future))
+        return future
+
+    def close(self, timeout=10):
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            'queued': self._queue.qsize(),
+            'batches': self.batches,
+            'posted': self.posted,
+            'failed': self.failed,
+            'avg_batch_size': round((self.posted + self.failed) / self.batches, 2) if self.batches else 0.0,
+        }
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                self._apply(batch)
+            except Exception:
+                traceback.print_exc()
+
+    def _apply(self, batch):
+        outcomes = []
+        conn = self.connect()
+        try:
+            c = conn.cursor()
+            c.execute("BEGIN IMMEDIATE")
+            prices = {}
+            hot_from = ledger_archive.hot_from(conn)
+            for deposit, future in batch:
+                c.execute("SAVEPOINT deposit")
+                try:
+                    outcomes.append((future, self._post(c, deposit, prices, hot_from), None))
+                except Exception as e:
+                    c.execute("ROLLBACK TO SAVEPOINT deposit")
+                    if isinstance(e, sqlite3.IntegrityError):
+                        e = DepositError(f"Transaksi {deposit['transaction_id']} sudah tercatat")
+                    elif not isinstance(e, DepositError):
+                        traceback.print_exc()
+                    outcomes.append((future, None, e))
+                c.execute("RELEASE SAVEPOINT deposit")
+            conn.commit()
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            self.batches += 1
+            self.failed += len(batch)
+            return
+        finally:
+            conn.close()
+
+        self.batches += 1
+        posted = []
+        for future, result, error in outcomes:
+            if error is None:
+                posted.append(result)
+                future.set_result(result)
+            else:
+                self.failed += 1
+                future.set_exception(error)
+        self.posted += len(posted)
+
+        self.notify(posted)
+
+    def notify(self, posted):
+        # Also used by other posting paths (bulk import) so listeners see every deposit
+        if not posted:
+            return
+        for listener in self._listeners:
+            try:
+                listener(posted)
+            except Exception:
+                traceback.print_exc()
+
+    def _post(self, c, deposit, prices, hot_from):
+        if hot_from and deposit['created_at'] < hot_from:
+            raise DepositError('Tahun setoran sudah diarsipkan')
+        wt_id = deposit['waste_type_id']
+        if wt_id not in prices:
+            c.execute("SELECT name, price_per_kg FROM waste_types WHERE id = ? AND status = 'ACTIVE'", (wt_id,))
+            prices[wt_id] = c.fetchone()
+        waste_type = prices[wt_id]
+        if waste_type is None:
+            raise DepositError('Jenis sampah tidak ditemukan')
+
+        total, points = price_deposit(deposit['weight'], waste_type[1])
+
+        # balance_after follows posting order, so a client time before the
+        # member's last savings entry would break the running balance
+        if deposit.get('client_time'):
+            c.execute("SELECT MAX(created_at) FROM savings WHERE user_id = ?", (deposit['user_id'],))
+            latest = c.fetchone()[0]
+            if latest and deposit['created_at'] < latest:
+                raise DepositError('Tanggal lebih awal dari mutasi tabungan terakhir anggota')
+
+        c.execute('''INSERT INTO transactions
+                    (user_id, transaction_id, waste_type_id, weight, total, location, status, notes, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, 'COMPLETED', ?, ?)''',
+                 (deposit['user_id'], deposit['transaction_id'], wt_id, deposit['weight'], total,
+                  deposit['location'], deposit['notes'], deposit['created_at']))
+
+        c.execute("UPDATE users SET balance = balance + ?, points = points + ? WHERE user_id = ? AND status = 'ACTIVE'",
+                  (total, points, deposit['user_id']))
+        if c.rowcount == 0:
+            raise DepositError('Pengguna tidak ditemukan')
+        c.execute("SELECT balance FROM users WHERE user_id = ?", (deposit['user_id'],))
+        balance_after = c.fetchone()[0]
+
+        c.execute('''INSERT INTO savings
+                    (user_id, transaction_type, amount, balance_after, description, reference_id, created_at)
+                    VALUES (?, 'DEPOSIT', ?, ?, ?, ?, ?)''',
+                 (deposit['user_id'], total, balance_after,
+                  f"Setor {deposit['weight']:g} kg {waste_type[0]}", deposit['transaction_id'],
+                  deposit['created_at']))
+
+        return dict(deposit, total=total, points=points, balance_after=balance_after,
+                    waste_type=waste_type[0], status='COMPLETED')
@@ -0,0 +1,137 @@
+import csv
+import io
+import zlib
+
+import ledger_archive
+
+# Ledger exports for finance. Rows are read in id-ordered keyset chunks, each
+# its own short statement, so an export holds neither the table in memory nor
+# a read snapshot open for the whole (possibly slow) download. The id range
+# is fixed when the export starts, so rows written meanwhile are left out.
+#   dataset: (table, columns, date column, status column)
+DATASETS = {
+    'transactions': ('transactions',
+                     ('id', 'transaction_id', 'user_id', 'waste_type_id', 'weight', 'total', 'location',
+                      'status', 'pickup_date', 'pickup_time', 'notes', 'created_at'),
+                     'created_at', 'status'),
+    'savings': ('savings',
+                ('id', 'user_id', 'transaction_type', 'amount', 'balance_after', 'description',
+                 'reference_id', 'created_at'),
+                'created_at', 'transaction_type'),
+    'users': ('users',
+              ('id', 'user_id', 'name', 'email', 'phone', 'address', 'balance', 'points', 'join_date',
+               'is_admin', 'status'),
+              'join_date', 'status'),
+}
+
+CHUNK_ROWS = 1000
+
+# Member-entered text starting with one of these runs as a formula when the
+# file is opened in a spreadsheet; such cells get a leading apostrophe.
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def safe_row(row):
+    return [f"'{v}" if type(v) is str and v.startswith(FORMULA_PREFIXES) else v for v in row]
+
+
+def export_sql(dataset, date_from=None, date_to=None, status=None, source=None):
+    # (id bounds query, chunk query, filter params). The chunk query takes
+    # low id, high id, the filter params and the chunk size. `source` reads
+    # the dataset from one of ledger_archive.sources() instead of its table.
+    table, columns, date_column, status_column = DATASETS[dataset]
+    table = source or table
+    where, params = [], []
+    if date_from:
+        where.append(f'{date_column} >= ?')
+        params.append(date_from)
+    if date_to:
+        where.append(f'{date_column} < ?')
+        params.append(date_to)
+    if status:
+        where.append(f'{status_column} = ?')
+        params.append(status)
+    clause = f" WHERE {' AND '.join(where)}" if where else ''
+    bounds = f"SELECT MIN(id), MAX(id) FROM {table}{clause}"
+    # The unary + keeps the planner on the rowid range instead of sorting
+    # each chunk out of a date index
+    filters = ''.join(f' AND +{w}' for w in where)
+    chunk = (f"SELECT {', '.join(columns)} FROM {table} "
+             f"WHERE id >= ? AND id <= ?{filters} ORDER BY id LIMIT ?")
+    return bounds, chunk, params
+
+
+def iter_chunks(conn, dataset, date_from=None, date_to=None, status=None, chunk_rows=CHUNK_ROWS):
+    # Yields lists of row tuples. date_to is exclusive. Ledger datasets span
+    # the archived years, oldest first.
+    table = DATASETS[dataset][0]
+    if table in ledger_archive.TABLES:
+        sources = ledger_archive.sources(conn, table, date_from, date_to)
+    else:
+        sources = [table]
+    c = conn.cursor()
+    c.row_factory = None
+    for source in sources:
+        bounds, chunk, params = export_sql(dataset, date_from, date_to, status, source)
+        c.execute(bounds, params)
+        low, high = c.fetchone()
+        if low is None:
+            continue
+        while low <= high:
+            c.execute(chunk, [low, high, *params, chunk_rows])
+            rows = c.fetchall()
+            if not rows:
+                break
+            yield rows
+            low = rows[-1][0] + 1
+
+
+def stream_csv(connect, dataset, date_from=None, date_to=None, status=None, compress=False,
+               chunk_rows=CHUNK_ROWS):
+    # Generator of encoded CSV (optionally gzip) byte chunks. `connect` is
+    # called when iteration starts, so the connection belongs to the response
+    # and not to the request that built it.
+    encoder = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+
+    def emit():
+        data = buf.getvalue().encode('utf-8')
+        buf.seek(0)
+        buf.truncate()
+        return encoder.compress(data) if encoder else data
+
+    conn = connect()
+    try:
+        # BOM so Excel opens the UTF-8 names correctly
+        buf.write('\ufeff')
+        writer.writerow(DATASETS[dataset][1])
+        for rows in iter_chunks(conn, dataset, date_from, date_to, status, chunk_rows):
+            writer.writerows(map(safe_row, rows))
+            chunk = emit()
+            if chunk:
+                yield chunk
+        chunk = emit()
+        if encoder:
+            chunk += encoder.flush()
+        if chunk:
+            yield chunk
+    finally:
+        conn.close()
+
+
+def write_xlsx(conn, dataset, out, date_from=None, date_to=None, status=None, chunk_rows=CHUNK_ROWS):
+    # openpyxl's write-only workbook spools rows to a temp file as they are
+    # appended, so memory stays flat. The zip container can only be written
+    # once complete, so `out` should be a (temporary) file, streamed afterwards.
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(dataset)
+    ws.append(DATASETS[dataset][1])
+    count = 0
+    for rows in iter_chunks(conn, dataset, date_from, date_to, status, chunk_rows):
+        for row in rows:
+            ws.append(safe_row(row))
+        count += len(rows)
+    wb.save(out)
+    return count
@@ -0,0 +1,130 @@
+import heapq
+import math
+import threading
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class GeoIndex:
+    # Uniform lat/lon grid. Cells are `cell_deg` degrees on a side (0.01° is
+    # ~1.1 km at the equator); a k-nearest query walks rings of cells outward
+    # from the query cell until no unvisited cell can hold a closer point.
+
+    def __init__(self, cell_deg=0.01):
+        self.cell_deg = cell_deg
+        self._cells = {}
+        self._points = {}
+        # Cell-index bounding box; only grows, used to stop ring expansion
+        self._bounds = None
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._points)
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+
+    def upsert(self, point_id, lat, lon, data=None):
+        with self._lock:
+            self.remove(point_id)
+            cell = self._cell(lat, lon)
+            self._points[point_id] = (lat, lon, cell, data)
+            self._cells.setdefault(cell, set()).add(point_id)
+            if self._bounds is None:
+                self._bounds = [cell[0], cell[0], cell[1], cell[1]]
+            else:
+                b = self._bounds
+                b[0], b[1] = min(b[0], cell[0]), max(b[1], cell[0])
+                b[2], b[3] = min(b[2], cell[1]), max(b[3], cell[1])
+
+    def remove(self, point_id):
+        with self._lock:
+            old = self._points.pop(point_id, None)
+            if old is not None:
+                members = self._cells[old[2]]
+                members.discard(point_id)
+                if not members:
+                    del self._cells[old[2]]
+
+    def clear(self):
+        with self._lock:
+            self._cells.clear()
+            self._points.clear()
+            self._bounds = None
+
+    def get(self, point_id):
+        point = self._points.get(point_id)
+        return point[3] if point else None
+
+    def _ring(self, center, r):
+        ci, cj = center
+        if r == 0:
+            yield center
+            return
+        for j in range(cj - r, cj + r + 1):
+            yield (ci - r, j)
+            yield (ci + r, j)
+        for i in range(ci - r + 1, ci + r):
+            yield (i, cj - r)
+            yield (i, cj + r)
+
+    def nearest(self, lat, lon, k=5, radius_km=None):
+        # Returns [(distance_km, point_id, data)] sorted by distance
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError('Koordinat tidak valid')
+        with self._lock:
+            if not self._points:
+                return []
+            center = self._cell(lat, lon)
+            # Anything in ring r is at least r-1 full cells away; longitude
+            # cells shrink by cos(lat)
+            cell_km = math.radians(self.cell_deg) * EARTH_RADIUS_KM
+            min_cell_km = cell_km * max(math.cos(math.radians(min(abs(lat) + 1, 89.9))), 0.01)
+            b = self._bounds
+            max_ring = max(abs(b[0] - center[0]), abs(b[1] - center[0]),
+                           abs(b[2] - center[1]), abs(b[3] - center[1]))
+            # No point is further than half the circumference
+            max_ring = min(max_ring, math.ceil(math.pi * EARTH_RADIUS_KM / min_cell_km) + 1)
+
+            best = []  # max-heap of (-distance, point_id)
+            visited = 0
+
+            def visit(cell):
+                nonlocal visited
+                for point_id in self._cells.get(cell, ()):
+                    visited += 1
+                    plat, plon, _, _ = self._points[point_id]
+                    d = haversine_km(lat, lon, plat, plon)
+                    if radius_km is not None and d > radius_km:
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, (-d, point_id))
+                    elif d < -best[0][0]:
+                        heapq.heapreplace(best, (-d, point_id))
+
+            r = 0
+            while r <= max_ring and visited < len(self._points):
+                reach_km = max(r - 1, 0) * min_cell_km
+                if radius_km is not None and reach_km > radius_km:
+                    break
+                if len(best) >= k and reach_km > -best[0][0]:
+                    break
+                if 8 * r > len(self._cells):
+                    # Rings now cost more than the occupied cells left; scan
+                    # those directly (far-away queries, sparse data)
+                    ci, cj = center
+                    for cell in [c for c in self._cells if max(abs(c[0] - ci), abs(c[1] - cj)) >= r]:
+                        visit(cell)
+                    break
+                for cell in self._ring(center, r):
+                    visit(cell)
+                r += 1
+
+            return [(-nd, pid, self._points[pid][3]) for nd, pid in sorted(best, reverse=True)]
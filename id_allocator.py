@@ -0,0 +1,71 @@
+import threading
+
+MEMBER_SEED_SQL = "SELECT MAX(CAST(SUBSTR(user_id, 4) AS INTEGER)) FROM users WHERE user_id LIKE 'BSB%'"
+
+
+class IdAllocator:
+    # Hands out sequential IDs ("BSB100123") from blocks reserved atomically
+    # in the id_sequences table. Reserving a block is one short BEGIN
+    # IMMEDIATE transaction, so concurrent workers and processes never see
+    # the same number; numbers left in a block when a process exits are
+    # simply skipped.
+
+    def __init__(self, connect, name, prefix, block_size=20, seed_sql=None, first_value=1):
+        self.connect = connect
+        self.name = name
+        self.prefix = prefix
+        self.block_size = block_size
+        self.seed_sql = seed_sql
+        self.first_value = first_value
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def next_id(self):
+        with self._lock:
+            if self._next >= self._end:
+                self._next, self._end = self._reserve(self.block_size)
+            value = self._next
+            self._next += 1
+        return f'{self.prefix}{value}'
+
+    def take(self, count):
+        # `count` IDs for a bulk insert; uses the current block first
+        ids = []
+        with self._lock:
+            while self._next < self._end and len(ids) < count:
+                ids.append(self._next)
+                self._next += 1
+            if len(ids) < count:
+                start, end = self._reserve(count - len(ids))
+                ids.extend(range(start, end))
+        return [f'{self.prefix}{value}' for value in ids]
+
+    def _reserve(self, count):
+        conn = self.connect()
+        try:
+            c = conn.cursor()
+            c.execute("BEGIN IMMEDIATE")
+            c.execute("SELECT next_value FROM id_sequences WHERE name = ?", (self.name,))
+            row = c.fetchone()
+            if row is not None:
+                start = row[0]
+            else:
+                # First use: continue after whatever IDs already exist
+                start = self.first_value
+                if self.seed_sql:
+                    c.execute(self.seed_sql)
+                    current = c.fetchone()[0]
+                    if current is not None:
+                        start = max(start, current + 1)
+            c.execute('''INSERT INTO id_sequences (name, next_value) VALUES (?, ?)
+                         ON CONFLICT(name) DO UPDATE SET next_value = excluded.next_value''',
+                      (self.name, start + count))
+            conn.commit()
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return start, start + count
@@ -0,0 +1,278 @@
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime
+
+from deposits import POINT_VALUE
+import ledger_archive
+
+# Points leaderboards kept in memory: global (users.points), per area
+# (transactions.location) and per month (transactions.created_at). Boards are
+# rebuilt from the database on first use and then moved by the deposit
+# writer's listener as deposits post.
+
+BOARDS = ('global', 'area', 'month')
+MONTHS_KEPT = 12
+
+
+class RankIndex:
+    # Sorted keys split into buckets of ~LOAD items, plus a Fenwick tree over
+    # bucket sizes. Rank = Fenwick prefix over earlier buckets + bisect
+    # within the bucket, O(log n); insert/remove touch one bucket and only
+    # rebuild the tree when a bucket splits or empties.
+
+    LOAD = 256
+
+    def __init__(self, keys=()):
+        keys = sorted(keys)
+        self._buckets = [keys[i:i + self.LOAD] for i in range(0, len(keys), self.LOAD)]
+        self._rebuild()
+
+    def __len__(self):
+        return self._len
+
+    def _rebuild(self):
+        self._maxes = [b[-1] for b in self._buckets]
+        n = len(self._buckets)
+        tree = [0] * (n + 1)
+        for i, b in enumerate(self._buckets, start=1):
+            tree[i] += len(b)
+            parent = i + (i & -i)
+            if parent <= n:
+                tree[parent] += tree[i]
+        self._tree = tree
+        self._len = sum(len(b) for b in self._buckets)
+
+    def _update(self, i, delta):
+        i += 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, i):
+        # Items in buckets [0, i)
+        total = 0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def insert(self, key):
+        if not self._buckets:
+            self._buckets.append([key])
+            self._rebuild()
+            return
+        i = min(bisect_left(self._maxes, key), len(self._buckets) - 1)
+        bucket = self._buckets[i]
+        insort(bucket, key)
+        self._maxes[i] = bucket[-1]
+        self._len += 1
+        if len(bucket) > 2 * self.LOAD:
+            self._buckets[i:i + 1] = [bucket[:self.LOAD], bucket[self.LOAD:]]
+            self._rebuild()
+        else:
+            self._update(i, 1)
+
+    def remove(self, key):
+        i = bisect_left(self._maxes, key)
+        if i == len(self._buckets):
+            raise KeyError(key)
+        bucket = self._buckets[i]
+        j = bisect_left(bucket, key)
+        if j == len(bucket) or bucket[j] != key:
+            raise KeyError(key)
+        del bucket[j]
+        self._len -= 1
+        if bucket:
+            self._maxes[i] = bucket[-1]
+            self._update(i, -1)
+        else:
+            del self._buckets[i]
+            self._rebuild()
+
+    def count_below(self, key):
+        # Number of keys < key
+        i = bisect_left(self._maxes, key)
+        if i == len(self._buckets):
+            return self._len
+        return self._prefix(i) + bisect_left(self._buckets[i], key)
+
+    def first(self, n, offset=0):
+        result = []
+        for bucket in self._buckets:
+            if offset >= len(bucket):
+                offset -= len(bucket)
+                continue
+            result.extend(bucket[offset:offset + n - len(result)])
+            offset = 0
+            if len(result) >= n:
+                break
+        return result
+
+
+class Board:
+    # Keys are (-points, user_id): best first, ties in user_id order. Ranks are
+    # competition ranks (equal points share a rank).
+
+    def __init__(self, scores=None):
+        self.scores = dict(scores or {})
+        self.index = RankIndex((-p, u) for u, p in self.scores.items())
+
+    def add(self, user_id, points):
+        old = self.scores.get(user_id)
+        if old is not None:
+            self.index.remove((-old, user_id))
+        new = (old or 0) + points
+        self.scores[user_id] = new
+        self.index.insert((-new, user_id))
+
+    def rank(self, user_id):
+        points = self.scores.get(user_id, 0)
+        # '' sorts before every user_id, so this counts strictly higher scores
+        return self.index.count_below((-points, '')) + 1, points
+
+    def top(self, n, offset=0):
+        return [(-neg, user_id) for neg, user_id in self.index.first(n, offset)]
+
+
+def _month(created_at):
+    return str(created_at)[:7]
+
+
+class Leaderboard:
+    def __init__(self, months_kept=MONTHS_KEPT):
+        self.months_kept = months_kept
+        self._boards = {}
+        self._state = 'empty'
+        self._queued = []
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def load(self, conn):
+        # Deposits that post while the snapshot is read are queued, then
+        # replayed minus those the snapshot already contains. The listener
+        # runs right after each commit, so a deposit committed before the
+        # snapshot is always seen while loading, never after.
+        with self._lock:
+            self._state = 'loading'
+            self._queued = []
+        try:
+            boards, high_water = self._read(conn)
+        except Exception:
+            with self._lock:
+                self._state = 'empty'
+            raise
+        with self._lock:
+            self._boards = boards
+            for deposit in self._after(conn, self._queued, high_water):
+                self._apply(deposit)
+            self._queued = []
+            self._state = 'ready'
+            self.loaded = True
+
+    def _read(self, conn):
+        c = conn.cursor()
+        first = datetime.now().year * 12 + datetime.now().month - self.months_kept
+        since = f'{first // 12:04d}-{first % 12 + 1:02d}-01'
+        # All-time area boards span the archived years. They are closed, so they
+        # are summed one at a time before BEGIN and only the hot table is read
+        # in the snapshot.
+        archived, hot = ledger_archive.split(conn, 'transactions')
+        by_area = {}
+        for source in archived:
+            self._add_areas(c, source, by_area)
+        c.execute("BEGIN")
+        try:
+            c.execute("SELECT MAX(id) FROM transactions")
+            high_water = c.fetchone()[0] or 0
+            c.execute("SELECT user_id, points FROM users WHERE is_admin = 0 AND status = 'ACTIVE'")
+            boards = {('global', ''): Board({row[0]: row[1] or 0 for row in c.fetchall()})}
+            self._add_areas(c, hot, by_area)
+            c.execute(f'''SELECT substr(created_at, 1, 7), user_id, SUM(CAST(total / {POINT_VALUE} AS INTEGER))
+                          FROM transactions WHERE status = 'COMPLETED' AND created_at >= ?
+                          GROUP BY substr(created_at, 1, 7), user_id''', (since,))
+            by_month = {}
+            for month, user_id, points in c.fetchall():
+                by_month.setdefault(month, {})[user_id] = points
+        finally:
+            conn.commit()
+        for area, scores in by_area.items():
+            boards[('area', area)] = Board(scores)
+        for month, scores in by_month.items():
+            boards[('month', month)] = Board(scores)
+        return boards, high_water
+
+    def _add_areas(self, c, source, by_area):
+        c.execute(f'''SELECT location, user_id, SUM(CAST(total / {POINT_VALUE} AS INTEGER)) FROM {source}
+                      WHERE status = 'COMPLETED' GROUP BY location, user_id''')
+        for area, user_id, points in c.fetchall():
+            scores = by_area.setdefault(area, {})
+            scores[user_id] = scores.get(user_id, 0) + points
+
+    def _after(self, conn, deposits, high_water):
+        if not deposits:
+            return []
+        ids = [d['transaction_id'] for d in deposits]
+        c = conn.cursor()
+        c.execute(f"SELECT transaction_id FROM transactions WHERE id > ? AND transaction_id IN "
+                  f"({','.join('?' * len(ids))})", (high_water, *ids))
+        late = {row[0] for row in c.fetchall()}
+        return [d for d in deposits if d['transaction_id'] in late]
+
+    def on_posted(self, posted):
+        # DepositWriter listener
+        with self._lock:
+            if self._state == 'empty':
+                return
+            if self._state == 'loading':
+                self._queued.extend(posted)
+                return
+            for deposit in posted:
+                self._apply(deposit)
+
+    def _apply(self, deposit):
+        points = deposit.get('points') or 0
+        if points <= 0:
+            return
+        user_id = deposit['user_id']
+        for key in (('global', ''), ('area', deposit.get('location') or ''),
+                    ('month', _month(deposit['created_at']))):
+            board = self._boards.get(key)
+            if board is None:
+                board = self._boards[key] = Board()
+            board.add(user_id, points)
+        self._prune_months()
+
+    def _prune_months(self):
+        months = sorted(k[1] for k in self._boards if k[0] == 'month')
+        for month in months[:-self.months_kept]:
+            del self._boards[('month', month)]
+
+    def top(self, board='global', name='', n=10, offset=0):
+        with self._lock:
+            b = self._boards.get((board, name))
+            if b is None:
+                return [], 0
+            rows = b.top(n, offset)
+            ranked = []
+            for points, user_id in rows:
+                ranked.append({'rank': b.rank(user_id)[0], 'user_id': user_id, 'points': points})
+            return ranked, len(b.scores)
+
+    def rank(self, user_id, board='global', name=''):
+        with self._lock:
+            b = self._boards.get((board, name))
+            if b is None:
+                return {'rank': None, 'points': 0, 'members': 0}
+            rank, points = b.rank(user_id)
+            return {'rank': rank if user_id in b.scores else None, 'points': points, 'members': len(b.scores)}
+
+    def areas(self, user_id=None):
+        with self._lock:
+            return sorted(k[1] for k, b in self._boards.items()
+                          if k[0] == 'area' and (user_id is None or user_id in b.scores))
+
+    def stats(self):
+        with self._lock:
+            board = self._boards.get(('global', ''))
+            return {'state': self._state, 'boards': len(self._boards),
+                    'members': len(board.scores) if board else 0}
@@ -0,0 +1,357 @@
+import os
+import sqlite3
+from datetime import datetime
+
+import pagination
+
+# Hot/cold split of the append-only ledgers. Closed years of transactions and
+# savings move out of the main file into one archive database per year
+# (<main>-archive/ledger_<year>.db), registered in ledger_archives. Readers
+# ATTACH the archives a query needs as ledger_<year>, one at a time as they
+# reach them, so a read can span more years than SQLite can attach at once;
+# sources() yields the ledger tables overlapping a date range (archives
+# oldest first, hot table last) and keyset_page() walks them newest first, so
+# recent history never opens an archive. Archives hold whole years and the hot table is read from
+# the first unarchived year on, so the tiers never overlap in created_at and
+# chaining them keeps the (created_at, id) order.
+#
+# Only the history readers go through here. Posting paths never touch the
+# archives: the transaction_ids of rotated years stay in main
+# (archived_transaction_ids, checked by a trigger on transactions) and
+# deposits dated before hot_from() are rejected, so a re-sent deposit cannot
+# be credited twice. The incremental rollups see the hot table only, which is
+# why only closed years are rotated.
+
+TABLES = ('transactions', 'savings')
+KEEP_YEARS = 2            # calendar years kept hot, the current one included
+DELETE_BATCH_ROWS = 5000  # rows per delete transaction when clearing a rotated year
+MAX_ATTACHED = 9          # SQLite allows 10 attached databases by default
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def _main_file(conn):
+    for _, name, path in conn.execute("PRAGMA database_list"):
+        if name == 'main':
+            return path
+    raise ArchiveError('No main database')
+
+
+def archive_dir(conn):
+    return os.path.splitext(_main_file(conn))[0] + '-archive'
+
+
+def archives(conn):
+    # [(year, absolute path)] oldest first; paths are stored relative to the
+    # main file so the database and its archives can be moved together
+    base = os.path.dirname(_main_file(conn))
+    return [(year, os.path.join(base, path))
+            for year, path in conn.execute("SELECT year, path FROM ledger_archives ORDER BY year")]
+
+
+def _schema(year):
+    return f'ledger_{year}'
+
+
+def hot_source(table, boundary):
+    # The hot table from `boundary` on. Rows of a year that was just rotated
+    # stay hidden while they are being deleted in batches. The unary + keeps
+    # this (unselective) bound from choosing the index.
+    if boundary is None:
+        return table
+    return f"(SELECT * FROM {table} WHERE +created_at >= '{boundary}')"
+
+
+def _boundary(archived):
+    return f'{archived[-1][0] + 1:04d}-01-01' if archived else None
+
+
+def hot_from(conn):
+    # 'YYYY-01-01' of the first year not archived, None without archives.
+    # Deposits dated earlier would land in a closed year.
+    year = conn.execute("SELECT MAX(year) FROM ledger_archives").fetchone()[0]
+    return f'{year + 1:04d}-01-01' if year is not None else None
+
+
+def register_archived_ids(c):
+    # Migration step: transaction_ids of years rotated before the registry
+    # existed. Archives are read through their own connection, ATTACH is not
+    # allowed inside the migration transaction.
+    for year, path in archives(c.connection):
+        archive = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+        try:
+            rows = archive.execute("SELECT transaction_id FROM transactions").fetchall()
+        finally:
+            archive.close()
+        c.executemany("INSERT OR IGNORE INTO archived_transaction_ids (transaction_id, year) VALUES (?, ?)",
+                      [(row[0], year) for row in rows])
+
+
+def attach(conn, archived):
+    # ATTACH each (year, path) not attached yet. Pooled connections keep
+    # their archives attached; older ones are detached to stay under the limit.
+    # Must run outside a transaction, with no statement reading a detached
+    # archive still in progress.
+    if len(archived) > MAX_ATTACHED:
+        raise ArchiveError(f'A query can span at most {MAX_ATTACHED} archive years, narrow the date range')
+    wanted = {_schema(year) for year, _ in archived}
+    attached = [row[1] for row in conn.execute("PRAGMA database_list") if row[1].startswith('ledger_')]
+    missing = [(year, path) for year, path in archived if _schema(year) not in attached]
+    spare = [name for name in attached if name not in wanted]
+    while spare and len(attached) + len(missing) > MAX_ATTACHED:
+        name = spare.pop(0)
+        conn.execute(f"DETACH DATABASE {name}")
+        attached.remove(name)
+    for year, path in missing:
+        # ATTACH would silently create an empty file
+        if not os.path.exists(path):
+            raise ArchiveError(f'Ledger archive for {year} not found: {path}')
+        conn.execute(f"ATTACH DATABASE ? AS {_schema(year)}", (path,))
+
+
+def _attaching(conn, table, archived):
+    for year, path in archived:
+        attach(conn, [(year, path)])
+        yield f'{_schema(year)}.{table}'
+
+
+def split(conn, table, date_from=None, date_to=None, newest_first=False):
+    # (archived sources, hot source or None) covering [date_from, date_to) for
+    # `table`. The archived sources are a generator that attaches each year
+    # when it is reached (detaching older ones past MAX_ATTACHED): finish each
+    # query before taking the next source, outside a transaction. Readers that
+    # need the hot table in a transaction read the archives before it; closed
+    # years need not share its snapshot.
+    archived = archives(conn)
+    boundary = _boundary(archived)
+    needed = [(year, path) for year, path in archived
+              if (date_to is None or f'{year:04d}-01-01' < date_to)
+              and (date_from is None or date_from < f'{year + 1:04d}-01-01')]
+    hot = None
+    if boundary is None or date_to is None or date_to > boundary:
+        hot = hot_source(table, boundary)
+    return _attaching(conn, table, needed[::-1] if newest_first else needed), hot
+
+
+def sources(conn, table, date_from=None, date_to=None, newest_first=False):
+    # Yields the FROM expressions of split(), oldest first (hot table last) or
+    # newest first. Without archives this is just `table`.
+    archived, hot = split(conn, table, date_from, date_to, newest_first)
+    if hot and newest_first:
+        yield hot
+    yield from archived
+    if hot and not newest_first:
+        yield hot
+
+
+def keyset_page(c, table, where, params, cursor=None, limit=10):
+    # pagination.keyset_page on (created_at, id) across the hot table and then
+    # each archive, newest first. A page that runs out in one tier continues
+    # in the next with the cursor of its last row.
+    archived = archives(c.connection)
+    if not archived:
+        return pagination.keyset_page(c, f"SELECT * FROM {table}", where, params, 'created_at', cursor, limit)
+    upper = pagination.decode_cursor(cursor)[0] if cursor else None
+    if upper is not None and not isinstance(upper, str):
+        raise pagination.CursorError('Cursor tidak valid')
+    tiers = [(None, hot_source(table, _boundary(archived)))]
+    tiers += [((year, path), f'{_schema(year)}.{table}') for year, path in reversed(archived)
+              if upper is None or f'{year:04d}-01-01' <= upper]
+
+    def page(tier, after, size):
+        archive, source = tier
+        if archive:
+            attach(c.connection, [archive])
+        return pagination.keyset_page(c, f"SELECT * FROM {source}", where, params, 'created_at', after, size)
+
+    rows = []
+    for i, tier in enumerate(tiers):
+        found, next_cursor = page(tier, cursor, limit - len(rows))
+        rows += found
+        if next_cursor:
+            return rows, next_cursor
+        if found:
+            cursor = pagination.encode_cursor([rows[-1]['created_at'], rows[-1]['id']])
+        if len(rows) == limit:
+            # Full page at a tier boundary: only hand out a cursor if an
+            # older tier has more
+            if any(page(older, cursor, 1)[0] for older in tiers[i + 1:]):
+                return rows, cursor
+            return rows, None
+    return rows, None
+
+
+def _create_like(c, schema, table, kind):
+    # Same table or indexes as main; sqlite_master keeps CREATE statements
+    # without IF NOT EXISTS
+    for name, sql in c.execute("SELECT name, sql FROM main.sqlite_master "
+                               "WHERE type = ? AND tbl_name = ? AND sql IS NOT NULL",
+                               (kind, table)).fetchall():
+        prefix = f'CREATE {kind.upper()} {name}'
+        if sql.startswith(prefix):
+            c.execute(f'CREATE {kind.upper()} IF NOT EXISTS {schema}.{name}' + sql[len(prefix):])
+
+
+def _copy_year(c, schema, year):
+    start, end = f'{year:04d}-01-01', f'{year + 1:04d}-01-01'
+    for table in TABLES:
+        c.execute(f"INSERT OR IGNORE INTO {schema}.{table} SELECT * FROM main.{table} "
+                  f"WHERE created_at >= ? AND created_at < ?", (start, end))
+    c.execute("INSERT OR IGNORE INTO main.archived_transaction_ids (transaction_id, year) "
+              "SELECT transaction_id, ? FROM main.transactions WHERE created_at >= ? AND created_at < ?",
+              (year, start, end))
+
+
+def rotate_year(conn, year, directory=None, batch_rows=DELETE_BATCH_ROWS):
+    # Move one year out of the hot ledgers. The copy is committed to the
+    # archive before the year is registered, and the year is registered before
+    # its hot rows are deleted, so a reader always sees each row exactly once
+    # (WAL makes a transaction across attached files atomic per file only).
+    # Deposits into the year are rejected once it is registered; a second copy
+    # picks up the ones posted while the first ran. Rerunning after a crash
+    # picks up where it stopped. Returns {table: rows}.
+    directory = directory or archive_dir(conn)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'ledger_{year}.db')
+    schema = _schema(year)
+    start, end = f'{year:04d}-01-01', f'{year + 1:04d}-01-01'
+    conn.commit()
+    if schema not in [row[1] for row in conn.execute("PRAGMA database_list")]:
+        conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+    try:
+        conn.execute(f"PRAGMA {schema}.journal_mode=DELETE")
+        c = conn.cursor()
+        try:
+            for table in TABLES:
+                _create_like(c, schema, table, 'table')
+            _copy_year(c, schema, year)
+            for table in TABLES:
+                _create_like(c, schema, table, 'index')
+            conn.commit()
+            c.execute('''INSERT INTO ledger_archives (year, path, transactions, savings, archived_at, compacted_at)
+                         VALUES (?, ?, 0, 0, ?, NULL)
+                         ON CONFLICT(year) DO UPDATE SET path = excluded.path, archived_at = excluded.archived_at''',
+                      (year, os.path.relpath(path, os.path.dirname(_main_file(conn))),
+                       datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+            conn.commit()
+            _copy_year(c, schema, year)
+            counts = {table: c.execute(f"SELECT COUNT(*) FROM {schema}.{table}").fetchone()[0] for table in TABLES}
+            c.execute("UPDATE ledger_archives SET transactions = ?, savings = ? WHERE year = ?",
+                      (counts['transactions'], counts['savings'], year))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    finally:
+        conn.execute(f"DETACH DATABASE {schema}")
+
+    # Short delete transactions, so deposits are not held up behind the rotation
+    for table in TABLES:
+        while True:
+            c.execute(f'''DELETE FROM {table} WHERE id IN (
+                              SELECT id FROM {table} WHERE created_at >= ? AND created_at < ? LIMIT ?)''',
+                      (start, end, batch_rows))
+            deleted = c.rowcount
+            conn.commit()
+            if deleted < batch_rows:
+                break
+    return counts
+
+
+def rotate(conn, keep_years=KEEP_YEARS, directory=None, batch_rows=DELETE_BATCH_ROWS):
+    # Archive every closed year older than the `keep_years` most recent ones,
+    # oldest first. Years without hot rows are skipped. Returns
+    # [(year, {table: rows})].
+    cutoff = datetime.now().year - keep_years + 1
+    firsts = [conn.execute(f"SELECT MIN(created_at) FROM {table}").fetchone()[0] for table in TABLES]
+    firsts = [int(first[:4]) for first in firsts if first]
+    rotated = []
+    for year in range(min(firsts, default=cutoff), cutoff):
+        start, end = f'{year:04d}-01-01', f'{year + 1:04d}-01-01'
+        if any(conn.execute(f"SELECT 1 FROM {table} WHERE created_at >= ? AND created_at < ? LIMIT 1",
+                            (start, end)).fetchone() for table in TABLES):
+            rotated.append((year, rotate_year(conn, year, directory, batch_rows)))
+    return rotated
+
+
+def compact(conn, main=False):
+    # VACUUM and ANALYZE each archive (they are written once, so this is a
+    # one-off per year); with main=True also VACUUM the main file to hand the
+    # space of rotated rows back. Returns [(file, bytes before, bytes after)].
+    results = []
+    for year, path in archives(conn):
+        before = os.path.getsize(path)
+        archive = sqlite3.connect(path)
+        try:
+            archive.execute("PRAGMA journal_mode=DELETE")
+            archive.execute("ANALYZE")
+            archive.commit()
+            archive.execute("VACUUM")
+        finally:
+            archive.close()
+        conn.execute("UPDATE ledger_archives SET compacted_at = ? WHERE year = ?",
+                     (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), year))
+        conn.commit()
+        results.append((path, before, os.path.getsize(path)))
+    if main:
+        path = _main_file(conn)
+        before = os.path.getsize(path)
+        conn.execute("VACUUM")
+        # In WAL mode the file only shrinks once the vacuumed pages are checkpointed
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        results.append((path, before, os.path.getsize(path)))
+    return results
+
+
+def listing(conn):
+    rows = []
+    for year, path in archives(conn):
+        row = conn.execute("SELECT transactions, savings, archived_at, compacted_at FROM ledger_archives "
+                           "WHERE year = ?", (year,)).fetchone()
+        rows.append({'year': year, 'path': path, 'transactions': row[0], 'savings': row[1],
+                     'archived_at': row[2], 'compacted_at': row[3],
+                     'bytes': os.path.getsize(path) if os.path.exists(path) else None})
+    return rows
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    import migrations
+
+    parser = argparse.ArgumentParser(description='Rotate closed years of the ledgers into per-year archives')
+    parser.add_argument('--db', default='banksampah_complete.db')
+    sub = parser.add_subparsers(dest='command', required=True)
+    rot = sub.add_parser('rotate', help='Move closed years into archive files')
+    rot.add_argument('--keep-years', type=int, default=KEEP_YEARS,
+                     help='Calendar years kept hot, the current one included')
+    rot.add_argument('--dir', help='Archive directory (default <db>-archive)')
+    rot.add_argument('--batch-rows', type=int, default=DELETE_BATCH_ROWS)
+    comp = sub.add_parser('compact', help='VACUUM and ANALYZE the archives')
+    comp.add_argument('--main', action='store_true', help='Also VACUUM the main database (takes an exclusive lock)')
+    sub.add_parser('list', help='Show the archived years')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db, timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    migrations.migrate(conn)
+    started = time.perf_counter()
+    if args.command == 'rotate':
+        if args.keep_years < 1:
+            raise SystemExit('--keep-years harus minimal 1')
+        rotated = rotate(conn, args.keep_years, args.dir, args.batch_rows)
+        for year, counts in rotated:
+            print(f"📦 {year}: {counts['transactions']} transaksi, {counts['savings']} mutasi tabungan")
+        print(f'✅ {len(rotated)} tahun diarsipkan dalam {time.perf_counter() - started:.1f} detik')
+    elif args.command == 'compact':
+        for path, before, after in compact(conn, args.main):
+            print(f'🗜️  {path}: {before / 1048576:.1f} MB -> {after / 1048576:.1f} MB')
+    else:
+        for row in listing(conn):
+            size = f"{row['bytes'] / 1048576:.1f} MB" if row['bytes'] is not None else 'HILANG'
+            print(f"{row['year']}  {row['transactions']:>10} transaksi  {row['savings']:>10} tabungan  "
+                  f"{size:>10}  {row['path']}")
+    conn.close()
@@ -0,0 +1,299 @@
+import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+# Request and SQL instrumentation, exported in Prometheus text format.
+#
+# Requests: before/after_request hooks time each request per endpoint and
+# split it into phases: `connect` (pool acquire), `sql` (statement time),
+# `serialize` (JSON encoding) and the remainder.
+#
+# SQL: every pooled connection gets a trace callback and a timed cursor.
+# SQLite reports when a statement starts, not when it ends, so a statement is
+# closed when the next statement starts on the same connection or when the
+# connection goes back to the pool; its time is what was spent inside
+# execute and fetch calls until then, so Python work between statements (or
+# between fetches) is not counted as SQL. A coarse progress handler counts VM
+# steps per statement as a cost signal that doesn't depend on wall-clock noise.
+
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+PHASES = ('connect', 'sql', 'serialize')
+PROGRESS_OPS = 100000         # VM instructions between progress callbacks
+MAX_STATEMENTS = 500          # distinct normalized statements tracked
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    # Literals -> ?, IN lists collapsed, whitespace squeezed
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('(?, ...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _StatementClock:
+    __slots__ = ('sql', 'elapsed', 'steps')
+
+    def __init__(self):
+        self.sql = None
+        self.elapsed = 0.0
+        self.steps = 0
+
+
+class TimedCursor(sqlite3.Cursor):
+    # Adds the time spent in each call to the connection's statement clock.
+    # The trace callback fires inside execute, so the time lands on the new
+    # statement.
+
+    def _timed(self, call, *args):
+        started = time.perf_counter()
+        try:
+            return call(*args)
+        finally:
+            self.connection.statement_clock.elapsed += time.perf_counter() - started
+
+    def execute(self, *args):
+        return self._timed(super().execute, *args)
+
+    def executemany(self, *args):
+        return self._timed(super().executemany, *args)
+
+    def fetchone(self):
+        return self._timed(super().fetchone)
+
+    def fetchmany(self, *args):
+        return self._timed(super().fetchmany, *args)
+
+    def fetchall(self):
+        return self._timed(super().fetchall)
+
+    def __next__(self):
+        return self._timed(super().__next__)
+
+
+class _TimedJSONProvider(DefaultJSONProvider):
+    metrics = None
+
+    def response(self, *args, **kwargs):
+        start = time.perf_counter()
+        resp = super().response(*args, **kwargs)
+        self.metrics.add_phase('serialize', time.perf_counter() - start)
+        return resp
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{k}="{_label(v)}"' for k, v in labels.items()) + '}'
+
+
+class Metrics:
+    def __init__(self, slow_query_ms=100, slow_log_size=200, prefix='banksampah'):
+        self.slow_query_s = slow_query_ms / 1000.0
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._requests = {}        # (endpoint, method) -> Histogram
+        self._responses = {}       # (endpoint, method, status) -> count
+        self._phases = {}          # (endpoint, phase) -> seconds
+        self._sql = {}             # verb -> Histogram
+        self._statements = {}      # normalized sql -> [count, seconds, steps]
+        self._normalized = {}
+        self.slow_queries = deque(maxlen=slow_log_size)
+        self.slow_total = 0
+        self.vm_steps = 0
+
+    # --- requests ---------------------------------------------------------
+
+    def instrument(self, app):
+        # Register before the app's own hooks so the timer covers them
+        app.before_request(self._before)
+        app.after_request(self._after)
+        provider = _TimedJSONProvider(app)
+        for attr in ('ensure_ascii', 'sort_keys', 'compact', 'mimetype'):
+            setattr(provider, attr, getattr(app.json, attr))
+        provider.metrics = self
+        app.json = provider
+
+    def _before(self):
+        self._local.request = {'started': time.perf_counter(), 'connect': 0.0, 'sql': 0.0,
+                               'serialize': 0.0, 'statements': 0}
+
+    def add_phase(self, phase, seconds):
+        current = getattr(self._local, 'request', None)
+        if current is not None:
+            current[phase] += seconds
+
+    def _after(self, response):
+        current = getattr(self._local, 'request', None)
+        if current is None:
+            return response
+        self._local.request = None
+        elapsed = time.perf_counter() - current['started']
+        endpoint = request.endpoint or 'unmatched'
+        method = request.method
+        with self._lock:
+            hist = self._requests.get((endpoint, method))
+            if hist is None:
+                hist = self._requests[(endpoint, method)] = Histogram(REQUEST_BUCKETS)
+            hist.observe(elapsed)
+            key = (endpoint, method, response.status_code)
+            self._responses[key] = self._responses.get(key, 0) + 1
+            for phase in PHASES:
+                if current[phase]:
+                    self._phases[(endpoint, phase)] = self._phases.get((endpoint, phase), 0.0) + current[phase]
+        response.headers['Server-Timing'] = ', '.join(
+            [f'{phase};dur={current[phase] * 1000:.2f}' for phase in PHASES]
+            + [f'total;dur={elapsed * 1000:.2f}'])
+        return response
+
+    # --- SQL --------------------------------------------------------------
+
+    def attach(self, conn):
+        # Pool on_connect hook
+        clock = _StatementClock()
+        conn.statement_clock = clock
+        conn.cursor_class = TimedCursor
+
+        def trace(sql):
+            # Statements run by triggers are reported as "-- TRIGGER ..." and
+            # belong to the statement that fired them
+            if sql.startswith('--'):
+                return
+            if clock.sql is not None:
+                self._finish(clock)
+            clock.sql = sql
+            clock.elapsed = 0.0
+            clock.steps = 0
+
+        def progress():
+            clock.steps += 1
+            return 0
+
+        conn.set_trace_callback(trace)
+        conn.set_progress_handler(progress, PROGRESS_OPS)
+
+    def flush(self, conn):
+        # Pool on_release hook: close the connection's last statement
+        clock = getattr(conn, 'statement_clock', None)
+        if clock is not None and clock.sql is not None:
+            self._finish(clock)
+
+    def _finish(self, clock):
+        sql, elapsed, steps = clock.sql, clock.elapsed, clock.steps * PROGRESS_OPS
+        clock.sql = None
+        current = getattr(self._local, 'request', None)
+        if current is not None:
+            current['sql'] += elapsed
+            current['statements'] += 1
+        verb = sql.split(None, 1)[0].upper() if sql.strip() else 'OTHER'
+        with self._lock:
+            normalized = self._normalized.get(sql)
+            if normalized is None:
+                normalized = normalize_sql(sql)
+                if len(self._normalized) >= 4 * MAX_STATEMENTS:
+                    self._normalized.clear()
+                self._normalized[sql] = normalized
+            hist = self._sql.get(verb)
+            if hist is None:
+                hist = self._sql[verb] = Histogram(SQL_BUCKETS)
+            hist.observe(elapsed)
+            self.vm_steps += steps
+            entry = self._statements.get(normalized)
+            if entry is None:
+                if len(self._statements) >= MAX_STATEMENTS:
+                    normalized = '(other)'
+                entry = self._statements.setdefault(normalized, [0, 0.0, 0])
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] += steps
+            if elapsed >= self.slow_query_s:
+                self.slow_total += 1
+                self.slow_queries.append({
+                    'sql': normalized,
+                    'ms': round(elapsed * 1000, 2),
+                    'vm_steps': steps,
+                    'endpoint': request.endpoint if current is not None else None,
+                    'at': time.strftime('%Y-%m-%d %H:%M:%S'),
+                })
+
+    def top_statements(self, limit=20):
+        with self._lock:
+            rows = [{'sql': sql, 'count': n, 'total_ms': round(s * 1000, 2),
+                     'avg_ms': round(s * 1000 / n, 3), 'vm_steps': steps}
+                    for sql, (n, s, steps) in self._statements.items()]
+        rows.sort(key=lambda r: r['total_ms'], reverse=True)
+        return rows[:limit]
+
+    # --- export -----------------------------------------------------------
+
+    def _histogram_lines(self, name, help_text, series):
+        lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for labels, hist in series:
+            cumulative = 0
+            for bound, count in zip(hist.buckets + (float('inf'),), hist.counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{name}_bucket{_labels(**labels, le=le)} {cumulative}')
+            lines.append(f'{name}_sum{_labels(**labels)} {hist.sum:.6f}')
+            lines.append(f'{name}_count{_labels(**labels)} {hist.count}')
+        return lines
+
+    def render(self, gauges=None):
+        # Prometheus text exposition; `gauges` maps a subsystem name to its
+        # stats() dict, numeric values become <prefix>_<name>_<key> gauges
+        p = self.prefix
+        with self._lock:
+            lines = self._histogram_lines(
+                f'{p}_http_request_duration_seconds', 'Request latency by endpoint',
+                [({'endpoint': e, 'method': m}, h) for (e, m), h in sorted(self._requests.items())])
+            lines += [f'# HELP {p}_http_requests_total Responses by endpoint and status',
+                      f'# TYPE {p}_http_requests_total counter']
+            lines += [f'{p}_http_requests_total{_labels(endpoint=e, method=m, status=s)} {n}'
+                      for (e, m, s), n in sorted(self._responses.items())]
+            lines += [f'# HELP {p}_http_request_phase_seconds_total Request time spent in connect/sql/serialize',
+                      f'# TYPE {p}_http_request_phase_seconds_total counter']
+            lines += [f'{p}_http_request_phase_seconds_total{_labels(endpoint=e, phase=ph)} {s:.6f}'
+                      for (e, ph), s in sorted(self._phases.items())]
+            lines += self._histogram_lines(
+                f'{p}_sql_statement_duration_seconds', 'SQL statement time by verb',
+                [({'verb': v}, h) for v, h in sorted(self._sql.items())])
+            lines += [f'# HELP {p}_sql_vm_steps_total SQLite VM instructions (sampled every {PROGRESS_OPS})',
+                      f'# TYPE {p}_sql_vm_steps_total counter', f'{p}_sql_vm_steps_total {self.vm_steps}',
+                      f'# HELP {p}_sql_slow_statements_total Statements over the slow-query threshold',
+                      f'# TYPE {p}_sql_slow_statements_total counter', f'{p}_sql_slow_statements_total {self.slow_total}']
+        for group, stats in (gauges or {}).items():
+            for key, value in sorted(stats.items()):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f'{p}_{group}_{key}'
+                lines += [f'# TYPE {name} gauge', f'{name} {value}']
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,449 @@
+import sqlite3
+from datetime import datetime
+
+import search
+import statements
+import exports
+import sync
+import ledger_archive
+
+# Each migration is (version, description, steps). A step is either a SQL
+# string or a callable taking the cursor. Versions are applied in order, each
+# inside its own transaction, and recorded in schema_version.
+
+INITIAL_TABLES = [
+    # Table: Users
+    '''CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT UNIQUE NOT NULL,
+        name TEXT NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        phone TEXT NOT NULL,
+        password TEXT NOT NULL,
+        address TEXT NOT NULL,
+        balance REAL DEFAULT 0.0,
+        points INTEGER DEFAULT 0,
+        join_date TEXT NOT NULL,
+        is_admin INTEGER DEFAULT 0,
+        latitude REAL,
+        longitude REAL,
+        status TEXT DEFAULT 'ACTIVE'
+    )''',
+
+    # Table: Waste Types (Jenis Sampah)
+    '''CREATE TABLE IF NOT EXISTS waste_types (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        category TEXT NOT NULL,
+        description TEXT,
+        price_per_kg REAL NOT NULL,
+        image_url TEXT,
+        recycling_process TEXT,
+        benefits TEXT,
+        status TEXT DEFAULT 'ACTIVE'
+    )''',
+
+    # Table: Transactions
+    '''CREATE TABLE IF NOT EXISTS transactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT NOT NULL,
+        transaction_id TEXT UNIQUE NOT NULL,
+        waste_type_id INTEGER NOT NULL,
+        weight REAL NOT NULL,
+        total REAL NOT NULL,
+        pickup_schedule_id INTEGER,
+        location TEXT NOT NULL,
+        status TEXT DEFAULT 'PENDING',
+        pickup_date TEXT,
+        pickup_time TEXT,
+        notes TEXT,
+        created_at TEXT NOT NULL,
+        FOREIGN KEY (waste_type_id) REFERENCES waste_types(id)
+    )''',
+
+    # Table: Pickup Schedules (Jadwal Pengangkutan)
+    '''CREATE TABLE IF NOT EXISTS pickup_schedules (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT NOT NULL,
+        schedule_date TEXT NOT NULL,
+        schedule_time TEXT NOT NULL,
+        area TEXT NOT NULL,
+        driver_name TEXT,
+        driver_phone TEXT,
+        vehicle_number TEXT,
+        status TEXT DEFAULT 'SCHEDULED',
+        completed_at TEXT,
+        notes TEXT,
+        created_at TEXT NOT NULL
+    )''',
+
+    # Table: Pickup Requests (Permintaan Penjemputan)
+    '''CREATE TABLE IF NOT EXISTS pickup_requests (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT NOT NULL,
+        request_date TEXT NOT NULL,
+        waste_types TEXT NOT NULL,
+        estimated_weight REAL,
+        address TEXT NOT NULL,
+        latitude REAL,
+        longitude REAL,
+        status TEXT DEFAULT 'PENDING',
+        scheduled_pickup_id INTEGER,
+        notes TEXT,
+        created_at TEXT NOT NULL
+    )''',
+
+    # Table: Collection Points (TPS/Bank Sampah)
+    '''CREATE TABLE IF NOT EXISTS collection_points (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        type TEXT NOT NULL,
+        address TEXT NOT NULL,
+        latitude REAL NOT NULL,
+        longitude REAL NOT NULL,
+        operating_hours TEXT NOT NULL,
+        capacity TEXT,
+        contact_person TEXT,
+        contact_phone TEXT,
+        facilities TEXT,
+        status TEXT DEFAULT 'ACTIVE',
+        created_at TEXT NOT NULL
+    )''',
+
+    # Table: Savings (Tabungan)
+    '''CREATE TABLE IF NOT EXISTS savings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT NOT NULL,
+        transaction_type TEXT NOT NULL,
+        amount REAL NOT NULL,
+        balance_after REAL NOT NULL,
+        description TEXT,
+        reference_id TEXT,
+        created_at TEXT NOT NULL
+    )''',
+
+    # Table: Price Updates (Perubahan Harga)
+    '''CREATE TABLE IF NOT EXISTS price_updates (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        waste_type_id INTEGER NOT NULL,
+        old_price REAL NOT NULL,
+        new_price REAL NOT NULL,
+        effective_date TEXT NOT NULL,
+        reason TEXT,
+        updated_by TEXT NOT NULL,
+        created_at TEXT NOT NULL
+    )''',
+
+    # Table: News & Announcements (Berita & Pengumuman)
+    '''CREATE TABLE IF NOT EXISTS news (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        content TEXT NOT NULL,
+        category TEXT NOT NULL,
+        image_url TEXT,
+        author TEXT NOT NULL,
+        publish_date TEXT NOT NULL,
+        expiry_date TEXT,
+        is_active INTEGER DEFAULT 1,
+        views INTEGER DEFAULT 0,
+        created_at TEXT NOT NULL
+    )''',
+
+    # Table: Education Materials (Edukasi)
+    '''CREATE TABLE IF NOT EXISTS education_materials (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        content TEXT NOT NULL,
+        type TEXT NOT NULL,
+        category TEXT NOT NULL,
+        image_url TEXT,
+        video_url TEXT,
+        author TEXT,
+        views INTEGER DEFAULT 0,
+        likes INTEGER DEFAULT 0,
+        created_at TEXT NOT NULL
+    )''',
+
+    # Table: Tips
+    '''CREATE TABLE IF NOT EXISTS tips (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        content TEXT NOT NULL,
+        icon TEXT,
+        category TEXT NOT NULL,
+        difficulty TEXT,
+        created_at TEXT NOT NULL
+    )''',
+
+    # Table: Statistics
+    '''CREATE TABLE IF NOT EXISTS statistics (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT NOT NULL,
+        total_users INTEGER DEFAULT 0,
+        total_transactions INTEGER DEFAULT 0,
+        total_waste_kg REAL DEFAULT 0,
+        total_value REAL DEFAULT 0,
+        active_pickups INTEGER DEFAULT 0,
+        collection_points_count INTEGER DEFAULT 0,
+        created_at TEXT NOT NULL
+    )''',
+]
+
+HOT_PATH_INDEXES = [
+    # Login looks users up by email (UNIQUE already gives an index) and
+    # member-facing history reads by user_id
+    "CREATE INDEX IF NOT EXISTS idx_transactions_user_created ON transactions (user_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_savings_user_created ON savings (user_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_pickup_requests_user_created ON pickup_requests (user_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_pickup_requests_status ON pickup_requests (status, created_at)",
+
+    # Reference-data listings: filter + ORDER BY served straight from the index
+    "CREATE INDEX IF NOT EXISTS idx_news_active_publish ON news (is_active, publish_date, expiry_date)",
+    "CREATE INDEX IF NOT EXISTS idx_waste_types_status_price ON waste_types (status, price_per_kg)",
+    "CREATE INDEX IF NOT EXISTS idx_collection_points_status ON collection_points (status)",
+    "CREATE INDEX IF NOT EXISTS idx_education_created ON education_materials (created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_tips_created ON tips (created_at)",
+]
+
+ID_SEQUENCES = [
+    # Block allocator for member IDs (see id_allocator.py)
+    '''CREATE TABLE IF NOT EXISTS id_sequences (
+        name TEXT PRIMARY KEY,
+        next_value INTEGER NOT NULL
+    )''',
+]
+
+REVOKED_TOKENS = [
+    '''CREATE TABLE IF NOT EXISTS revoked_tokens (
+        jti TEXT PRIMARY KEY,
+        expires_at REAL NOT NULL
+    )''',
+]
+
+KEYSET_INDEXES = [
+    # Keyset pages on news walk (publish_date, id); an index on
+    # (is_active, publish_date) stores rowid right after publish_date
+    "DROP INDEX IF EXISTS idx_news_active_publish",
+    "CREATE INDEX IF NOT EXISTS idx_news_active_publish ON news (is_active, publish_date)",
+]
+
+ROLLUPS = [
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_statistics_date ON statistics (date)",
+    '''CREATE TABLE IF NOT EXISTS rollup_state (
+        name TEXT PRIMARY KEY,
+        high_water INTEGER NOT NULL,
+        updated_at TEXT NOT NULL
+    )''',
+    # Date-range recompute/backfill
+    "CREATE INDEX IF NOT EXISTS idx_transactions_created ON transactions (created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_users_join_date ON users (is_admin, join_date)",
+]
+
+PICKUP_PLANNING = [
+    # Daily slots looked up by the route planner
+    "CREATE INDEX IF NOT EXISTS idx_pickup_schedules_date ON pickup_schedules (schedule_date, status, schedule_time)",
+]
+
+LEDGER_ARCHIVES = [
+    # Closed years moved out by ledger_archive.py; path is relative to the main file
+    '''CREATE TABLE IF NOT EXISTS ledger_archives (
+        year INTEGER PRIMARY KEY,
+        path TEXT NOT NULL,
+        transactions INTEGER NOT NULL,
+        savings INTEGER NOT NULL,
+        archived_at TEXT NOT NULL,
+        compacted_at TEXT
+    )''',
+    # Rotation selects and deletes savings by year
+    "CREATE INDEX IF NOT EXISTS idx_savings_created ON savings (created_at)",
+]
+
+REVOCATION_SEQUENCE = [
+    # Workers poll for new revocations by seq. rowid can't be used: with a
+    # TEXT primary key it restarts once the expired rows are purged.
+    '''CREATE TABLE revoked_tokens_seq (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        jti TEXT UNIQUE NOT NULL,
+        expires_at REAL NOT NULL
+    )''',
+    "INSERT INTO revoked_tokens_seq (jti, expires_at) SELECT jti, expires_at FROM revoked_tokens ORDER BY rowid",
+    "DROP TABLE revoked_tokens",
+    "ALTER TABLE revoked_tokens_seq RENAME TO revoked_tokens",
+    "CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires ON revoked_tokens (expires_at)",
+]
+
+ARCHIVED_TRANSACTION_IDS = [
+    # transaction_ids of rotated years, so a deposit re-sent after its year
+    # left the main file is still a duplicate. The trigger makes every posting
+    # path fail the same way as on the UNIQUE constraint.
+    '''CREATE TABLE IF NOT EXISTS archived_transaction_ids (
+        transaction_id TEXT PRIMARY KEY,
+        year INTEGER NOT NULL
+    ) WITHOUT ROWID''',
+    '''CREATE TRIGGER IF NOT EXISTS transactions_archived_id BEFORE INSERT ON transactions
+        WHEN EXISTS (SELECT 1 FROM archived_transaction_ids WHERE transaction_id = NEW.transaction_id) BEGIN
+        SELECT RAISE(ABORT, 'UNIQUE constraint failed: transactions.transaction_id');
+    END''',
+    ledger_archive.register_archived_ids,
+]
+
+MIGRATIONS = [
+    (1, 'initial tables', INITIAL_TABLES),
+    (2, 'indexes for hot query paths', HOT_PATH_INDEXES),
+    (3, 'id sequences', ID_SEQUENCES),
+    (4, 'revoked access tokens', REVOKED_TOKENS),
+    (5, 'keyset pagination indexes', KEYSET_INDEXES),
+    (6, 'full-text search index', [search.create_index]),
+    (7, 'statistics rollups', ROLLUPS),
+    (8, 'pickup planning', PICKUP_PLANNING),
+    (9, 'delta-sync feed', [sync.create_feed]),
+    (10, 'ledger archives', LEDGER_ARCHIVES),
+    (11, 'revocation sequence', REVOCATION_SEQUENCE),
+    (12, 'archived transaction ids', ARCHIVED_TRANSACTION_IDS),
+    (13, 'search queue for html content', [search.create_pending]),
+]
+
+# Queries shipped by the app, checked by verify_query_plans(). Keep this list
+# in sync when a route adds a query on a table that can grow.
+SHIPPED_QUERIES = {
+    'login': ("SELECT * FROM users WHERE email = ?", ('x',)),
+    'principal': ("SELECT user_id, name, email, is_admin, status FROM users WHERE user_id = ?", ('x',)),
+    'waste_types': ("SELECT * FROM waste_types WHERE status = 'ACTIVE' ORDER BY price_per_kg DESC", ()),
+    'collection_points': ("SELECT * FROM collection_points WHERE status = 'ACTIVE'", ()),
+    'collection_points_version': ("SELECT MAX(row_version), COUNT(*) FROM collection_points", ()),
+    'news': ('''SELECT * FROM news
+                WHERE is_active = 1 AND (expiry_date IS NULL OR expiry_date >= date('now'))
+                ORDER BY publish_date DESC, id DESC LIMIT ?''', (11,)),
+    'news_page': ('''SELECT * FROM news
+                     WHERE is_active = 1 AND (expiry_date IS NULL OR expiry_date >= date('now'))
+                     AND (publish_date, id) < (?, ?)
+                     ORDER BY publish_date DESC, id DESC LIMIT ?''', ('x', 1, 11)),
+    'education': ("SELECT * FROM education_materials ORDER BY created_at DESC, id DESC LIMIT ?", (11,)),
+    'education_page': ("SELECT * FROM education_materials WHERE (created_at, id) < (?, ?) "
+                       "ORDER BY created_at DESC, id DESC LIMIT ?", ('x', 1, 11)),
+    'tips': ("SELECT * FROM tips ORDER BY created_at DESC, id DESC LIMIT ?", (11,)),
+    'tips_page': ("SELECT * FROM tips WHERE (created_at, id) < (?, ?) "
+                  "ORDER BY created_at DESC, id DESC LIMIT ?", ('x', 1, 11)),
+    'user_transactions': ("SELECT * FROM transactions WHERE user_id = ? "
+                          "ORDER BY created_at DESC, id DESC LIMIT ?", ('x', 11)),
+    'user_transactions_page': ("SELECT * FROM transactions WHERE user_id = ? AND (created_at, id) < (?, ?) "
+                               "ORDER BY created_at DESC, id DESC LIMIT ?", ('x', 'x', 1, 11)),
+    'user_savings': ("SELECT * FROM savings WHERE user_id = ? "
+                     "ORDER BY created_at DESC, id DESC LIMIT ?", ('x', 11)),
+    'user_savings_page': ("SELECT * FROM savings WHERE user_id = ? AND (created_at, id) < (?, ?) "
+                          "ORDER BY created_at DESC, id DESC LIMIT ?", ('x', 'x', 1, 11)),
+    'search': (search.SEARCH_SQL, ('"plastik"', 20)),
+    'statistics_range': ("SELECT * FROM statistics WHERE date >= ? AND date <= ? ORDER BY date", ('x', 'y')),
+    'statistics_before': ("SELECT * FROM statistics WHERE date < ? ORDER BY date DESC LIMIT 1", ('x',)),
+    'rollup_transactions_range': ("SELECT date(created_at), COUNT(*), SUM(weight), SUM(total) FROM transactions "
+                                  "WHERE created_at >= ? AND created_at < ? AND id <= ? AND status != 'CANCELLED' "
+                                  "GROUP BY date(created_at)", ('x', 'y', 1)),
+    'statement_rows': (statements.STATEMENT_SQL.format(savings='savings'), ('x', 'a', 'b')),
+    'statement_opening_balance': (statements.OPENING_BALANCE_SQL.format(savings='savings'), ('x', 'a')),
+    'export_transactions_bounds': (exports.export_sql('transactions', 'a', 'b', 'x')[0], ('a', 'b', 'x')),
+    'export_transactions_chunk': (exports.export_sql('transactions', 'a', 'b', 'x')[1], (1, 2, 'a', 'b', 'x', 10)),
+    'export_savings_chunk': (exports.export_sql('savings', 'a', 'b')[1], (1, 2, 'a', 'b', 10)),
+    # pickup_planner.py (not imported here, it needs NumPy)
+    'planner_slots': ('''SELECT id, area, schedule_time, driver_name, vehicle_number FROM pickup_schedules
+                         WHERE schedule_date = ? AND status = 'SCHEDULED' ORDER BY schedule_time, id''', ('x',)),
+    'planner_pending': ('''SELECT id, user_id, address, latitude, longitude, estimated_weight FROM pickup_requests
+                           WHERE status = 'PENDING' AND request_date <= ? ORDER BY created_at, id''', ('x',)),
+    'sync_tombstones': (sync.TOMBSTONES_SQL, (1, 501)),
+    # History pages once closed years are archived (ledger_archive.py)
+    'ledger_hot_transactions_page': (f"SELECT * FROM {ledger_archive.hot_source('transactions', '2024-01-01')} "
+                                     "WHERE user_id = ? AND (created_at, id) < (?, ?) "
+                                     "ORDER BY created_at DESC, id DESC LIMIT ?", ('x', 'x', 1, 11)),
+    'ledger_hot_savings_page': (f"SELECT * FROM {ledger_archive.hot_source('savings', '2024-01-01')} "
+                                "WHERE user_id = ? AND (created_at, id) < (?, ?) "
+                                "ORDER BY created_at DESC, id DESC LIMIT ?", ('x', 'x', 1, 11)),
+    'ledger_rotate_batch': ("SELECT id FROM savings WHERE created_at >= ? AND created_at < ? LIMIT ?", ('a', 'b', 1)),
+}
+SHIPPED_QUERIES.update({f'sync_{kind}': (sync.changes_sql(kind), (1, 501)) for kind in sync.SOURCES})
+
+
+def current_version(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at TEXT NOT NULL
+    )''')
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+# Apply pending migrations up to `target` (default: latest); returns the
+# versions applied
+def migrate(conn, target=None):
+    applied = []
+    version = current_version(conn)
+    conn.commit()
+    for number, description, steps in MIGRATIONS:
+        if number <= version or (target is not None and number > target):
+            continue
+        c = conn.cursor()
+        try:
+            c.execute("BEGIN IMMEDIATE")
+            for step in steps:
+                if callable(step):
+                    step(c)
+                else:
+                    c.execute(step)
+            c.execute("INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                      (number, description, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(number)
+    return applied
+
+
+def query_plan(conn, sql, params=()):
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+# {name: plan} for every query whose plan has a full table scan or sorts
+# for ORDER BY (GROUP BY over an index-bounded range is fine)
+def unindexed_queries(conn, queries=None):
+    offenders = {}
+    for name, (sql, params) in (queries or SHIPPED_QUERIES).items():
+        plan = query_plan(conn, sql, params)
+        for detail in plan:
+            full_scan = detail.startswith('SCAN') and 'INDEX' not in detail
+            if full_scan or 'USE TEMP B-TREE FOR ORDER BY' in detail:
+                offenders[name] = plan
+                break
+    return offenders
+
+
+class QueryPlanError(Exception):
+    pass
+
+
+def verify_query_plans(conn, queries=None):
+    # Raises QueryPlanError (not assert, which python -O strips)
+    offenders = unindexed_queries(conn, queries)
+    if offenders:
+        raise QueryPlanError('Queries without index: ' + '; '.join(
+            f'{name}: {" | ".join(plan)}' for name, plan in offenders.items()))
+
+
+if __name__ == '__main__':
+    import sys
+
+    path = sys.argv[2] if len(sys.argv) > 2 else 'banksampah_complete.db'
+    command = sys.argv[1] if len(sys.argv) > 1 else 'migrate'
+    conn = sqlite3.connect(path)
+    if command == 'migrate':
+        print(f"Applied migrations: {migrate(conn) or 'none'} (schema version {current_version(conn)})")
+    elif command == 'check':
+        try:
+            verify_query_plans(conn)
+        except QueryPlanError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        print(f"✅ {len(SHIPPED_QUERIES)} queries use an index")
+    else:
+        print("Usage: python migrations.py [migrate|check] [database]")
+        sys.exit(1)
+    conn.close()
@@ -0,0 +1,60 @@
+import base64
+import json
+
+
+class CursorError(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, size=2):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise CursorError('Cursor tidak valid')
+    if not isinstance(values, list) or len(values) != size:
+        raise CursorError('Cursor tidak valid')
+    # Values are bound as SQL parameters; bool is an int subclass but never a key
+    if any(isinstance(v, bool) or not isinstance(v, (str, int, float)) for v in values):
+        raise CursorError('Cursor tidak valid')
+    return values
+
+
+def page_size(args, default, maximum):
+    try:
+        size = int(args.get('limit', default))
+    except (TypeError, ValueError):
+        raise CursorError('Parameter limit tidak valid')
+    return max(1, min(size, maximum))
+
+
+def keyset_page(c, select, where, params, sort_column, cursor=None, limit=10, id_column='id'):
+    # Newest-first page of `select` ("SELECT ... FROM ...") filtered by the
+    # `where` conditions and keyed on (sort_column, id). Each page is an index
+    # range scan starting after the cursor, so deep pages cost the same as
+    # the first. Returns (rows, next_cursor or None).
+    where = list(where)
+    params = list(params)
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor)
+        where.append(f"({sort_column}, {id_column}) < (?, ?)")
+        params += [sort_value, last_id]
+    sql = select
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {sort_column} DESC, {id_column} DESC LIMIT ?"
+    params.append(limit + 1)
+
+    c.execute(sql, params)
+    rows = c.fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([last[sort_column], last[id_column]])
+    return rows, next_cursor
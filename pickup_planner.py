@@ -0,0 +1,216 @@
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+
+from geo_index import EARTH_RADIUS_KM
+
+# Daily pickup planning. PENDING requests due by the plan date are matched to
+# that day's pickup_schedules slots by area (the request address mentions the
+# schedule's area), split into vehicle loads by a capacity-bounded sweep
+# around the area depot (nearest active collection point), and each load is
+# ordered nearest-neighbour then improved with 2-opt. Assigned requests get
+# status SCHEDULED and scheduled_pickup_id = the slot's id.
+
+VEHICLE_CAPACITY_KG = 1000.0
+DEFAULT_WEIGHT_KG = 10.0      # used when a request has no estimated_weight
+TWO_OPT_ROUNDS = 50
+
+SLOTS_SQL = '''SELECT id, area, schedule_time, driver_name, vehicle_number FROM pickup_schedules
+               WHERE schedule_date = ? AND status = 'SCHEDULED' ORDER BY schedule_time, id'''
+
+PENDING_SQL = '''SELECT id, user_id, address, latitude, longitude, estimated_weight FROM pickup_requests
+                 WHERE status = 'PENDING' AND request_date <= ? ORDER BY created_at, id'''
+
+
+def distance_matrix(lat, lon):
+    # Pairwise great-circle distances in km, computed as one broadcast
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def nearest_neighbour(dist):
+    # Tour over all nodes starting and ending at node 0 (the depot)
+    n = len(dist)
+    tour = [0]
+    visited = np.zeros(n, dtype=bool)
+    visited[0] = True
+    for _ in range(n - 1):
+        row = np.where(visited, np.inf, dist[tour[-1]])
+        nxt = int(np.argmin(row))
+        tour.append(nxt)
+        visited[nxt] = True
+    tour.append(0)
+    return np.array(tour)
+
+
+def two_opt(tour, dist, rounds=TWO_OPT_ROUNDS):
+    # Reverse tour[i:j+1] whenever that shortens the closed tour. For each i
+    # the gain of every j is evaluated at once; first improving move wins.
+    tour = tour.copy()
+    n = len(tour)
+    for _ in range(rounds):
+        improved = False
+        for i in range(1, n - 2):
+            a, b = tour[i - 1], tour[i]
+            c = tour[i + 1:n - 1]
+            d = tour[i + 2:n]
+            delta = dist[a, c] + dist[b, d] - dist[a, b] - dist[c, d]
+            j = int(np.argmin(delta))
+            if delta[j] < -1e-9:
+                j += i + 1
+                tour[i:j + 1] = tour[i:j + 1][::-1]
+                improved = True
+        if not improved:
+            break
+    return tour
+
+
+def tour_length(tour, dist):
+    return float(dist[tour[:-1], tour[1:]].sum())
+
+
+def sweep(depot, lat, lon, weight, capacity, vehicles):
+    # Split stops into at most `vehicles` loads by polar angle around the
+    # depot, starting after the widest angular gap so loads stay compact.
+    # Returns (list of index arrays, leftover indexes).
+    if len(lat) == 0:
+        return [], np.empty(0, dtype=np.int64)
+    angle = np.arctan2(lat - depot[0], (lon - depot[1]) * np.cos(np.radians(depot[0])))
+    order = np.argsort(angle)
+    gaps = np.diff(np.append(angle[order], angle[order[0]] + 2 * np.pi))
+    order = np.roll(order, -(int(np.argmax(gaps)) + 1))
+
+    loads, current, load = [], [], 0.0
+    for idx in order:
+        w = weight[idx]
+        if w > capacity:
+            continue
+        if load + w > capacity:
+            loads.append(np.array(current))
+            current, load = [], 0.0
+            if len(loads) == vehicles:
+                break
+        current.append(idx)
+        load += w
+    if current and len(loads) < vehicles:
+        loads.append(np.array(current))
+    placed = np.zeros(len(lat), dtype=bool)
+    for group in loads:
+        placed[group] = True
+    return loads, order[~placed[order]]
+
+
+def match_area(address, areas):
+    # Longest area name mentioned in the address wins ("Pamulang Barat" over "Pamulang")
+    text = (address or '').lower()
+    best = None
+    for area in areas:
+        if area.lower() in text and (best is None or len(area) > len(best)):
+            best = area
+    return best
+
+
+def plan(conn, plan_date, capacity_kg=VEHICLE_CAPACITY_KG):
+    c = conn.cursor()
+    c.execute(SLOTS_SQL, (plan_date,))
+    slots = {}
+    for slot_id, area, schedule_time, driver, vehicle in c.fetchall():
+        slots.setdefault(area, []).append({'schedule_id': slot_id, 'schedule_time': schedule_time,
+                                           'driver_name': driver, 'vehicle_number': vehicle})
+
+    c.execute("SELECT id, name, latitude, longitude FROM collection_points WHERE status = 'ACTIVE'")
+    points = c.fetchall()
+
+    c.execute(PENDING_SQL, (plan_date,))
+    by_area = {}
+    unassigned = []
+    for req_id, user_id, address, lat, lon, weight in c.fetchall():
+        if lat is None or lon is None:
+            unassigned.append({'request_id': req_id, 'reason': 'no_location'})
+            continue
+        area = match_area(address, slots)
+        if area is None:
+            unassigned.append({'request_id': req_id, 'reason': 'no_schedule_for_area'})
+            continue
+        by_area.setdefault(area, []).append((req_id, user_id, lat, lon, weight or DEFAULT_WEIGHT_KG))
+
+    routes = []
+    for area, requests in by_area.items():
+        ids = np.array([r[0] for r in requests])
+        lat = np.array([r[2] for r in requests], dtype=np.float64)
+        lon = np.array([r[3] for r in requests], dtype=np.float64)
+        weight = np.array([r[4] for r in requests], dtype=np.float64)
+
+        centre = (float(lat.mean()), float(lon.mean()))
+        depot = None
+        if points:
+            d = distance_matrix([centre[0]] + [p[2] for p in points], [centre[1]] + [p[3] for p in points])[0, 1:]
+            p = points[int(np.argmin(d))]
+            depot = {'collection_point_id': p[0], 'name': p[1], 'latitude': p[2], 'longitude': p[3]}
+            origin = (p[2], p[3])
+        else:
+            origin = centre
+
+        loads, leftover = sweep(origin, lat, lon, weight, capacity_kg, len(slots[area]))
+        for slot, load in zip(slots[area], loads):
+            dist = distance_matrix(np.append(origin[0], lat[load]), np.append(origin[1], lon[load]))
+            tour = two_opt(nearest_neighbour(dist), dist)
+            stops = [{'order': n, 'request_id': int(ids[load[k - 1]]), 'user_id': requests[load[k - 1]][1],
+                      'latitude': float(lat[load[k - 1]]), 'longitude': float(lon[load[k - 1]]),
+                      'estimated_weight': float(weight[load[k - 1]])}
+                     for n, k in enumerate(tour[1:-1], start=1)]
+            routes.append(dict(slot, area=area, depot=depot, stops=stops,
+                               load_kg=round(float(weight[load].sum()), 2),
+                               distance_km=round(tour_length(tour, dist), 2)))
+        for k in leftover:
+            unassigned.append({'request_id': int(ids[k]), 'reason': 'over_capacity'})
+
+    return {'date': plan_date, 'capacity_kg': capacity_kg, 'routes': routes, 'unassigned': unassigned}
+
+
+def apply(conn, result):
+    # Write assignments back; a request that stopped being PENDING since the
+    # plan was computed is left alone. Returns the number of rows updated.
+    c = conn.cursor()
+    updated = 0
+    try:
+        c.execute("BEGIN IMMEDIATE")
+        for route in result['routes']:
+            c.executemany("UPDATE pickup_requests SET status = 'SCHEDULED', scheduled_pickup_id = ? "
+                          "WHERE id = ? AND status = 'PENDING'",
+                          [(route['schedule_id'], stop['request_id']) for stop in route['stops']])
+            updated += c.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return updated
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+    import time
+
+    parser = argparse.ArgumentParser(description='Plan pickup routes for one day')
+    parser.add_argument('--date', default=datetime.now().strftime('%Y-%m-%d'))
+    parser.add_argument('--capacity', type=float, default=VEHICLE_CAPACITY_KG, help='Vehicle capacity in kg')
+    parser.add_argument('--db', default='banksampah_complete.db')
+    parser.add_argument('--dry-run', action='store_true', help="Print the plan without writing it")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db, timeout=30)
+    started = time.perf_counter()
+    result = plan(conn, args.date, args.capacity)
+    elapsed = time.perf_counter() - started
+    if not args.dry_run:
+        result['updated'] = apply(conn, result)
+    conn.close()
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    planned = sum(len(r['stops']) for r in result['routes'])
+    print(f"✅ {planned} permintaan dijadwalkan dalam {len(result['routes'])} rute ({elapsed:.2f} detik)")
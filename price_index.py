@@ -0,0 +1,93 @@
+import threading
+from bisect import bisect_right
+
+
+def normalize_time(value):
+    # 'YYYY-MM-DD' -> 'YYYY-MM-DD 00:00:00' so dates and timestamps compare as strings
+    value = str(value).strip().replace('T', ' ')
+    return value + ' 00:00:00' if len(value) == 10 else value[:19]
+
+
+class PriceIndex:
+    # Point-in-time price per waste type, built from price_updates. For each
+    # waste type we keep the change times sorted (with the price that took
+    # effect at each) plus the price before the first change, so "price of X
+    # at T" is one bisect.
+
+    def __init__(self):
+        self._series = {}
+        self._lock = threading.RLock()
+        self.loaded = False
+
+    def load(self, conn):
+        c = conn.cursor()
+        c.execute("SELECT id, price_per_kg FROM waste_types")
+        current = {row[0]: row[1] for row in c.fetchall()}
+        c.execute('''SELECT waste_type_id, old_price, new_price, effective_date
+                     FROM price_updates ORDER BY waste_type_id, effective_date, id''')
+        series = {}
+        for wt_id, old_price, new_price, effective_date in c.fetchall():
+            entry = series.setdefault(wt_id, [old_price, [], []])
+            entry[1].append(normalize_time(effective_date))
+            entry[2].append(new_price)
+        for wt_id, price in current.items():
+            series.setdefault(wt_id, [price, [], []])
+        with self._lock:
+            self._series = series
+            self.loaded = True
+
+    def record_change(self, waste_type_id, old_price, new_price, effective_date):
+        at = normalize_time(effective_date)
+        with self._lock:
+            entry = self._series.setdefault(waste_type_id, [old_price, [], []])
+            i = bisect_right(entry[1], at)
+            entry[1].insert(i, at)
+            entry[2].insert(i, new_price)
+
+    def price_at(self, waste_type_id, when):
+        with self._lock:
+            entry = self._series.get(waste_type_id)
+            if entry is None:
+                return None
+            i = bisect_right(entry[1], normalize_time(when))
+            return entry[0] if i == 0 else entry[2][i - 1]
+
+    def last_change(self, waste_type_id):
+        # Time of the latest recorded change, None when there is none
+        with self._lock:
+            entry = self._series.get(waste_type_id)
+            return entry[1][-1] if entry and entry[1] else None
+
+    def current_price(self, waste_type_id):
+        with self._lock:
+            entry = self._series.get(waste_type_id)
+            if entry is None:
+                return None
+            return entry[2][-1] if entry[2] else entry[0]
+
+    def history(self, waste_type_id):
+        # [{'from', 'to', 'price_per_kg'}], oldest first; open ends are None
+        with self._lock:
+            entry = self._series.get(waste_type_id)
+            if entry is None:
+                return None
+            base, times, prices = entry[0], list(entry[1]), list(entry[2])
+        intervals = []
+        start, price = None, base
+        for at, new_price in zip(times, prices):
+            intervals.append({'from': start, 'to': at, 'price_per_kg': price})
+            start, price = at, new_price
+        intervals.append({'from': start, 'to': None, 'price_per_kg': price})
+        return intervals
+
+    def reprice(self, transactions):
+        # For reports and disputes: price each {'waste_type_id', 'weight',
+        # 'created_at', ...} at its own time. Returns new dicts with
+        # price_per_kg and total_at_price (None when the type is unknown).
+        repriced = []
+        with self._lock:
+            for tx in transactions:
+                price = self.price_at(tx['waste_type_id'], tx['created_at'])
+                total = round(tx['weight'] * price, 2) if price is not None else None
+                repriced.append(dict(tx, price_per_kg=price, total_at_price=total))
+        return repriced
@@ -0,0 +1,85 @@
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+# reportlab and matplotlib are only needed for PDF statements and charts, so
+# they are imported on first use instead of at app start-up.
+
+_lock = threading.Lock()
+_pdf = None
+_pyplot = None
+
+
+def pdf():
+    global _pdf
+    with _lock:
+        if _pdf is None:
+            from reportlab.pdfgen import canvas
+            from reportlab.lib.pagesizes import letter, A4
+            from reportlab.lib import colors
+            from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
+            from reportlab.lib.styles import getSampleStyleSheet
+            _pdf = SimpleNamespace(canvas=canvas, letter=letter, A4=A4, colors=colors,
+                                   SimpleDocTemplate=SimpleDocTemplate, Table=Table,
+                                   TableStyle=TableStyle, Paragraph=Paragraph,
+                                   getSampleStyleSheet=getSampleStyleSheet)
+        return _pdf
+
+
+def pyplot():
+    global _pyplot
+    with _lock:
+        if _pyplot is None:
+            import matplotlib
+            matplotlib.use('Agg')
+            import matplotlib.pyplot as plt
+            _pyplot = plt
+        return _pyplot
+
+
+def loaded():
+    return {
+        'reportlab': 'reportlab' in sys.modules,
+        'matplotlib': 'matplotlib' in sys.modules,
+        'numpy': 'numpy' in sys.modules,
+    }
+
+
+def _max_rss_mb():
+    # resource is Unix-only; on Windows the RSS figures are left out (None)
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return round(rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+# Start-up report: time and peak RSS since `started` (a perf_counter value
+# taken before the app's imports), plus what loading each reporting stack
+# would add on top.
+def startup_report(started, include_stacks=True):
+    report = {
+        'startup_ms': round((time.perf_counter() - started) * 1000, 1),
+        'max_rss_mb': _max_rss_mb(),
+        'modules_loaded': len(sys.modules),
+        'stacks_loaded': loaded(),
+    }
+    if include_stacks:
+        for name, loader in (('reportlab', pdf), ('matplotlib', pyplot)):
+            before_rss = _max_rss_mb()
+            before_modules = len(sys.modules)
+            t0 = time.perf_counter()
+            try:
+                loader()
+            except ImportError as e:
+                report[f'{name}_import'] = {'error': str(e)}
+                continue
+            report[f'{name}_import'] = {
+                'ms': round((time.perf_counter() - t0) * 1000, 1),
+                'rss_delta_mb': round(_max_rss_mb() - before_rss, 1) if before_rss is not None else None,
+                'modules': len(sys.modules) - before_modules,
+            }
+    return report
@@ -0,0 +1,100 @@
+import functools
+import gzip
+import hashlib
+import threading
+import time
+
+from flask import request, Response
+
+# Headers the view sets that are replayed from the cache; Content-Length and
+# Content-Encoding are recomputed per response.
+_SKIP_HEADERS = {'content-length', 'content-type', 'content-encoding'}
+
+
+class CachedResponse:
+    def __init__(self, body, mimetype, headers, ttl):
+        self.body = body
+        self.gzipped = gzip.compress(body, compresslevel=6)
+        self.mimetype = mimetype
+        self.headers = headers
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.expires = time.monotonic() + ttl
+
+    def respond(self):
+        if request.if_none_match.contains(self.etag):
+            resp = Response(status=304)
+        else:
+            use_gzip = 'gzip' in request.accept_encodings and len(self.gzipped) < len(self.body)
+            resp = Response(self.gzipped if use_gzip else self.body, mimetype=self.mimetype)
+            if use_gzip:
+                resp.headers['Content-Encoding'] = 'gzip'
+        for name, value in self.headers:
+            resp.headers[name] = value
+        resp.set_etag(self.etag)
+        resp.headers['Vary'] = 'Accept-Encoding'
+        # Clients may keep the body but must revalidate; a match costs a 304
+        resp.headers['Cache-Control'] = 'public, no-cache'
+        return resp
+
+
+class ResponseCache:
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._by_table = {}
+        self._generation = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def cached(self, ttl, tables):
+        tables = tuple(tables)
+
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                key = (request.endpoint, request.query_string)
+                with self._lock:
+                    entry = self._entries.get(key)
+                    if entry is not None and entry.expires > time.monotonic():
+                        self.hits += 1
+                        return entry.respond()
+                    self.misses += 1
+                    generation = tuple(self._generation.get(t, 0) for t in tables)
+
+                resp = view(*args, **kwargs)
+                if not isinstance(resp, Response) or resp.status_code != 200:
+                    return resp
+
+                headers = [(k, v) for k, v in resp.headers.items() if k.lower() not in _SKIP_HEADERS]
+                entry = CachedResponse(resp.get_data(), resp.mimetype, headers, ttl)
+                with self._lock:
+                    # Don't store a body computed before a concurrent invalidation
+                    if generation == tuple(self._generation.get(t, 0) for t in tables):
+                        self._entries.pop(key, None)
+                        if len(self._entries) >= self.max_entries:
+                            self._entries.pop(next(iter(self._entries)))
+                        self._entries[key] = entry
+                        for t in tables:
+                            self._by_table.setdefault(t, set()).add(key)
+                return entry.respond()
+            return wrapper
+        return decorator
+
+    def invalidate(self, *tables):
+        with self._lock:
+            for t in tables:
+                self._generation[t] = self._generation.get(t, 0) + 1
+                for key in self._by_table.pop(t, ()):
+                    self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            for t in list(self._generation) + list(self._by_table):
+                self._generation[t] = self._generation.get(t, 0) + 1
+            self._entries.clear()
+            self._by_table.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,224 @@
+import sqlite3
+from datetime import date, datetime, timedelta
+
+import ledger_archive
+
+# Daily rows in `statistics`:
+#   flows  (summed over a period): total_transactions, total_waste_kg, total_value
+#   stocks (last value of a period): total_users, active_pickups,
+#          collection_points_count
+# Flows are added incrementally from a high-water mark on transactions.id;
+# total_users from a high-water mark on users.id. active_pickups and
+# collection_points_count are snapshots taken for today on each refresh.
+
+FLOWS = ('total_transactions', 'total_waste_kg', 'total_value')
+STOCKS = ('total_users', 'active_pickups', 'collection_points_count')
+GRANULARITIES = ('day', 'week', 'month')
+
+# Daily flows of one ledger source; {bound} limits the hot table to the
+# high-water mark
+FLOWS_SQL = '''SELECT date(created_at), COUNT(*), SUM(weight), SUM(total) FROM {source}
+               WHERE created_at >= ? AND created_at < ?{bound} AND status != 'CANCELLED'
+               GROUP BY date(created_at)'''
+
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _get_state(c, name):
+    c.execute("SELECT high_water FROM rollup_state WHERE name = ?", (name,))
+    row = c.fetchone()
+    return row[0] if row else 0
+
+
+def _set_state(c, name, value):
+    c.execute('''INSERT INTO rollup_state (name, high_water, updated_at) VALUES (?, ?, ?)
+                 ON CONFLICT(name) DO UPDATE SET high_water = excluded.high_water,
+                                                 updated_at = excluded.updated_at''',
+              (name, value, _now()))
+
+
+def _add_flows(c, day, count, kg, value):
+    c.execute('''INSERT INTO statistics (date, total_transactions, total_waste_kg, total_value, created_at)
+                 VALUES (?, ?, ?, ?, ?)
+                 ON CONFLICT(date) DO UPDATE SET
+                     total_transactions = total_transactions + excluded.total_transactions,
+                     total_waste_kg = total_waste_kg + excluded.total_waste_kg,
+                     total_value = total_value + excluded.total_value''',
+              (day, count, kg or 0, value or 0, _now()))
+
+
+def _set_stocks(c, day, **values):
+    columns = ', '.join(values)
+    updates = ', '.join(f'{k} = excluded.{k}' for k in values)
+    c.execute(f'''INSERT INTO statistics (date, {columns}, created_at)
+                  VALUES (?, {', '.join('?' * len(values))}, ?)
+                  ON CONFLICT(date) DO UPDATE SET {updates}''',
+              (day, *values.values(), _now()))
+
+
+def _refresh(c):
+    tx_mark = _get_state(c, 'transactions')
+    c.execute("SELECT MAX(id) FROM transactions")
+    # Every hot row may have been rotated out; the mark still holds
+    tx_max = c.fetchone()[0] or tx_mark
+    if tx_max > tx_mark:
+        c.execute('''SELECT date(created_at), COUNT(*), SUM(weight), SUM(total) FROM transactions
+                     WHERE id > ? AND id <= ? AND status != 'CANCELLED'
+                     GROUP BY date(created_at)''', (tx_mark, tx_max))
+        for day, count, kg, value in c.fetchall():
+            _add_flows(c, day, count, kg, value)
+        _set_state(c, 'transactions', tx_max)
+
+    user_mark = _get_state(c, 'users')
+    members = _get_state(c, 'users_total')
+    c.execute("SELECT COUNT(*), MAX(id) FROM users WHERE id > ? AND is_admin = 0", (user_mark,))
+    new_members, user_max = c.fetchone()
+    if user_max:
+        members += new_members
+        _set_state(c, 'users', user_max)
+        _set_state(c, 'users_total', members)
+
+    c.execute("SELECT COUNT(*) FROM pickup_requests WHERE status IN ('PENDING', 'SCHEDULED')")
+    active_pickups = c.fetchone()[0]
+    c.execute("SELECT COUNT(*) FROM collection_points WHERE status = 'ACTIVE'")
+    points = c.fetchone()[0]
+    _set_stocks(c, date.today().isoformat(), total_users=members,
+                active_pickups=active_pickups, collection_points_count=points)
+    return tx_max
+
+
+def refresh(conn):
+    # Fold in everything since the last refresh; cost is proportional to new rows
+    c = conn.cursor()
+    try:
+        c.execute("BEGIN IMMEDIATE")
+        _refresh(c)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def recompute(conn, date_from, date_to):
+    # Rebuild flows and total_users for [date_from, date_to] from the ledger.
+    # Runs a refresh first in the same transaction so the range is counted
+    # exactly up to the high-water mark and later refreshes don't double count.
+    # Snapshot columns can't be reconstructed and are left as they are.
+    c = conn.cursor()
+    end = (date.fromisoformat(date_to) + timedelta(days=1)).isoformat()
+    # Archived years are closed: they are summed one at a time before the
+    # transaction starts (ATTACH is not allowed inside it)
+    archived, hot = ledger_archive.split(conn, 'transactions', date_from, end)
+    flows = []
+    for source in archived:
+        c.execute(FLOWS_SQL.format(source=source, bound=''), (date_from, end))
+        flows += c.fetchall()
+    try:
+        c.execute("BEGIN IMMEDIATE")
+        tx_max = _refresh(c)
+
+        c.execute('''UPDATE statistics SET total_transactions = 0, total_waste_kg = 0, total_value = 0
+                     WHERE date >= ? AND date <= ?''', (date_from, date_to))
+        if hot:
+            c.execute(FLOWS_SQL.format(source=hot, bound=' AND id <= ?'), (date_from, end, tx_max))
+            flows += c.fetchall()
+        for day, count, kg, value in flows:
+            _add_flows(c, day, count, kg, value)
+
+        c.execute("SELECT COUNT(*) FROM users WHERE is_admin = 0 AND join_date < ?", (date_from,))
+        members = c.fetchone()[0]
+        c.execute('''SELECT join_date, COUNT(*) FROM users
+                     WHERE is_admin = 0 AND join_date >= ? AND join_date < ?
+                     GROUP BY join_date''', (date_from, end))
+        joined = dict(c.fetchall())
+        day = date.fromisoformat(date_from)
+        last = date.fromisoformat(date_to)
+        while day <= last:
+            members += joined.get(day.isoformat(), 0)
+            _set_stocks(c, day.isoformat(), total_users=members)
+            day += timedelta(days=1)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def backfill(conn):
+    c = conn.cursor()
+    c.execute(f"SELECT MIN(date(created_at)) FROM {next(ledger_archive.sources(conn, 'transactions'))}")
+    first_tx = c.fetchone()[0]
+    c.execute("SELECT MIN(join_date) FROM users WHERE is_admin = 0")
+    first_user = c.fetchone()[0]
+    starts = [d for d in (first_tx, first_user) if d]
+    today = date.today().isoformat()
+    recompute(conn, min(starts) if starts else today, today)
+
+
+def _period(day, granularity):
+    if granularity == 'day':
+        return day
+    d = date.fromisoformat(day)
+    if granularity == 'week':
+        return (d - timedelta(days=d.weekday())).isoformat()
+    return day[:7]
+
+
+def query(conn, date_from, date_to, granularity='day'):
+    # Rollup rows for the range grouped by day/week/month. Flows are summed;
+    # stocks take the latest value, carried forward over days without a row.
+    c = conn.cursor()
+    c.execute('''SELECT total_users, active_pickups, collection_points_count FROM statistics
+                 WHERE date < ? ORDER BY date DESC LIMIT 1''', (date_from,))
+    row = c.fetchone()
+    stocks = dict(zip(STOCKS, row)) if row else dict.fromkeys(STOCKS, 0)
+    c.execute(f'''SELECT date, {', '.join(FLOWS + STOCKS)} FROM statistics
+                  WHERE date >= ? AND date <= ? ORDER BY date''', (date_from, date_to))
+    by_day = {r[0]: r for r in c.fetchall()}
+
+    periods = {}
+    day = date.fromisoformat(date_from)
+    last = date.fromisoformat(date_to)
+    while day <= last:
+        key = day.isoformat()
+        bucket = periods.setdefault(_period(key, granularity),
+                                    dict({'period': _period(key, granularity)}, **dict.fromkeys(FLOWS, 0)))
+        r = by_day.get(key)
+        if r is not None:
+            for i, name in enumerate(FLOWS, start=1):
+                bucket[name] += r[i] or 0
+            for i, name in enumerate(STOCKS, start=1 + len(FLOWS)):
+                if r[i] is not None:
+                    stocks[name] = r[i]
+        bucket.update(stocks)
+        day += timedelta(days=1)
+
+    result = list(periods.values())
+    for bucket in result:
+        bucket['total_waste_kg'] = round(bucket['total_waste_kg'], 3)
+        bucket['total_value'] = round(bucket['total_value'], 2)
+    return result
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Maintain the daily statistics rollups')
+    parser.add_argument('command', choices=('refresh', 'backfill', 'recompute'))
+    parser.add_argument('--from', dest='date_from')
+    parser.add_argument('--to', dest='date_to')
+    parser.add_argument('--db', default='banksampah_complete.db')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db, timeout=30)
+    if args.command == 'refresh':
+        refresh(conn)
+    elif args.command == 'backfill':
+        backfill(conn)
+    else:
+        if not args.date_from or not args.date_to:
+            parser.error('recompute needs --from and --to')
+        recompute(conn, args.date_from, args.date_to)
+    conn.close()
+    print(f"✅ Statistics {args.command} selesai")
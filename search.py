@@ -0,0 +1,163 @@
+import html
+import re
+
+# One FTS5 table mirrors the searchable content tables. rowid = id * 4 + code,
+# so the sync triggers touch a single row by rowid instead of scanning.
+# News and education bodies are HTML: their triggers only queue the row in
+# search_pending, and sync_pending() indexes it with the tags stripped in
+# Python. The triggers stay plain SQL, so any writer (sqlite3 CLI, scripts,
+# bulk tools) can change these tables.
+#   kind: (table, code, title, body, active condition, columns that matter)
+SOURCES = {
+    'waste_type': ('waste_types', 0, "{r}.name",
+                   "{r}.category || ' ' || COALESCE({r}.description, '') || ' ' || "
+                   "COALESCE({r}.recycling_process, '') || ' ' || COALESCE({r}.benefits, '')",
+                   "{r}.status = 'ACTIVE'",
+                   'name, category, description, recycling_process, benefits, status'),
+    'news': ('news', 1, "{r}.title",
+             "{r}.category || ' ' || {r}.content",
+             "{r}.is_active = 1",
+             'title, content, category, is_active'),
+    'education': ('education_materials', 2, "{r}.title",
+                  "{r}.category || ' ' || {r}.type || ' ' || {r}.content",
+                  "1",
+                  'title, content, type, category'),
+    'tip': ('tips', 3, "{r}.title",
+            "{r}.category || ' ' || {r}.content",
+            "1",
+            'title, content, category'),
+}
+HTML_KINDS = ('news', 'education')
+
+_TAG = re.compile(r'<[^>]*>')
+_SPACE = re.compile(r'\s+')
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def strip_html(value):
+    if value is None:
+        return ''
+    return _SPACE.sub(' ', html.unescape(_TAG.sub(' ', value))).strip()
+
+
+def _insert_sql(kind, r):
+    table, code, title, body, active, _ = SOURCES[kind]
+    return (f"INSERT INTO search_index (rowid, kind, ref_id, title, body) "
+            f"SELECT {r}.id * 4 + {code}, '{kind}', {r}.id, {title.format(r=r)}, {body.format(r=r)}")
+
+
+def _queue_sql(kind, r):
+    return f"INSERT OR IGNORE INTO search_pending (kind, ref_id) VALUES ('{kind}', {r}.id)"
+
+
+def create_triggers(c, kind):
+    table, code, title, body, active, columns = SOURCES[kind]
+    if kind in HTML_KINDS:
+        insert = _queue_sql(kind, 'NEW')
+    else:
+        insert = f"{_insert_sql(kind, 'NEW')} WHERE {active.format(r='NEW')}"
+    for suffix in ('ai', 'ad', 'au'):
+        c.execute(f"DROP TRIGGER IF EXISTS {table}_search_{suffix}")
+    c.execute(f'''CREATE TRIGGER {table}_search_ai AFTER INSERT ON {table} BEGIN
+        {insert};
+    END''')
+    c.execute(f'''CREATE TRIGGER {table}_search_ad AFTER DELETE ON {table} BEGIN
+        DELETE FROM search_index WHERE rowid = OLD.id * 4 + {code};
+    END''')
+    c.execute(f'''CREATE TRIGGER {table}_search_au AFTER UPDATE OF {columns} ON {table} BEGIN
+        DELETE FROM search_index WHERE rowid = OLD.id * 4 + {code};
+        {insert};
+    END''')
+
+
+def create_pending(c):
+    # Migration step: queue table, UDF-free triggers for the HTML sources
+    c.execute('''CREATE TABLE IF NOT EXISTS search_pending (
+        kind TEXT NOT NULL,
+        ref_id INTEGER NOT NULL,
+        PRIMARY KEY (kind, ref_id)
+    ) WITHOUT ROWID''')
+    for kind in HTML_KINDS:
+        create_triggers(c, kind)
+
+
+def create_index(c):
+    # Migration step: FTS table, sync triggers and backfill
+    c.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5 (
+        kind UNINDEXED,
+        ref_id UNINDEXED,
+        title,
+        body,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )''')
+    # Titles weigh 5x the body; ORDER BY rank then runs inside FTS5
+    c.execute("INSERT INTO search_index (search_index, rank) VALUES ('rank', 'bm25(0.0, 0.0, 5.0, 1.0)')")
+    create_pending(c)
+    for kind, (table, code, title, body, active, columns) in SOURCES.items():
+        if kind in HTML_KINDS:
+            c.execute(f"INSERT OR IGNORE INTO search_pending (kind, ref_id) SELECT '{kind}', id FROM {table}")
+        else:
+            create_triggers(c, kind)
+            c.execute(f"{_insert_sql(kind, 't')} FROM {table} t WHERE {active.format(r='t')}")
+    sync_pending(c)
+
+
+def sync_pending(c):
+    # Index the queued news/education rows with their HTML stripped. Run it
+    # inside a write transaction; returns the number of rows handled.
+    pending = c.execute("SELECT kind, ref_id FROM search_pending").fetchall()
+    for kind, ref_id in pending:
+        table, code, title, body, active, _ = SOURCES[kind]
+        c.execute("DELETE FROM search_index WHERE rowid = ?", (ref_id * 4 + code,))
+        row = c.execute(f"SELECT {title.format(r='t')}, {body.format(r='t')} FROM {table} t "
+                        f"WHERE t.id = ? AND {active.format(r='t')}", (ref_id,)).fetchone()
+        if row is not None:
+            c.execute("INSERT INTO search_index (rowid, kind, ref_id, title, body) VALUES (?, ?, ?, ?, ?)",
+                      (ref_id * 4 + code, kind, ref_id, row[0], strip_html(row[1])))
+        c.execute("DELETE FROM search_pending WHERE kind = ? AND ref_id = ?", (kind, ref_id))
+    return len(pending)
+
+
+def build_match(query, any_term=False):
+    # Quote every word so user input can't inject FTS syntax
+    words = _WORD.findall(query)[:16]
+    if not words:
+        return None
+    terms = [f'"{w}"' for w in words]
+    return (' OR ' if any_term else ' ').join(terms)
+
+
+_MARK_START, _MARK_END = '\x02', '\x03'
+
+SEARCH_SQL = f'''SELECT search_index.kind, search_index.ref_id, search_index.title,
+                        snippet(search_index, 3, '{_MARK_START}', '{_MARK_END}', '…', 16) AS snippet,
+                        rank AS score
+                 FROM search_index
+                 LEFT JOIN news ON search_index.kind = 'news' AND news.id = search_index.ref_id
+                 WHERE search_index MATCH ?
+                   AND (news.id IS NULL OR news.expiry_date IS NULL OR news.expiry_date >= date('now'))
+                 ORDER BY rank
+                 LIMIT ?'''
+
+
+def search(c, query, limit=20):
+    # All words first; if nothing matches, any word, still BM25-ranked
+    for any_term in (False, True):
+        match = build_match(query, any_term)
+        if match is None:
+            return []
+        c.execute(SEARCH_SQL, (match, limit))
+        rows = c.fetchall()
+        if rows or any_term:
+            break
+    results = []
+    for row in rows:
+        snippet = html.escape(row[3]).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+        results.append({
+            'type': row[0],
+            'id': row[1],
+            'title': row[2],
+            'snippet': snippet,
+            'score': round(-row[4], 4),
+        })
+    return results
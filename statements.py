@@ -0,0 +1,219 @@
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from itertools import islice
+
+import ledger_archive
+import reporting
+
+# "Buku tabungan" statements from the savings ledger. Rows are pulled from the
+# cursor one page at a time and drawn straight onto the canvas as a Table, so
+# the history is never held in memory as rows or flowables; only the finished
+# (compressed) page streams accumulate until the PDF is written out.
+
+ROWS_PER_PAGE = 30
+BATCH_SIZE = 50
+
+# {savings} is one of ledger_archive.sources(): the hot table or an archived year
+STATEMENT_SQL = '''SELECT created_at, description, reference_id, amount, balance_after FROM {savings}
+                   WHERE user_id = ? AND created_at >= ? AND created_at < ?
+                   ORDER BY created_at, id'''
+
+OPENING_BALANCE_SQL = '''SELECT balance_after FROM {savings} WHERE user_id = ? AND created_at < ?
+                         ORDER BY created_at DESC, id DESC LIMIT 1'''
+
+_HEADER = ('Tanggal', 'Keterangan', 'Referensi', 'Debit', 'Kredit', 'Saldo')
+_COL_WIDTHS = (62, 196, 92, 58, 58, 64)
+
+
+def rupiah(value):
+    return 'Rp ' + f'{value:,.0f}'.replace(',', '.')
+
+
+def month_range(month):
+    # 'YYYY-MM' -> ('YYYY-MM-01', first day of the next month)
+    start = datetime.strptime(month, '%Y-%m')
+    index = start.year * 12 + start.month
+    return start.strftime('%Y-%m-%d'), f'{index // 12:04d}-{index % 12 + 1:02d}-01'
+
+
+def _draw_header(canvas, page_size, member, date_from, date_to, page):
+    width, height = page_size
+    canvas.setFont('Helvetica-Bold', 14)
+    canvas.drawString(40, height - 50, 'Buku Tabungan Bank Sampah Bersih')
+    canvas.setFont('Helvetica', 9)
+    canvas.drawString(40, height - 68, f"{member['name']} ({member['user_id']})")
+    canvas.drawString(40, height - 80, member['address'] or '')
+    # date_to is exclusive; print the last day it covers
+    end = (datetime.strptime(date_to[:10], '%Y-%m-%d') - timedelta(days=1)) if date_to else datetime.now()
+    period = f"{date_from or 'awal'} s/d {end.strftime('%Y-%m-%d')}"
+    canvas.drawRightString(width - 40, height - 68, f'Periode: {period}')
+    canvas.drawRightString(width - 40, height - 80, f'Halaman {page}')
+    return height - 100
+
+
+def _ledger_rows(conn, user_id, date_from, date_to):
+    # Savings rows in order across the archived years and the hot table,
+    # fetched a page at a time
+    sources = ledger_archive.sources(conn, 'savings', date_from, date_to)
+    c = conn.cursor()
+    for source in sources:
+        c.execute(STATEMENT_SQL.format(savings=source), (user_id, date_from, date_to))
+        while True:
+            rows = c.fetchmany(ROWS_PER_PAGE)
+            if not rows:
+                break
+            yield from rows
+
+
+def write_statement(conn, user_id, out, date_from=None, date_to=None):
+    # Writes the PDF to `out` (path or binary file). date_to is exclusive.
+    # Returns the number of ledger rows, or None when the member doesn't exist.
+    lib = reporting.pdf()
+    c = conn.cursor()
+    c.execute("SELECT user_id, name, address, balance FROM users WHERE user_id = ?", (user_id,))
+    row = c.fetchone()
+    if row is None:
+        return None
+    member = {'user_id': row[0], 'name': row[1], 'address': row[2], 'balance': row[3]}
+
+    # Newest source first; a member idle since an archived year finds it there
+    row = None
+    for source in ledger_archive.sources(conn, 'savings', date_to=date_from or '0000', newest_first=True):
+        c.execute(OPENING_BALANCE_SQL.format(savings=source), (user_id, date_from or '0000'))
+        row = c.fetchone()
+        if row:
+            break
+    opening = balance = row[0] if row else 0.0
+
+    style = lib.TableStyle([
+        ('FONT', (0, 0), (-1, -1), 'Helvetica', 8),
+        ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold', 8),
+        ('BACKGROUND', (0, 0), (-1, 0), lib.colors.HexColor('#2e7d32')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), lib.colors.white),
+        ('ALIGN', (3, 0), (-1, -1), 'RIGHT'),
+        ('LINEBELOW', (0, 0), (-1, -1), 0.25, lib.colors.lightgrey),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ])
+    pdf = lib.canvas.Canvas(out, pagesize=lib.A4, pageCompression=1)
+    pdf.setTitle(f"Buku Tabungan {member['user_id']}")
+
+    ledger = _ledger_rows(conn, user_id, date_from or '0000', date_to or '9999')
+    page, count, credit, debit = 0, 0, 0.0, 0.0
+    rows = list(islice(ledger, ROWS_PER_PAGE))
+    while True:
+        page += 1
+        top = _draw_header(pdf, lib.A4, member, date_from, date_to, page)
+        data = [_HEADER]
+        if page == 1:
+            data.append(('', 'Saldo awal', '', '', '', rupiah(opening)))
+        for created_at, description, reference_id, amount, balance_after in rows:
+            data.append((created_at[:10], (description or '')[:48], reference_id or '',
+                         rupiah(-amount) if amount < 0 else '', rupiah(amount) if amount >= 0 else '',
+                         rupiah(balance_after)))
+            if amount < 0:
+                debit -= amount
+            else:
+                credit += amount
+            balance = balance_after
+        count += len(rows)
+
+        rows = list(islice(ledger, ROWS_PER_PAGE))
+        last = not rows
+        if last:
+            data.append(('', 'Saldo akhir', '', rupiah(debit), rupiah(credit), rupiah(balance)))
+        table = lib.Table(data, colWidths=_COL_WIDTHS)
+        table.setStyle(style)
+        _, h = table.wrapOn(pdf, lib.A4[0] - 80, top)
+        table.drawOn(pdf, 40, top - h)
+        if last:
+            pdf.setFont('Helvetica', 8)
+            pdf.drawString(40, top - h - 20, f"Dicetak {datetime.now().strftime('%Y-%m-%d %H:%M')} - "
+                                             f"saldo rekening saat ini {rupiah(member['balance'] or 0)}")
+        pdf.showPage()
+        if last:
+            break
+    pdf.save()
+    return count
+
+
+def _render_batch(db_path, user_ids, date_from, date_to, out_dir):
+    # Runs in a worker process with its own read-only connection
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        written = []
+        for user_id in user_ids:
+            path = os.path.join(out_dir, f'{user_id}.pdf')
+            if write_statement(conn, user_id, path, date_from, date_to) is not None:
+                written.append((user_id, path))
+        return written
+    finally:
+        conn.close()
+
+
+def month_end(db_path, month, zip_path, workers=None, batch_size=BATCH_SIZE):
+    # Statements for every active member for `month` ('YYYY-MM'), rendered in
+    # a process pool and collected into one zip. Workers write PDFs to a
+    # scratch directory and the parent moves them into the archive as each
+    # batch finishes. Returns the number of statements.
+    date_from, date_to = month_range(month)
+    conn = sqlite3.connect(db_path)
+    members = [row[0] for row in conn.execute(
+        "SELECT user_id FROM users WHERE is_admin = 0 AND status = 'ACTIVE' ORDER BY id")]
+    conn.close()
+
+    scratch = tempfile.mkdtemp(prefix='statements-')
+    written = 0
+    try:
+        with ProcessPoolExecutor(workers or os.cpu_count(),
+                                 mp_context=multiprocessing.get_context('spawn')) as executor, \
+                zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_STORED) as archive:
+            futures = [executor.submit(_render_batch, db_path, members[i:i + batch_size],
+                                       date_from, date_to, scratch)
+                       for i in range(0, len(members), batch_size)]
+            # PDF streams are already deflated, so the archive stores them as-is
+            for future in as_completed(futures):
+                for user_id, path in future.result():
+                    archive.write(path, f'{month}/{user_id}.pdf')
+                    os.remove(path)
+                    written += 1
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return written
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Generate savings statements (buku tabungan)')
+    sub = parser.add_subparsers(dest='command', required=True)
+    one = sub.add_parser('member', help='Statement for one member')
+    one.add_argument('user_id')
+    one.add_argument('--from', dest='date_from')
+    one.add_argument('--to', dest='date_to', help='Exclusive end date')
+    one.add_argument('--out', help='Output PDF (default <user_id>.pdf)')
+    one.add_argument('--db', default='banksampah_complete.db')
+    bulk = sub.add_parser('month-end', help='Statements for every member for one month, as a zip')
+    bulk.add_argument('month', help='YYYY-MM')
+    bulk.add_argument('--out', help='Output zip (default statements-<month>.zip)')
+    bulk.add_argument('--workers', type=int)
+    bulk.add_argument('--db', default='banksampah_complete.db')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.command == 'member':
+        conn = sqlite3.connect(args.db)
+        rows = write_statement(conn, args.user_id, args.out or f'{args.user_id}.pdf', args.date_from, args.date_to)
+        conn.close()
+        if rows is None:
+            raise SystemExit(f'Anggota {args.user_id} tidak ditemukan')
+        print(f'✅ {rows} baris ditulis ke {args.out or args.user_id + ".pdf"}')
+    else:
+        count = month_end(args.db, args.month, args.out or f'statements-{args.month}.zip', workers=args.workers)
+        print(f'✅ {count} buku tabungan dalam {time.perf_counter() - started:.1f} detik')
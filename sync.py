@@ -0,0 +1,144 @@
+import secrets
+
+# Delta-sync feed for offline clients. One global clock (sync_clock) hands out
+# a version to every insert/update/delete on the reference tables; each row
+# keeps the version of its last change in row_version, hard deletes leave a
+# tombstone. A client sends back the token of its last sync and gets only the
+# rows with a newer version, so the work is an index range scan over what
+# changed. Rows whose active condition no longer holds (status/is_active) go
+# out as deletions.
+#   kind: (table, active condition, columns that matter)
+SOURCES = {
+    'waste_types': ('waste_types', "{r}.status = 'ACTIVE'",
+                    'name, category, description, price_per_kg, image_url, recycling_process, benefits, status'),
+    'collection_points': ('collection_points', "{r}.status = 'ACTIVE'",
+                          'name, type, address, latitude, longitude, operating_hours, capacity, '
+                          'contact_person, contact_phone, facilities, status'),
+    'news': ('news', "{r}.is_active = 1",
+             'title, content, category, image_url, author, publish_date, expiry_date, is_active'),
+    'education': ('education_materials', "1",
+                  'title, content, type, category, image_url, video_url, author'),
+    'tips': ('tips', "1", 'title, content, icon, category, difficulty'),
+}
+# views/likes are left out on purpose: counters flush every few seconds and
+# would otherwise push every read article to every client
+
+CLOCK_SQL = "SELECT epoch, version FROM sync_clock WHERE id = 1"
+TOMBSTONES_SQL = ("SELECT row_version, kind, ref_id FROM sync_tombstones "
+                  "WHERE row_version > ? ORDER BY row_version LIMIT ?")
+
+
+class TokenError(ValueError):
+    pass
+
+
+def changes_sql(kind):
+    table, active, _ = SOURCES[kind]
+    return (f"SELECT t.*, {active.format(r='t')} AS sync_active FROM {table} t "
+            f"WHERE t.row_version > ? ORDER BY t.row_version LIMIT ?")
+
+
+def create_feed(c):
+    # Migration step: clock, tombstones, row_version columns, triggers and backfill
+    c.execute('''CREATE TABLE IF NOT EXISTS sync_clock (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        epoch TEXT NOT NULL,
+        version INTEGER NOT NULL
+    )''')
+    c.execute("INSERT OR IGNORE INTO sync_clock (id, epoch, version) VALUES (1, ?, 0)", (secrets.token_hex(4),))
+    c.execute('''CREATE TABLE IF NOT EXISTS sync_tombstones (
+        row_version INTEGER PRIMARY KEY,
+        kind TEXT NOT NULL,
+        ref_id INTEGER NOT NULL
+    )''')
+    for kind, (table, active, columns) in SOURCES.items():
+        c.execute(f"ALTER TABLE {table} ADD COLUMN row_version INTEGER NOT NULL DEFAULT 0")
+        # Existing rows get distinct versions in id order
+        c.execute(f"UPDATE {table} SET row_version = id + (SELECT version FROM sync_clock WHERE id = 1)")
+        c.execute(f"UPDATE sync_clock SET version = version + (SELECT COALESCE(MAX(id), 0) FROM {table}) WHERE id = 1")
+        c.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_row_version ON {table} (row_version)")
+
+        stamp = (f"UPDATE sync_clock SET version = version + 1 WHERE id = 1;\n"
+                 f"            UPDATE {table} SET row_version = (SELECT version FROM sync_clock WHERE id = 1) "
+                 f"WHERE id = NEW.id;")
+        changed = ' OR '.join(f'OLD.{col} IS NOT NEW.{col}' for col in columns.split(', '))
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS {table}_sync_ai AFTER INSERT ON {table} BEGIN
+            {stamp}
+        END''')
+        # row_version is not in the column list, so the stamp does not re-fire it
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS {table}_sync_au AFTER UPDATE OF {columns} ON {table}
+            WHEN {changed} BEGIN
+            {stamp}
+        END''')
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS {table}_sync_ad AFTER DELETE ON {table} BEGIN
+            UPDATE sync_clock SET version = version + 1 WHERE id = 1;
+            INSERT INTO sync_tombstones (row_version, kind, ref_id)
+            SELECT version, '{kind}', OLD.id FROM sync_clock WHERE id = 1;
+        END''')
+
+
+def public_row(row):
+    # API view of a reference-table row; row_version only goes out in the feed
+    row = dict(row)
+    row.pop('row_version', None)
+    return row
+
+
+def format_token(epoch, version):
+    return f'{epoch}.{version}'
+
+
+def parse_token(token, epoch):
+    # -> version to sync from; 0 (full sync) when the token is from another
+    # epoch, i.e. the database was rebuilt or restored since
+    if not token:
+        return 0
+    try:
+        token_epoch, version = token.split('.')
+        version = int(version)
+    except ValueError:
+        raise TokenError(token)
+    if version < 0:
+        raise TokenError(token)
+    return version if token_epoch == epoch else 0
+
+
+def changes(conn, token=None, limit=500):
+    # One read transaction, so rows and clock come from the same snapshot.
+    # Returns {'token', 'reset', 'has_more', 'changes', 'deleted'}; on
+    # has_more the client calls again with the returned token.
+    c = conn.cursor()
+    c.execute("BEGIN")
+    try:
+        epoch, clock = c.execute(CLOCK_SQL).fetchone()
+        since = parse_token(token, epoch)
+        reset = bool(token) and since == 0
+
+        # Up to limit + 1 candidates per table; versions are unique across
+        # tables, so the first `limit` by version is a consistent cut
+        pending = []
+        for kind in SOURCES:
+            for row in c.execute(changes_sql(kind), (since, limit + 1)).fetchall():
+                row = dict(row)
+                version, active = row.pop('row_version'), row.pop('sync_active')
+                pending.append((version, kind, row['id'], row if active else None))
+        if since:
+            for version, kind, ref_id in c.execute(TOMBSTONES_SQL, (since, limit + 1)).fetchall():
+                pending.append((version, kind, ref_id, None))
+    finally:
+        conn.rollback()
+
+    pending.sort(key=lambda item: item[0])
+    has_more = len(pending) > limit
+    pending = pending[:limit]
+    result = {'changes': {kind: [] for kind in SOURCES}, 'deleted': {kind: [] for kind in SOURCES}}
+    for _, kind, ref_id, row in pending:
+        if row is None:
+            # A full sync has nothing to delete on the client
+            if since:
+                result['deleted'][kind].append(ref_id)
+        else:
+            result['changes'][kind].append(row)
+    last = pending[-1][0] if has_more else clock
+    result.update(token=format_token(epoch, last), reset=reset, has_more=has_more)
+    return result
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    # One seeded database for the whole run; tests add the rows they need
+    import banksampah_fixed
+    root = tmp_path_factory.mktemp('app')
+    banksampah_fixed.app.config['DATABASE'] = str(root / 'banksampah.db')
+    banksampah_fixed.app.config['CHART_CACHE_DIR'] = str(root / 'chart_cache')
+    banksampah_fixed.app.config['TESTING'] = True
+    banksampah_fixed.init_db()
+    yield banksampah_fixed
+    banksampah_fixed.deposit_writer.close()
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+@pytest.fixture(scope='session')
+def admin_headers(app_module):
+    resp = app_module.app.test_client().post('/api/login', json={'email': 'admin@banksampah.com',
+                                                                  'password': 'admin123'})
+    return {'Authorization': 'Bearer ' + resp.get_json()['access_token']}
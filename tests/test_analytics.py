@@ -0,0 +1,25 @@
+import sqlite3
+
+
+def test_area_breakdown_follows_the_member_address(app_module):
+    import analytics
+    conn = sqlite3.connect(app_module.app.config['DATABASE'])
+    for area in ('Pamulang', 'Pamulang Barat'):
+        conn.execute('''INSERT INTO pickup_schedules (user_id, schedule_date, schedule_time, area, created_at)
+                        VALUES ('ADMIN001', '2099-01-05', '08:00', ?, '2099-01-01')''', (area,))
+    for user_id, address in (('AREA001', 'Jl. Melati 3, Pamulang Barat'), ('AREA002', 'Jl. Tanpa Wilayah 9')):
+        conn.execute('''INSERT INTO users (user_id, name, email, phone, password, address, join_date)
+                        VALUES (?, ?, ?, '0800', 'x', ?, '2099-01-01')''',
+                     (user_id, user_id, user_id.lower() + '@example.com', address))
+    # location is where the deposit was handed in, not the member's area
+    for n, (user_id, weight) in enumerate((('AREA001', 2.0), ('AREA001', 3.0), ('AREA002', 4.0))):
+        conn.execute('''INSERT INTO transactions (user_id, transaction_id, waste_type_id, weight, total,
+                                                  location, status, created_at)
+                        VALUES (?, ?, 1, ?, ?, 'Kantor Pusat', 'COMPLETED', '2099-01-02 10:00:00')''',
+                     (user_id, f'TRXAREA{n}', weight, weight * 1000))
+    conn.commit()
+
+    result = analytics.aggregate(analytics.load_frame(conn, '2099-01-01'))
+    conn.close()
+    by_area = {row['area']: row['transactions'] for row in result['by_area'] if row['transactions']}
+    assert by_area == {'Pamulang Barat': 2, 'Lainnya': 1}
@@ -0,0 +1,27 @@
+import sqlite3
+
+
+def nearest_names(client, lat, lon):
+    resp = client.get(f'/api/collection-points/nearest?lat={lat}&lon={lon}&k=3')
+    assert resp.status_code == 200
+    return [point['name'] for point in resp.get_json()]
+
+
+def test_nearest_follows_collection_point_changes(app_module, client):
+    lat, lon = -8.65, 115.21
+    assert 'TPS Uji' not in nearest_names(client, lat, lon)
+
+    conn = sqlite3.connect(app_module.app.config['DATABASE'])
+    conn.execute('''INSERT INTO collection_points (name, type, address, latitude, longitude, operating_hours, created_at)
+                    VALUES ('TPS Uji', 'TPS', 'Jl. Uji', ?, ?, '08:00-16:00', datetime('now'))''', (lat, lon))
+    conn.commit()
+    assert nearest_names(client, lat, lon)[0] == 'TPS Uji'
+
+    conn.execute("UPDATE collection_points SET status = 'INACTIVE' WHERE name = 'TPS Uji'")
+    conn.commit()
+    assert 'TPS Uji' not in nearest_names(client, lat, lon)
+
+    conn.execute("DELETE FROM collection_points WHERE name = 'TPS Uji'")
+    conn.commit()
+    conn.close()
+    assert 'TPS Uji' not in nearest_names(client, lat, lon)
@@ -0,0 +1,6 @@
+def test_education_listing_shows_live_view_counts(client):
+    before = {row['id']: row['views'] for row in client.get('/api/education').get_json()}
+    education_id = next(iter(before))
+    assert client.get(f'/api/education/{education_id}').status_code == 200
+    after = {row['id']: row['views'] for row in client.get('/api/education').get_json()}
+    assert after[education_id] == before[education_id] + 1
@@ -0,0 +1,69 @@
+import sqlite3
+from concurrent.futures import Future
+
+import pytest
+
+import deposits
+from deposits import DepositError, DepositWriter, normalize_deposit
+
+MEMBER = 'BSB100001'
+
+
+def deposit(**fields):
+    data = {'user_id': MEMBER, 'waste_type_id': 1, 'weight': 1.5, 'location': 'Bank Sampah Pusat'}
+    data.update(fields)
+    return data
+
+
+@pytest.mark.parametrize('weight', ['nan', 'inf', '-inf', float('nan')])
+def test_non_finite_weight_is_rejected(weight):
+    with pytest.raises(DepositError):
+        normalize_deposit(deposit(weight=weight))
+
+
+def test_overflowing_total_is_rejected():
+    with pytest.raises(DepositError):
+        deposits.price_deposit(1e308, 5000)
+
+
+def test_deposit_endpoint_rejects_nan_weight(client, admin_headers):
+    resp = client.post('/api/transactions/deposit', headers=admin_headers, json=deposit(weight='nan'))
+    assert resp.status_code == 400
+
+
+def test_bulk_csv_reports_nan_row(client, admin_headers):
+    body = ('transaction_id,user_id,waste_type_id,weight,location\n'
+            f'BULKNAN1,{MEMBER},1,nan,Pos A\n'
+            f'BULKNAN2,{MEMBER},1,2,Pos A\n')
+    resp = client.post('/api/transactions/bulk', headers=dict(admin_headers, **{'Content-Type': 'text/csv'}),
+                       data=body)
+    assert resp.status_code == 200
+    statuses = [r['status'] for r in resp.get_json()['results']]
+    assert statuses == ['ERROR', 'POSTED']
+
+
+def test_unexpected_error_fails_only_its_own_deposit(app_module, monkeypatch):
+    real = deposits.price_deposit
+
+    def flaky(weight, price):
+        if weight == 7.25:
+            raise RuntimeError('boom')
+        return real(weight, price)
+
+    monkeypatch.setattr(deposits, 'price_deposit', flaky)
+    writer = DepositWriter(lambda: sqlite3.connect(app_module.app.config['DATABASE']))
+    batch = [(normalize_deposit(deposit(weight=w)), Future()) for w in (1.0, 7.25, 2.0)]
+    writer._apply(batch)
+    (_, ok1), (_, bad), (_, ok2) = batch
+    assert ok1.result()['status'] == 'COMPLETED'
+    assert ok2.result()['status'] == 'COMPLETED'
+    assert isinstance(bad.exception(), RuntimeError)
+
+
+def test_backdated_deposit_is_rejected(client, admin_headers):
+    resp = client.post('/api/transactions/deposit', headers=admin_headers, json=deposit())
+    assert resp.status_code == 200
+    resp = client.post('/api/transactions/deposit', headers=admin_headers,
+                       json=deposit(created_at='2020-01-05 10:00:00'))
+    assert resp.status_code == 400
+    assert 'mutasi tabungan terakhir' in resp.get_json()['message']
@@ -0,0 +1,26 @@
+import csv
+import io
+import sqlite3
+
+
+def test_csv_export_neutralises_formulas(app_module, client, admin_headers):
+    conn = sqlite3.connect(app_module.app.config['DATABASE'])
+    conn.execute('''INSERT INTO users (user_id, name, email, phone, password, address, join_date)
+                    VALUES ('CSV0001', '=HYPERLINK("http://x","klik")', 'csv@example.com', '+62811',
+                            'x', '@Jl. Mawar', '2098-03-04')''')
+    conn.commit()
+    conn.close()
+
+    resp = client.get('/api/admin/export/users?from=2098-03-04&to=2098-03-04', headers=admin_headers)
+    rows = list(csv.reader(io.StringIO(resp.get_data(as_text=True).lstrip('\ufeff'))))
+    row = dict(zip(rows[0], rows[1]))
+    assert len(rows) == 2
+    assert row['name'] == '\'=HYPERLINK("http://x","klik")'
+    assert row['phone'] == "'+62811"
+    assert row['address'] == "'@Jl. Mawar"
+    assert row['email'] == 'csv@example.com'
+
+
+def test_negative_amounts_stay_numbers():
+    import exports
+    assert exports.safe_row([-2500.0, '-2500', 'ok']) == [-2500.0, "'-2500", 'ok']
@@ -0,0 +1,37 @@
+import sqlite3
+from datetime import date
+
+import analytics
+import leaderboard
+import ledger_archive
+import migrations
+import rollups
+
+
+def test_reads_span_more_years_than_sqlite_can_attach(tmp_path):
+    conn = sqlite3.connect(tmp_path / 'ledger.db')
+    migrations.migrate(conn)
+    years = list(range(2008, 2020))
+    this_year = date.today().year
+    conn.executemany('''INSERT INTO transactions (user_id, transaction_id, waste_type_id, weight, total,
+                                                  location, status, created_at)
+                        VALUES ('BSB0001', ?, 1, 1.0, 1000, 'Pos Melati', 'COMPLETED', ?)''',
+                     [(f'TRX{year}', f'{year}-06-01 10:00:00') for year in years + [this_year]])
+    conn.commit()
+    ledger_archive.rotate(conn)
+    assert len(ledger_archive.archives(conn)) == len(years) > ledger_archive.MAX_ATTACHED
+
+    sources = list(ledger_archive.sources(conn, 'transactions', newest_first=True))
+    assert len(sources) == len(years) + 1
+
+    board = leaderboard.Leaderboard()
+    board.load(conn)
+    ranked, total = board.top('area', 'Pos Melati')
+    assert ranked[0]['points'] == (len(years) + 1) * 1000 // leaderboard.POINT_VALUE
+
+    assert analytics.aggregate(analytics.load_frame(conn))['rows'] == len(years) + 1
+
+    rollups.backfill(conn)
+    flows = rollups.query(conn, '2008-01-01', date.today().isoformat(), 'month')
+    assert sum(row['total_transactions'] for row in flows) == len(years) + 1
+    conn.close()
@@ -0,0 +1,22 @@
+import sqlite3
+
+import pytest
+
+import migrations
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    migrations.migrate(conn)
+    yield conn
+    conn.close()
+
+
+def test_shipped_queries_use_an_index(conn):
+    migrations.verify_query_plans(conn)
+
+
+def test_unindexed_query_raises(conn):
+    with pytest.raises(migrations.QueryPlanError):
+        migrations.verify_query_plans(conn, {'scan': ("SELECT * FROM pickup_requests WHERE address = ?", ('x',))})
@@ -0,0 +1,24 @@
+import pytest
+
+
+@pytest.mark.parametrize('value', ['0-not-a-date', '2026-09-45', '2026-02-30 10:00:00', 'kemarin'])
+def test_invalid_effective_date_is_rejected(client, admin_headers, value):
+    resp = client.put('/api/admin/waste-types/2/price', headers=admin_headers,
+                      json={'price_per_kg': 4100, 'effective_date': value})
+    assert resp.status_code == 400
+    history = client.get('/api/waste-types/2/price-history').get_json()
+    assert all(value not in str(interval['from']) for interval in history['history'])
+
+
+def test_effective_date_is_normalized(client, admin_headers):
+    resp = client.put('/api/admin/waste-types/2/price', headers=admin_headers,
+                      json={'price_per_kg': 4200, 'effective_date': '2025-03-01T08:30:00'})
+    assert resp.status_code == 200
+    assert resp.get_json()['effective_date'] == '2025-03-01 08:30:00'
+    assert client.get('/api/charts/price-trend?format=svg').status_code == 200
+
+
+def test_future_effective_date_is_rejected(client, admin_headers):
+    resp = client.put('/api/admin/waste-types/2/price', headers=admin_headers,
+                      json={'price_per_kg': 4300, 'effective_date': '2999-01-01'})
+    assert resp.status_code == 400
@@ -0,0 +1,25 @@
+import sqlite3
+
+
+def test_plain_sqlite_writer_can_change_news(app_module, client):
+    # No strip_html UDF on this connection
+    conn = sqlite3.connect(app_module.app.config['DATABASE'])
+    conn.execute('''INSERT INTO news (title, content, category, author, publish_date, is_active, created_at)
+                    VALUES ('Kompos rumahan', '<p>Olah <strong>sisa dapur</strong> jadi humuskita</p>',
+                            'Edukasi', 'Admin', date('now'), 1, datetime('now'))''')
+    conn.execute("UPDATE education_materials SET content = '<p>Pilah botol plastik</p>' WHERE id = 1")
+    conn.commit()
+    conn.close()
+
+    results = client.get('/api/search?q=humuskita').get_json()
+    assert [r['title'] for r in results] == ['Kompos rumahan']
+    assert '<p>' not in results[0]['snippet'] and 'strong' not in results[0]['snippet']
+    assert client.get('/api/search?q=strong').get_json() == []
+
+
+def test_deleted_news_leaves_the_index(app_module, client):
+    conn = sqlite3.connect(app_module.app.config['DATABASE'])
+    conn.execute("DELETE FROM news WHERE title = 'Kompos rumahan'")
+    conn.commit()
+    conn.close()
+    assert client.get('/api/search?q=humuskita').get_json() == []
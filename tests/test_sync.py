@@ -0,0 +1,50 @@
+import sqlite3
+
+import pytest
+
+import sync
+
+
+@pytest.fixture(scope='module')
+def active_news(app_module):
+    conn = sqlite3.connect(app_module.app.config['DATABASE'])
+    conn.execute("INSERT INTO news (title, content, category, author, publish_date, is_active, created_at) "
+                 "VALUES ('Jadwal baru', 'Isi', 'Pengumuman', 'Admin', date('now'), 1, datetime('now'))")
+    conn.commit()
+    conn.close()
+
+
+@pytest.mark.parametrize('path', ['/api/waste-types', '/api/collection-points', '/api/news',
+                                  '/api/education', '/api/tips'])
+def test_public_listings_hide_row_version(client, active_news, path):
+    rows = client.get(path).get_json()
+    assert rows
+    assert all('row_version' not in row for row in rows)
+
+
+def test_full_sync_shape(client):
+    body = client.get('/api/sync').get_json()
+    assert set(body) >= {'token', 'reset', 'has_more', 'changes', 'deleted'}
+    assert set(body['changes']) == set(sync.SOURCES) == set(body['deleted'])
+    assert body['changes']['waste_types']
+    assert body['reset'] is False
+    assert all('row_version' not in row and 'sync_active' not in row
+               for rows in body['changes'].values() for row in rows)
+
+
+def test_delta_returns_only_changed_rows(app_module, client):
+    token = client.get('/api/sync').get_json()['token']
+    assert client.get(f'/api/sync?since={token}').get_json()['changes']['tips'] == []
+
+    conn = sqlite3.connect(app_module.app.config['DATABASE'])
+    conn.execute("UPDATE tips SET title = title || ' (diperbarui)' WHERE id = 1")
+    conn.commit()
+    conn.close()
+
+    body = client.get(f'/api/sync?since={token}').get_json()
+    assert [row['id'] for row in body['changes']['tips']] == [1]
+    assert all(rows == [] for kind, rows in body['changes'].items() if kind != 'tips')
+
+
+def test_bad_token_is_rejected(client):
+    assert client.get('/api/sync?since=not-a-token').status_code == 400